@@ -1,10 +1,53 @@
 """
 FastAPI dependency providers shared across routes.
 """
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query
+
 from app.config import Settings, get_settings
 from app.services.file_service import file_service, FileService
+from app.services.result_store import result_store, ResultStore
 
 
 def get_file_service() -> FileService:
     """Provide the module-level FileService singleton."""
     return file_service
+
+
+def get_result_store() -> ResultStore:
+    """Provide the module-level content-addressed ResultStore singleton."""
+    return result_store
+
+
+def get_job_mode(
+    mode: Optional[str] = Query(
+        None,
+        pattern="^(async|sync|auto)$",
+        description="async: 202 + poll; sync: result in the response; auto: sync for small uploads",
+    ),
+    settings: Settings = Depends(get_settings),
+) -> str:
+    """Requested processing mode, defaulting to settings.default_job_mode."""
+    return mode or settings.default_job_mode
+
+
+def run_inline(mode: str, size: int, settings: Settings) -> bool:
+    """Whether an upload of `size` bytes is processed in the request.
+
+    mode=sync above settings.sync_max_file_size_kb is rejected with 413 rather
+    than silently switching to the job flow; mode=auto falls back to it.
+    """
+    if mode == "async":
+        return False
+    fits = size <= settings.sync_max_file_size_kb * 1024
+    if mode == "sync" and not fits:
+        raise HTTPException(
+            status_code=413,
+            detail={
+                "error_code": "FILE_TOO_LARGE_FOR_SYNC",
+                "message": f"Synchronous mode is limited to {settings.sync_max_file_size_kb} KB",
+                "detail": f"Received {size:,} bytes; use mode=async",
+            },
+        )
+    return fits
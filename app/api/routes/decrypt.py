@@ -9,21 +9,44 @@ D-04/D-11/WR-01: Size check on encrypted file BEFORE write_bytes — oversized i
 D-12/WR-02: try/finally ensures both temp files cleaned in all error paths.
 D-03/CR-02: Background task stores generic error string, not raw exception.
 FILE-02, FILE-07: Async job pattern with thread-pool offload for decryption.
+Temp-dir writes/unlinks go through app.services.temp_io so large uploads never block the event loop.
+DEDUP_ENABLED: identical (container, key file, password) requests reuse results from app.services.result_store.
+?mode=sync|auto (app.api.deps.run_inline): containers within sync_max_file_size_kb are decrypted in
+the request and the plaintext is returned directly, with no registry entry or temp files.
+
+DECRYPT_STREAMING: jobs over seekable containers verify the container (HMAC, key wrap,
+segment index) and keep it with an unprotected copy of the key bundle instead of writing the
+plaintext; GET /api/files/{file_id}/download decrypts it segment by segment while streaming.
+Non-segmented containers are not streamed: they are decrypted whole into a temp file as before.
+
+POST /api/decrypt/stream — synchronous variant that streams the plaintext in the response.
+Container HMAC, key wrap and segment index are verified before the first byte is sent;
+seekable containers are then decrypted one segment at a time, each authenticated by its
+own AEAD tags. Non-segmented containers are decrypted whole in memory and sent as one
+chunk. Neither the uploads nor the plaintext are written to the temp dir.
 """
+import hashlib
 import logging
+import os
 import uuid
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Optional
+from urllib.parse import quote
 
 from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, UploadFile
+from fastapi.responses import Response, StreamingResponse
 from starlette.concurrency import run_in_threadpool
 
-from app.api.deps import get_file_service
+from app.api.deps import get_file_service, get_job_mode, get_result_store, run_inline
 from app.config import Settings, get_settings
 from app.schemas.common import AcceptedResponse, ErrorResponse
+from app.services import temp_io
 from app.services.file_service import FileService
+from app.services.result_store import ResultStore
+from app.services.shredder import shred_queue
 from core.decryption_engine import DecryptionEngine
+from core.header_parser import parse_header
 from core.key_manager import KeyManager
 from utils.file_handler import FileHandler
 
@@ -39,8 +62,13 @@ _logger = logging.getLogger(__name__)
     response_model=AcceptedResponse,
     status_code=202,
     summary="Decrypt a document",
-    description="Upload an encrypted file and its key file for decryption. Returns a job ID immediately (HTTP 202). Poll /api/files/{file_id} for status.",
+    description=(
+        "Upload an encrypted file and its key file for decryption. Returns a job ID immediately "
+        "(HTTP 202). Poll /api/files/{file_id} for status. With mode=sync (or mode=auto for "
+        "small files) the decrypted document is returned directly in the response."
+    ),
     responses={
+        200: {"content": {"application/octet-stream": {}}, "description": "mode=sync: decrypted document"},
         413: {"model": ErrorResponse, "description": "File exceeds size limit"},
         422: {"model": ErrorResponse, "description": "Validation error or wrong key"},
     },
@@ -50,8 +78,10 @@ async def decrypt_file(
     key_file: UploadFile = File(...),
     password: str = Form(None),
     background_tasks: BackgroundTasks = BackgroundTasks(),
+    mode: str = Depends(get_job_mode),
     settings: Settings = Depends(get_settings),
     file_svc: FileService = Depends(get_file_service),
+    results: ResultStore = Depends(get_result_store),
 ):
     # D-08: read BOTH UploadFiles NOW — both are closed after endpoint returns
     enc_content: bytes = await encrypted_file.read()
@@ -70,6 +100,19 @@ async def decrypt_file(
             },
         )
 
+    # Small uploads: run inline in the worker pool — no sidecar, background task or temp files
+    if run_inline(mode, len(enc_content), settings):
+        try:
+            result = await run_in_threadpool(_decrypt_inline, enc_content, key_content, password)
+        except Exception:
+            _logger.warning("Synchronous decrypt rejected", exc_info=True)
+            raise _decryption_failed()
+        return Response(
+            content=result["data"],
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": _attachment(result["original_filename"])},
+        )
+
     file_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc)
     expires_at = now + timedelta(seconds=settings.file_ttl_seconds)
@@ -77,32 +120,59 @@ async def decrypt_file(
 
     temp_dir = Path(settings.temp_dir)
     files_dir = temp_dir / "files"
-    files_dir.mkdir(parents=True, exist_ok=True)
-
     enc_path = files_dir / f"{file_id}_src.enc"
     key_path = files_dir / f"{file_id}_src.key"
-    enc_path.write_bytes(enc_content)
-    key_path.write_bytes(key_content)
+
+    job = {
+        "file_id": file_id,
+        "status": "queued",
+        "job_type": "decrypt",
+        "original_filename": original_enc_filename,
+        "file_type": "encrypted",
+        "created_at": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "expires_at": expires_at_str,
+        "error": None,
+        "result_paths": {},
+        "original_path": f"files/{enc_path.name}",
+    }
+
+    # Dedup: the same container + key file + password always decrypts to the same
+    # plaintext, so a live published result is reused instead of re-running the job.
+    cas_key = None
+    if settings.dedup_enabled:
+        cas_key = await run_in_threadpool(
+            _content_key, results, enc_content, key_content, password
+        )
+        cached = results.acquire(cas_key, temp_dir, settings.file_ttl_seconds)
+        if cached is not None:
+            file_svc.register(file_id, {
+                **job,
+                "status": "complete",
+                "result_paths": cached,
+                "original_path": None,
+                "cas_key": cas_key,
+            })
+            return AcceptedResponse(
+                file_id=file_id,
+                status="complete",
+                poll_url=f"/api/files/{file_id}",
+                original_filename=original_enc_filename,
+                file_type="encrypted",
+                expires_at=expires_at_str,
+            )
+
+    await temp_io.makedirs(files_dir)
+    await temp_io.write_bytes(enc_path, enc_content)
+    await temp_io.write_bytes(key_path, key_content)
 
     # D-12/WR-02: wrap register + enqueue in try/finally to clean up both temp files on any error
     try:
         # D-05: register sidecar before adding background task
-        file_svc.register(file_id, {
-            "file_id": file_id,
-            "status": "queued",
-            "job_type": "decrypt",
-            "original_filename": original_enc_filename,
-            "file_type": "encrypted",
-            "created_at": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
-            "expires_at": expires_at_str,
-            "error": None,
-            "result_paths": {},
-            "original_path": f"files/{enc_path.name}",
-        })
+        file_svc.register(file_id, job)
 
         background_tasks.add_task(
             _run_decrypt_job, file_id, str(enc_path), str(key_path),
-            password, file_svc, settings,
+            password, file_svc, settings, results, cas_key,
         )
 
         return AcceptedResponse(
@@ -114,12 +184,12 @@ async def decrypt_file(
             expires_at=expires_at_str,
         )
     except HTTPException:
-        enc_path.unlink(missing_ok=True)
-        key_path.unlink(missing_ok=True)
+        await temp_io.unlink(enc_path)
+        await temp_io.unlink(key_path)
         raise
     except Exception:
-        enc_path.unlink(missing_ok=True)
-        key_path.unlink(missing_ok=True)
+        await temp_io.unlink(enc_path)
+        await temp_io.unlink(key_path)
         _logger.exception("Unexpected error in decrypt upload handler")
         raise HTTPException(
             status_code=500,
@@ -131,6 +201,110 @@ async def decrypt_file(
         )
 
 
+@router.post(
+    "/decrypt/stream",
+    response_class=StreamingResponse,
+    summary="Decrypt a document and stream the plaintext",
+    description=(
+        "Upload an encrypted file and its key file; the decrypted document is streamed "
+        "back in the response body. Integrity is verified before streaming starts. "
+        "Containers encrypted with seekable=true are decrypted segment by segment; others "
+        "are decrypted whole in memory first. Nothing is stored server-side, so there is "
+        "no job to poll."
+    ),
+    responses={
+        200: {"content": {"application/octet-stream": {}}, "description": "Decrypted document"},
+        413: {"model": ErrorResponse, "description": "File exceeds size limit"},
+        422: {"model": ErrorResponse, "description": "Validation error or wrong key"},
+    },
+)
+async def decrypt_stream(
+    encrypted_file: UploadFile = File(...),
+    key_file: UploadFile = File(...),
+    password: str = Form(None),
+    settings: Settings = Depends(get_settings),
+):
+    enc_content: bytes = await encrypted_file.read()
+    key_content: bytes = await key_file.read()
+
+    max_bytes = settings.max_file_size_mb * 1024 * 1024
+    if len(enc_content) > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail={
+                "error_code": "FILE_TOO_LARGE",
+                "message": f"Encrypted file exceeds the {settings.max_file_size_mb} MB limit",
+                "detail": f"Received {len(enc_content):,} bytes",
+            },
+        )
+
+    try:
+        metadata, chunks = await run_in_threadpool(
+            _open_decrypt_stream, enc_content, key_content, password
+        )
+    except Exception:
+        _logger.warning("Streaming decrypt rejected", exc_info=True)
+        raise _decryption_failed()
+
+    return StreamingResponse(
+        chunks,
+        media_type="application/octet-stream",
+        headers={
+            "Content-Length": str(metadata["original_size"]),
+            "Content-Disposition": _attachment(metadata["original_filename"]),
+        },
+    )
+
+
+def _decryption_failed() -> HTTPException:
+    return HTTPException(
+        status_code=422,
+        detail={
+            "error_code": "DECRYPTION_FAILED",
+            "message": "File could not be decrypted with the supplied key",
+            "detail": None,
+        },
+    )
+
+
+def _attachment(original_filename: str) -> str:
+    filename = Path(original_filename).name or "decrypted_file"
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+
+def _decrypt_inline(enc_content: bytes, key_content: bytes, password: Optional[str]) -> dict:
+    """Runs in ThreadPoolExecutor. Decrypts entirely in memory."""
+    key_manager = KeyManager()
+    key_bundle = key_manager.parse_key_bundle(key_content, password)
+    engine = DecryptionEngine(key_bundle=key_bundle, key_manager=key_manager)
+    return engine.decrypt(enc_content)
+
+
+def _open_decrypt_stream(enc_content: bytes, key_content: bytes, password: Optional[str]):
+    """Runs in ThreadPoolExecutor. Verifies the container; returns (metadata, chunk iterator).
+
+    StreamingResponse iterates the chunk generator in the thread pool as well.
+    """
+    key_manager = KeyManager()
+    key_bundle = key_manager.parse_key_bundle(key_content, password)
+    engine = DecryptionEngine(key_bundle=key_bundle, key_manager=key_manager)
+    return engine.decrypt_stream(enc_content)
+
+
+def _content_key(
+    results: ResultStore,
+    enc_content: bytes,
+    key_content: bytes,
+    password: Optional[str],
+) -> str:
+    """Content key for dedup. Runs in the thread pool — hashing large uploads is CPU-bound."""
+    return results.content_key("decrypt", [
+        hashlib.sha256(enc_content).digest(),
+        hashlib.sha256(key_content).digest(),
+        hashlib.sha256((password or "").encode("utf-8")).digest(),
+    ])
+
+
 async def _run_decrypt_job(
     file_id: str,
     enc_path: str,
@@ -138,6 +312,8 @@ async def _run_decrypt_job(
     password: Optional[str],
     file_svc: FileService,
     settings: Settings,
+    results: Optional[ResultStore] = None,
+    cas_key: Optional[str] = None,
 ) -> None:
     """Async wrapper — marks status, offloads CPU work to thread pool, updates status on completion."""
     file_svc.update_status(file_id, "processing")
@@ -145,7 +321,21 @@ async def _run_decrypt_job(
         result_paths = await run_in_threadpool(
             _sync_decrypt, file_id, enc_path, key_path, password, settings
         )
-        file_svc.update_status(file_id, "complete", result_paths=result_paths)
+        extra = {}
+        path_keys = ("decrypted_file",)
+        if "encrypted_file" in result_paths:
+            # Streamed result: the uploaded container is now the result, not a source to shred
+            path_keys = ("encrypted_file", "key_file")
+            extra["original_path"] = None
+        if results is not None and cas_key:
+            published = await run_in_threadpool(
+                results.publish, cas_key, Path(settings.temp_dir), result_paths,
+                path_keys, settings.file_ttl_seconds,
+            )
+            if published is not None:
+                result_paths = published
+                extra["cas_key"] = cas_key
+        file_svc.update_status(file_id, "complete", result_paths=result_paths, **extra)
     except Exception:
         # D-03/CR-02: log full traceback server-side; store only generic message in registry
         _logger.exception("Decrypt job failed for file_id=%s", file_id)
@@ -159,16 +349,40 @@ def _sync_decrypt(
     password: Optional[str],
     settings: Settings,
 ) -> dict:
-    """Runs in ThreadPoolExecutor. Returns result_paths dict."""
+    """Runs in ThreadPoolExecutor. Returns result_paths dict.
+
+    Seekable containers (with DECRYPT_STREAMING) yield {encrypted_file, key_file}: the
+    verified container plus a key bundle that needs no password, decrypted at download
+    time. Everything else yields {decrypted_file} with the plaintext written to disk.
+    """
     key_manager = KeyManager()
     key_bundle = key_manager.load_key_bundle(key_path, password)
     engine = DecryptionEngine(key_bundle=key_bundle, key_manager=key_manager)
-    encrypted_data = _file_handler.read_file(enc_path)
-    result = engine.decrypt(encrypted_data)
+    temp_dir = Path(settings.temp_dir)
+    # Ciphertext is parsed and authenticated straight from a read-only mmap view.
+    with _file_handler.open_buffer(enc_path) as encrypted_data:
+        if settings.decrypt_streaming and parse_header(encrypted_data).flags["segmented"]:
+            # HMAC, key wrap and segment index are checked now; segments are decrypted lazily
+            metadata, _ = engine.decrypt_stream(encrypted_data)
+            result = None
+        else:
+            result = engine.decrypt(encrypted_data)
+
+    if result is None:
+        stream_key = temp_dir / "files" / f"{file_id}_stream.key"
+        # The bundle needs no password: it must never exist with umask permissions
+        os.close(os.open(stream_key, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+        key_manager.save_key_bundle(key_bundle, str(stream_key))
+        shred_queue.enqueue(key_path)
+        return {
+            "encrypted_file": f"files/{Path(enc_path).name}",
+            "key_file": f"files/{stream_key.name}",
+            "original_filename": metadata["original_filename"],
+            "file_type": metadata["file_type"],
+        }
 
     original_filename = result.get("original_filename", "decrypted_file")
     suffix = Path(original_filename).suffix or ".bin"
-    temp_dir = Path(settings.temp_dir)
     out_path = temp_dir / "files" / f"{file_id}_decrypted{suffix}"
     out_path.parent.mkdir(parents=True, exist_ok=True)
     _file_handler.write_file(str(out_path), result["data"])
@@ -7,23 +7,48 @@ D-05: JSON sidecar written via file_svc.register() before background task is add
 D-04/D-11/WR-01: Size check performed BEFORE write_bytes — oversized input never hits disk.
 D-10/CR-03: Filename sanitized via PurePosixPath to prevent path traversal.
 D-12/WR-02: try/finally ensures temp file cleanup in all error paths.
+Temp-dir writes/unlinks go through app.services.temp_io so large uploads never block the event loop.
+?mode=sync|auto (app.api.deps.run_inline): uploads within sync_max_file_size_kb are encrypted in the
+request and returned as multipart/mixed (encrypted_file + key_file), with no registry entry.
+DEDUP_ENABLED: identical password-protected requests reuse results from app.services.result_store.
+seekable=true: segmented container (core/segmented_container.py) for Range reads via /api/files/{file_id}/plaintext.
 D-03/CR-02: Background task stores generic error string, not raw exception.
+
+POST /api/encrypt/stream — encrypt-while-uploading. The raw request body is fed chunk by
+chunk into a StreamEncryptor (seekable container) while it is still arriving; engine setup
+(PBKDF2 + RSA key pair) runs in the thread pool in parallel with the first chunks. The job
+is complete when the response is sent and the plaintext never touches disk.
+
+File types come from the first bytes of the upload (utils.content_sniffer): signatures
+(PDF, OOXML) win over the extension, containers (OLE2, ZIP) must agree with it, and text or
+unrecognised content falls back to the extension. The stream endpoint sniffs the head it has
+already buffered.
 """
+import asyncio
+import hashlib
 import logging
 import uuid
 from datetime import datetime, timedelta, timezone
 from pathlib import Path, PurePosixPath
 from typing import Optional
+from urllib.parse import quote
 
-from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, UploadFile
+from fastapi import (
+    APIRouter, BackgroundTasks, Depends, File, Form, Header, HTTPException, Request, UploadFile,
+)
+from fastapi.responses import Response
 from starlette.concurrency import run_in_threadpool
 
-from app.api.deps import get_file_service
+from app.api.deps import get_file_service, get_job_mode, get_result_store, run_inline
 from app.config import Settings, get_settings
 from app.schemas.common import AcceptedResponse, ErrorResponse
+from app.services import temp_io
 from app.services.file_service import FileService
-from core.encryption_engine import EncryptionEngine
+from app.services.result_store import ResultStore
+from config.settings import Settings as CryptoSettings
+from core.encryption_engine import EncryptionEngine, StreamEncryptor
 from core.key_manager import KeyManager
+from utils.content_sniffer import ContentSniffer
 from utils.file_handler import FileHandler
 from utils.validator import Validator
 
@@ -40,8 +65,16 @@ _logger = logging.getLogger(__name__)
     response_model=AcceptedResponse,
     status_code=202,
     summary="Encrypt a document",
-    description="Upload a document file for encryption. Returns a job ID immediately (HTTP 202). Poll /api/files/{file_id} for status.",
+    description=(
+        "Upload a document file for encryption. Returns a job ID immediately (HTTP 202). "
+        "Poll /api/files/{file_id} for status. With seekable=true the container is split "
+        "into independently encrypted segments so byte ranges can be decrypted on their "
+        "own (GET /api/files/{file_id}/plaintext with a Range header)."
+        " With mode=sync (or mode=auto for small files) the job runs in the request and "
+        "the response is multipart/mixed with the encrypted file and the key file."
+    ),
     responses={
+        200: {"content": {"multipart/mixed": {}}, "description": "mode=sync: encrypted file + key file"},
         413: {"model": ErrorResponse, "description": "File exceeds size limit"},
         415: {"model": ErrorResponse, "description": "Unsupported file format"},
         422: {"model": ErrorResponse, "description": "Validation error"},
@@ -50,9 +83,12 @@ _logger = logging.getLogger(__name__)
 async def encrypt_file(
     file: UploadFile = File(...),
     password: str = Form(None),
+    seekable: bool = Form(False),
     background_tasks: BackgroundTasks = BackgroundTasks(),
+    mode: str = Depends(get_job_mode),
     settings: Settings = Depends(get_settings),
     file_svc: FileService = Depends(get_file_service),
+    results: ResultStore = Depends(get_result_store),
 ):
     # D-08: read bytes NOW — UploadFile is closed after endpoint returns
     content: bytes = await file.read()
@@ -60,70 +96,93 @@ async def encrypt_file(
     # D-04/D-11/WR-01: size check BEFORE any disk write
     max_bytes = settings.max_file_size_mb * 1024 * 1024
     if len(content) > max_bytes:
-        raise HTTPException(
-            status_code=413,
-            detail={
-                "error_code": "FILE_TOO_LARGE",
-                "message": f"File exceeds the {settings.max_file_size_mb} MB limit",
-                "detail": f"Received {len(content):,} bytes",
-            },
-        )
+        raise _too_large(settings, len(content))
 
-    # D-10/CR-03: sanitize filename — strip all path components to prevent traversal
-    raw_name = file.filename or "upload"
-    safe_name = Path(PurePosixPath(raw_name).name).name
-    if not safe_name:
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "error_code": "INVALID_FILENAME",
-                "message": "Filename is invalid or empty after sanitization",
-                "detail": None,
-            },
-        )
+    safe_name = _sanitize_filename(file.filename or "upload")
 
     file_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc)
     expires_at = now + timedelta(seconds=settings.file_ttl_seconds)
+    expires_at_str = expires_at.strftime("%Y-%m-%dT%H:%M:%SZ")
 
     temp_dir = Path(settings.temp_dir)
     suffix = Path(safe_name).suffix or ".bin"
     src_path = temp_dir / "files" / f"{file_id}_src{suffix}"
-    src_path.parent.mkdir(parents=True, exist_ok=True)
-    src_path.write_bytes(content)
 
-    # D-12/WR-02: wrap format check + register + enqueue in try/finally to clean up on any error
-    try:
-        file_type = _validator.get_file_type(str(src_path))
-        if not _validator.is_supported_format(file_type):
+    # Format check uses the bytes already in memory, so unsupported uploads never touch disk either
+    file_type = _checked_file_type(src_path.name, content[:ContentSniffer.HEAD_SIZE])
+
+    # Small uploads: run inline in the worker pool — no sidecar, background task or temp files
+    if run_inline(mode, len(content), settings):
+        try:
+            encrypted, key_bundle = await run_in_threadpool(
+                _encrypt_inline, content, safe_name, file_type, password, seekable
+            )
+        except Exception:
+            _logger.exception("Synchronous encrypt failed")
             raise HTTPException(
-                status_code=415,
+                status_code=500,
                 detail={
-                    "error_code": "UNSUPPORTED_FORMAT",
-                    "message": f"File format '{file_type}' is not supported",
+                    "error_code": "PROCESSING_FAILED",
+                    "message": "Internal processing error",
                     "detail": None,
                 },
             )
+        return _multipart_response([
+            ("encrypted_file", f"{safe_name}.enc", encrypted),
+            ("key_file", f"{safe_name}.key", key_bundle),
+        ])
 
-        expires_at_str = expires_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+    job = {
+        "file_id": file_id,
+        "status": "queued",
+        "job_type": "encrypt",
+        "original_filename": safe_name,
+        "file_type": file_type,
+        "created_at": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "expires_at": expires_at_str,
+        "error": None,
+        "result_paths": {},
+        "original_path": f"files/{src_path.name}",
+    }
 
+    # Dedup: an identical (content, password, name, parameters) request within TTL
+    # reuses the published ciphertext + key bundle. Only with a caller-supplied
+    # password — auto-generated keys must never be shared between uploads.
+    cas_key = None
+    if settings.dedup_enabled and password:
+        cas_key = await run_in_threadpool(
+            _content_key, results, content, password, safe_name, file_type, seekable
+        )
+        cached = results.acquire(cas_key, temp_dir, settings.file_ttl_seconds)
+        if cached is not None:
+            file_svc.register(file_id, {
+                **job,
+                "status": "complete",
+                "result_paths": cached,
+                "original_path": None,
+                "cas_key": cas_key,
+            })
+            return AcceptedResponse(
+                file_id=file_id,
+                status="complete",
+                poll_url=f"/api/files/{file_id}",
+                original_filename=safe_name,
+                file_type=file_type,
+                expires_at=expires_at_str,
+            )
+
+    await temp_io.makedirs(src_path.parent)
+    await temp_io.write_bytes(src_path, content)
+
+    # D-12/WR-02: wrap register + enqueue in try/finally to clean up on any error
+    try:
         # D-05: write sidecar before adding background task
-        file_svc.register(file_id, {
-            "file_id": file_id,
-            "status": "queued",
-            "job_type": "encrypt",
-            "original_filename": safe_name,
-            "file_type": file_type,
-            "created_at": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
-            "expires_at": expires_at_str,
-            "error": None,
-            "result_paths": {},
-            "original_path": f"files/{src_path.name}",
-        })
+        file_svc.register(file_id, job)
 
         background_tasks.add_task(
             _run_encrypt_job, file_id, str(src_path), safe_name,
-            file_type, password, file_svc, settings,
+            file_type, password, file_svc, settings, results, cas_key, seekable,
         )
 
         return AcceptedResponse(
@@ -135,10 +194,10 @@ async def encrypt_file(
             expires_at=expires_at_str,
         )
     except HTTPException:
-        src_path.unlink(missing_ok=True)
+        await temp_io.unlink(src_path)
         raise
     except Exception:
-        src_path.unlink(missing_ok=True)
+        await temp_io.unlink(src_path)
         _logger.exception("Unexpected error in encrypt upload handler")
         raise HTTPException(
             status_code=500,
@@ -150,6 +209,271 @@ async def encrypt_file(
         )
 
 
+@router.post(
+    "/encrypt/stream",
+    response_model=AcceptedResponse,
+    summary="Encrypt a document while it is uploaded",
+    description=(
+        "Send the raw document as the request body (not multipart) with its name in the "
+        "`filename` query parameter and an optional password in the X-Encryption-Password "
+        "header. The body is encrypted as it arrives into a seekable container; the job is "
+        "already complete in the response, download the results via /api/files/{file_id}."
+    ),
+    responses={
+        400: {"model": ErrorResponse, "description": "Invalid filename"},
+        413: {"model": ErrorResponse, "description": "File exceeds size limit"},
+        415: {"model": ErrorResponse, "description": "Unsupported file format"},
+    },
+)
+async def encrypt_stream(
+    request: Request,
+    filename: str,
+    password: Optional[str] = Header(None, alias="X-Encryption-Password"),
+    settings: Settings = Depends(get_settings),
+    file_svc: FileService = Depends(get_file_service),
+):
+    safe_name = _sanitize_filename(filename)
+    extension_type = _validator.get_file_type(safe_name)
+
+    max_bytes = settings.max_file_size_mb * 1024 * 1024
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise _too_large(settings, int(declared))
+
+    file_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=settings.file_ttl_seconds)
+    expires_at_str = expires_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    files_dir = Path(settings.temp_dir) / "files"
+    enc_path = files_dir / f"{file_id}_encrypted.enc"
+    key_path = files_dir / f"{file_id}_key.key"
+
+    # Engine setup (PBKDF2 + RSA key pair) overlaps with receiving the first chunks. With an
+    # unrecognised extension the type depends on the content, so setup waits for the first bytes.
+    encryptor_task = None
+    if _validator.is_supported_format(extension_type):
+        encryptor_task = _start_stream_encryptor(password, extension_type, safe_name, enc_path)
+    file_type = None
+    try:
+        received = 0
+        pending: list = []
+        pending_len = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:
+                raise _too_large(settings, received)
+            pending.append(chunk)
+            pending_len += len(chunk)
+            if file_type is None:
+                if pending_len < ContentSniffer.HEAD_SIZE:
+                    continue
+                # The type is sniffed from the buffered head — the body is never read twice
+                file_type, encryptor_task = _sniff_stream_type(
+                    pending, encryptor_task, password, safe_name, enc_path
+                )
+            if pending_len >= CryptoSettings.SEGMENT_SIZE and encryptor_task.done():
+                encryptor = encryptor_task.result()
+                # Sealed segments go straight to enc_path behind a header carrying the type
+                encryptor.file_type = file_type
+                await run_in_threadpool(encryptor.update, b"".join(pending))
+                pending, pending_len = [], 0
+
+        if file_type is None:
+            file_type, encryptor_task = _sniff_stream_type(
+                pending, encryptor_task, password, safe_name, enc_path
+            )
+        encryptor = await encryptor_task
+        encryptor.file_type = file_type
+        await temp_io.makedirs(files_dir)
+        result_paths = await run_in_threadpool(
+            _finish_stream_encrypt, encryptor, b"".join(pending), enc_path, key_path
+        )
+        file_svc.register(file_id, {
+            "file_id": file_id,
+            "status": "complete",
+            "job_type": "encrypt",
+            "original_filename": safe_name,
+            "file_type": file_type,
+            "created_at": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "expires_at": expires_at_str,
+            "error": None,
+            "result_paths": result_paths,
+            "original_path": None,
+        })
+    except BaseException as exc:
+        if encryptor_task is not None:
+            if (encryptor_task.done() and not encryptor_task.cancelled()
+                    and encryptor_task.exception() is None):
+                # Closes enc_path if segments were already written to it
+                encryptor_task.result().close()
+            encryptor_task.cancel()
+        await temp_io.unlink(enc_path)
+        await temp_io.unlink(key_path)
+        if isinstance(exc, HTTPException) or not isinstance(exc, Exception):
+            raise
+        _logger.exception("Streaming encrypt failed for file_id=%s", file_id)
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error_code": "PROCESSING_FAILED",
+                "message": "Internal processing error",
+                "detail": None,
+            },
+        )
+
+    return AcceptedResponse(
+        file_id=file_id,
+        status="complete",
+        poll_url=f"/api/files/{file_id}",
+        original_filename=safe_name,
+        file_type=file_type,
+        expires_at=expires_at_str,
+    )
+
+
+def _encrypt_inline(
+    content: bytes,
+    original_filename: str,
+    file_type: str,
+    password: Optional[str],
+    seekable: bool,
+) -> tuple:
+    """Runs in ThreadPoolExecutor. Returns (container bytes, serialized key bundle)."""
+    key_manager = KeyManager()
+    if password is None:
+        password = key_manager.generate_master_password()
+    engine = EncryptionEngine(password=password, key_manager=key_manager)
+    encrypted = engine.encrypt(content, file_type, original_filename, seekable=seekable)
+    return encrypted, key_manager.serialize_key_bundle(engine.get_key_bundle())
+
+
+def _multipart_response(parts: list) -> Response:
+    """multipart/mixed body of (name, filename, bytes) parts."""
+    boundary = uuid.uuid4().hex
+    chunks = []
+    for name, filename, data in parts:
+        chunks.append(
+            f"--{boundary}\r\n"
+            f"Content-Type: application/octet-stream\r\n"
+            f"Content-Disposition: attachment; name=\"{name}\"; "
+            f"filename*=UTF-8''{quote(filename)}\r\n\r\n".encode("ascii")
+        )
+        chunks.append(data)
+        chunks.append(b"\r\n")
+    chunks.append(f"--{boundary}--\r\n".encode("ascii"))
+    return Response(
+        content=b"".join(chunks),
+        media_type=f"multipart/mixed; boundary={boundary}",
+    )
+
+
+def _sanitize_filename(raw_name: str) -> str:
+    """D-10/CR-03: strip all path components to prevent traversal."""
+    safe_name = Path(PurePosixPath(raw_name).name).name
+    if not safe_name:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error_code": "INVALID_FILENAME",
+                "message": "Filename is invalid or empty after sanitization",
+                "detail": None,
+            },
+        )
+    return safe_name
+
+
+def _checked_file_type(name: str, head: Optional[bytes] = None) -> str:
+    """Format from the first bytes of the upload when given, otherwise from the extension; 415 if unsupported."""
+    file_type = _validator.get_file_type(name, head)
+    if not _validator.is_supported_format(file_type):
+        raise HTTPException(
+            status_code=415,
+            detail={
+                "error_code": "UNSUPPORTED_FORMAT",
+                "message": f"File format '{file_type}' is not supported",
+                "detail": None,
+            },
+        )
+    return file_type
+
+
+def _too_large(settings: Settings, size: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail={
+            "error_code": "FILE_TOO_LARGE",
+            "message": f"File exceeds the {settings.max_file_size_mb} MB limit",
+            "detail": f"Received {size:,} bytes",
+        },
+    )
+
+
+def _start_stream_encryptor(password: Optional[str], file_type: str,
+                            original_filename: str, enc_path: Path) -> asyncio.Future:
+    return asyncio.ensure_future(
+        run_in_threadpool(_new_stream_encryptor, password, file_type, original_filename, enc_path)
+    )
+
+
+def _sniff_stream_type(pending: list, encryptor_task: Optional[asyncio.Future],
+                       password: Optional[str], original_filename: str,
+                       enc_path: Path) -> tuple:
+    """Checks the buffered head of a streamed upload; starts engine setup if it was deferred."""
+    head = b"".join(pending)[:ContentSniffer.HEAD_SIZE]
+    file_type = _checked_file_type(original_filename, head)
+    if encryptor_task is None:
+        encryptor_task = _start_stream_encryptor(password, file_type, original_filename, enc_path)
+    return file_type, encryptor_task
+
+
+def _new_stream_encryptor(password: Optional[str], file_type: str,
+                          original_filename: str, enc_path: Path) -> StreamEncryptor:
+    """Runs in ThreadPoolExecutor: PBKDF2 and RSA key generation."""
+    key_manager = KeyManager()
+    if password is None:
+        password = key_manager.generate_master_password()
+    engine = EncryptionEngine(password=password, key_manager=key_manager)
+    return engine.stream_encryptor(file_type, original_filename, sink=str(enc_path))
+
+
+def _finish_stream_encrypt(encryptor: StreamEncryptor, tail: bytes,
+                           enc_path: Path, key_path: Path) -> dict:
+    """Runs in ThreadPoolExecutor. Seals the last segments, completes the container + key bundle."""
+    encryptor.update(tail)
+    encryptor.finish()
+    engine = encryptor.engine
+    engine.key_manager.save_key_bundle(engine.get_key_bundle(), str(key_path))
+    return {
+        "encrypted_file": f"files/{enc_path.name}",
+        "key_file": f"files/{key_path.name}",
+    }
+
+
+def _content_key(
+    results: ResultStore,
+    content: bytes,
+    password: str,
+    original_filename: str,
+    file_type: str,
+    seekable: bool = False,
+) -> str:
+    """Content key for dedup. Runs in the thread pool — hashing large uploads is CPU-bound."""
+    params = (
+        f"{CryptoSettings.ENCRYPTION_VERSION}|{CryptoSettings.COMPRESSION_ENABLED}|"
+        f"{CryptoSettings.COMPRESSION_LEVEL}|{CryptoSettings.RSA_KEY_SIZE}|"
+        f"{CryptoSettings.PBKDF2_ITERATIONS}|"
+        f"{CryptoSettings.SEGMENT_SIZE if seekable else 0}"
+    )
+    return results.content_key("encrypt", [
+        hashlib.sha256(content).digest(),
+        hashlib.sha256(password.encode("utf-8")).digest(),
+        original_filename.encode("utf-8"),
+        file_type.encode("utf-8"),
+        params.encode("ascii"),
+    ])
+
+
 async def _run_encrypt_job(
     file_id: str,
     src_path: str,
@@ -158,14 +482,26 @@ async def _run_encrypt_job(
     password: Optional[str],
     file_svc: FileService,
     settings: Settings,
+    results: Optional[ResultStore] = None,
+    cas_key: Optional[str] = None,
+    seekable: bool = False,
 ) -> None:
     """Async wrapper — marks status, offloads CPU work to thread pool, updates status on completion."""
     file_svc.update_status(file_id, "processing")
     try:
         result_paths = await run_in_threadpool(
-            _sync_encrypt, file_id, src_path, original_filename, file_type, password, settings
+            _sync_encrypt, file_id, src_path, original_filename, file_type, password, settings,
+            seekable,
         )
-        file_svc.update_status(file_id, "complete", result_paths=result_paths)
+        extra = {}
+        if results is not None and cas_key:
+            published = await run_in_threadpool(
+                results.publish, cas_key, Path(settings.temp_dir), result_paths,
+                ("encrypted_file", "key_file"), settings.file_ttl_seconds,
+            )
+            if published is not None:
+                result_paths, extra = published, {"cas_key": cas_key}
+        file_svc.update_status(file_id, "complete", result_paths=result_paths, **extra)
     except Exception:
         # D-03/CR-02: log full traceback server-side; store only generic message in registry
         _logger.exception("Encrypt job failed for file_id=%s", file_id)
@@ -179,6 +515,7 @@ def _sync_encrypt(
     file_type: str,
     password: Optional[str],
     settings: Settings,
+    seekable: bool = False,
 ) -> dict:
     """Runs in ThreadPoolExecutor. May call blocking crypto freely. Returns result_paths dict."""
     key_manager = KeyManager()
@@ -186,17 +523,20 @@ def _sync_encrypt(
         password = key_manager.generate_master_password()
 
     engine = EncryptionEngine(password=password, key_manager=key_manager)
-    file_data = _file_handler.read_file(src_path)
-    encrypted_data = engine.encrypt(
-        data=file_data, file_type=file_type, original_filename=original_filename
-    )
 
     temp_dir = Path(settings.temp_dir)
     enc_path = temp_dir / "files" / f"{file_id}_encrypted.enc"
     key_path = temp_dir / "files" / f"{file_id}_key.key"
     enc_path.parent.mkdir(parents=True, exist_ok=True)
 
-    _file_handler.write_file(str(enc_path), encrypted_data)
+    # Large uploads are handed to the engine as a read-only mmap view (no f.read() copy);
+    # the container is written straight to enc_path without assembling it in memory.
+    with _file_handler.open_buffer(src_path) as file_data:
+        engine.encrypt_to(
+            data=file_data, file_type=file_type,
+            original_filename=original_filename, sink=str(enc_path),
+            seekable=seekable,
+        )
     key_manager.save_key_bundle(engine.get_key_bundle(), str(key_path))
 
     return {
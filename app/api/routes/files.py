@@ -1,37 +1,105 @@
 """
-GET /api/files/{file_id}          — poll job status
+GET /api/files/{file_id}          — poll job status (?wait=N long-polls for a status change)
 GET /api/files/{file_id}/download — stream processed result file
+GET /api/files/{file_id}/plaintext — decrypted content, honouring a single-range Range header
 
 Replaces the old GET /api/download/{file_id}/{file_type} endpoint.
 D-06/API-01: All 404s use structured error body with error_code=NOT_FOUND.
 D-13/WR-03: Download endpoint performs parts-based path containment check to prevent
             path traversal via registry rel_path.
+Plaintext of encrypt jobs is decrypted on demand from the stored container and key;
+seekable containers (core/segmented_container.py) decrypt only the segments covering
+the requested range, others are decrypted whole and sliced.
+Decrypt jobs over seekable containers (DECRYPT_STREAMING) store no plaintext: /download
+streams it segment by segment from the stored container, each segment authenticated by
+its own AEAD tag. Non-segmented decrypt results are plain files served as-is.
 """
+import asyncio
+import logging
 import os
+import re
+import time
+from contextlib import ExitStack
 from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import quote
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 from app.api.deps import get_file_service
 from app.config import Settings, get_settings
 from app.schemas.common import JobStatusResponse, ErrorResponse
 from app.services.file_service import FileService
+from app.services.shredder import hold_file, shred_queue
+from core.decryption_engine import DecryptionEngine
+from core.header_parser import parse_header
+from core.key_manager import KeyManager
+from utils.file_handler import FileHandler
 
 router = APIRouter(prefix="/api/files", tags=["files"])
+_logger = logging.getLogger(__name__)
+
+_ACTIVE_STATUSES = ("queued", "processing")
+# Long-poll check interval; each check is one change_token() call, rows are re-read only on change
+_WAIT_POLL_SECONDS = 0.05
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class _HeldFileResponse(FileResponse):
+    """FileResponse that keeps a shred hold on its file until the body has been sent.
+
+    The TTL sweep overwrites expired files in place; the hold makes it wait for
+    downloads still in flight instead of turning them into random bytes.
+    """
+
+    def __init__(self, path: Path, **kwargs):
+        try:
+            self._hold = hold_file(path)
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=404,
+                detail={
+                    "error_code": "NOT_FOUND",
+                    "message": "Result file no longer available",
+                    "detail": None,
+                },
+            )
+        super().__init__(path=str(path), **kwargs)
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._hold.release()
+
+
+class _RangeNotSatisfiable(Exception):
+    """The Range header does not overlap the plaintext (HTTP 416)."""
+
+    def __init__(self, size: int):
+        super().__init__(size)
+        self.size = size
 
 
 @router.get(
     "/{file_id}",
     response_model=JobStatusResponse,
     summary="Get job status",
-    description="Poll the processing status of an upload job by file_id. Returns 200 for all known jobs including failed ones. Returns 404 when file_id is unknown.",
+    description=(
+        "Poll the processing status of an upload job by file_id. Returns 200 for all known jobs "
+        "including failed ones. Returns 404 when file_id is unknown. With wait=N the request "
+        "is held for up to N seconds until a queued/processing job changes status."
+    ),
     responses={
         404: {"model": ErrorResponse, "description": "Job not found"},
     },
 )
 async def get_job_status(
     file_id: str,
+    wait: float = Query(0, ge=0, le=30),
     file_svc: FileService = Depends(get_file_service),
 ):
     """GET /api/files/{file_id} — poll job state.
@@ -41,6 +109,8 @@ async def get_job_status(
     Returns 404 only when the file_id does not exist at all.
     """
     entry = file_svc.get(file_id)
+    if entry is not None and wait and entry.get("status") in _ACTIVE_STATUSES:
+        entry = await _wait_for_status_change(file_svc, file_id, entry, wait)
     if entry is None:
         raise HTTPException(
             status_code=404,
@@ -74,7 +144,7 @@ async def get_job_status(
     description=(
         "Download the processed file once status is 'complete'. "
         "Use query parameter `type` to select which artifact to download: "
-        "'encrypted' (default for encrypt jobs), 'key' (JSON key bundle), "
+        "'encrypted' (default for encrypt jobs), 'key' (binary key bundle, core/key_bundle_format.py), "
         "'decrypted' (default for decrypt jobs), or 'auto' (picks based on job type)."
     ),
     responses={
@@ -95,27 +165,8 @@ async def download_result(
     Does NOT delete the result file — that is handled by the TTL cleanup task.
     D-13/WR-03: path containment check prevents traversal via registry rel_path.
     """
-    entry = file_svc.get(file_id)
-    if entry is None:
-        raise HTTPException(
-            status_code=404,
-            detail={
-                "error_code": "NOT_FOUND",
-                "message": "Job not found",
-                "detail": None,
-            },
-        )
-
+    entry = _completed_entry(file_svc, file_id)
     status = entry.get("status")
-    if status != "complete":
-        raise HTTPException(
-            status_code=404,
-            detail={
-                "error_code": "NOT_FOUND",
-                "message": f"File not ready for download — current status: {status}",
-                "detail": None,
-            },
-        )
 
     result_paths = entry.get("result_paths") or {}
     temp_dir = Path(settings.temp_dir)
@@ -124,11 +175,49 @@ async def download_result(
     job_type = entry.get("job_type", "encrypt")
     original = entry.get("original_filename", "file")
 
+    if job_type == "decrypt" and result_paths.get("encrypted_file"):
+        # Streamed decrypt result: only the plaintext is offered, never the stored key copy
+        if type not in ("auto", "decrypted"):
+            raise HTTPException(
+                status_code=404,
+                detail={
+                    "error_code": "NOT_FOUND",
+                    "message": f"No '{type}' file available for this job",
+                    "detail": None,
+                },
+            )
+        enc_path = _resolve_result_path(temp_dir, result_paths["encrypted_file"])
+        key_path = _resolve_result_path(temp_dir, result_paths["key_file"])
+        try:
+            metadata, chunks = await run_in_threadpool(
+                _open_plaintext_stream, str(enc_path), str(key_path)
+            )
+        except Exception:
+            _logger.exception("Streaming download failed for file_id=%s", file_id)
+            raise HTTPException(
+                status_code=500,
+                detail={
+                    "error_code": "PROCESSING_FAILED",
+                    "message": "Internal processing error",
+                    "detail": None,
+                },
+            )
+        download_name = Path(result_paths.get("original_filename") or original).name or "decrypted_file"
+        return StreamingResponse(
+            chunks,
+            media_type="application/octet-stream",
+            headers={
+                "Content-Length": str(metadata["original_size"]),
+                "Content-Disposition": f"attachment; filename*=UTF-8''{quote(download_name)}",
+            },
+        )
+
     if type == "key":
         rel_path = result_paths.get("key_file")
         download_name = f"{original}.key"
-        media_type = "application/json"
-    elif type == "encrypted" or (type == "auto" and job_type == "encrypt"):
+        # Binary key-bundle format (core/key_bundle_format.py); legacy bundles were JSON
+        media_type = "application/octet-stream"
+    elif type == "encrypted" or (type == "auto" and job_type in ("encrypt", "rewrap")):
         rel_path = result_paths.get("encrypted_file")
         download_name = f"{original}.enc"
         media_type = "application/octet-stream"
@@ -156,6 +245,229 @@ async def download_result(
             },
         )
 
+    # The result is held from here until its body is sent (see _HeldFileResponse)
+    response = _HeldFileResponse(
+        _resolve_result_path(temp_dir, rel_path),
+        media_type=media_type,
+        filename=download_name,
+    )
+
+    # D-09: delete original AFTER building FileResponse (FileResponse streams lazily,
+    # but the path is recorded now — safe to shred the source, not the result).
+    # The uploaded original is queued for background shredding, not unlinked inline.
+    # T-02-03-03 mitigation: clear original_path in sidecar after the first download so
+    # repeated downloads do not queue it again.
+    original_path = entry.get("original_path")
+    if original_path:
+        shred_queue.enqueue(temp_dir / original_path)
+        file_svc.update_status(file_id, status, original_path=None)
+
+    return response
+
+
+@router.get(
+    "/{file_id}/plaintext",
+    summary="Read decrypted content (Range-aware)",
+    description=(
+        "Return the decrypted document of a completed encrypt or decrypt job. A single "
+        "`Range: bytes=start-end` header yields 206 Partial Content; for containers "
+        "encrypted with seekable=true only the segments covering the range are decrypted."
+    ),
+    responses={
+        206: {"description": "Requested byte range of the plaintext"},
+        400: {"model": ErrorResponse, "description": "Job type has no plaintext or invalid file reference"},
+        404: {"model": ErrorResponse, "description": "Job not found or not complete"},
+        416: {"model": ErrorResponse, "description": "Range not satisfiable"},
+    },
+)
+async def read_plaintext(
+    file_id: str,
+    range: Optional[str] = Header(None),
+    settings: Settings = Depends(get_settings),
+    file_svc: FileService = Depends(get_file_service),
+):
+    entry = _completed_entry(file_svc, file_id)
+    result_paths = entry.get("result_paths") or {}
+    temp_dir = Path(settings.temp_dir)
+    job_type = entry.get("job_type")
+
+    if job_type == "decrypt" and result_paths.get("decrypted_file"):
+        # FileResponse answers Range requests on its own
+        return _HeldFileResponse(
+            _resolve_result_path(temp_dir, result_paths["decrypted_file"]),
+            media_type="application/octet-stream",
+        )
+
+    if (job_type not in ("encrypt", "decrypt")
+            or not result_paths.get("encrypted_file") or not result_paths.get("key_file")):
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error_code": "INVALID_TYPE",
+                "message": f"No plaintext available for '{job_type}' jobs",
+                "detail": None,
+            },
+        )
+
+    enc_path = _resolve_result_path(temp_dir, result_paths["encrypted_file"])
+    key_path = _resolve_result_path(temp_dir, result_paths["key_file"])
+
+    try:
+        body, span, size = await run_in_threadpool(
+            _read_plaintext, str(enc_path), str(key_path), range
+        )
+    except _RangeNotSatisfiable as exc:
+        raise HTTPException(
+            status_code=416,
+            detail={
+                "error_code": "RANGE_NOT_SATISFIABLE",
+                "message": "Requested range does not overlap the document",
+                "detail": f"Document size is {exc.size:,} bytes",
+            },
+            headers={"Content-Range": f"bytes */{exc.size}"},
+        )
+
+    headers = {"Accept-Ranges": "bytes"}
+    if span is None:
+        return Response(content=body, media_type="application/octet-stream", headers=headers)
+    headers["Content-Range"] = f"bytes {span[0]}-{span[1] - 1}/{size}"
+    return Response(
+        content=body, status_code=206, media_type="application/octet-stream", headers=headers
+    )
+
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Resolve a single-range `Range` header to [start, end).
+
+    Returns None (serve the whole document) when there is no header or it is one
+    we do not handle — multiple ranges, other units — as RFC 9110 permits.
+    Raises _RangeNotSatisfiable when the range lies outside the document.
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        suffix = int(last)
+        if suffix == 0:
+            raise _RangeNotSatisfiable(size)
+        return max(size - suffix, 0), size
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise _RangeNotSatisfiable(size)
+    end = size if not last else min(int(last) + 1, size)
+    return start, end
+
+
+def _open_plaintext_stream(enc_path: str, key_path: str):
+    """Runs in ThreadPoolExecutor. Verifies the stored container; returns (metadata, chunk iterator).
+
+    The container stays mapped (and held against shredding) until StreamingResponse
+    exhausts or closes the iterator.
+    """
+    key_manager = KeyManager()
+    engine = DecryptionEngine(key_bundle=key_manager.load_key_bundle(key_path),
+                              key_manager=key_manager)
+    stack = ExitStack()
+    try:
+        stack.enter_context(hold_file(enc_path))
+        data = stack.enter_context(FileHandler.open_buffer(enc_path))
+    except BaseException:
+        stack.close()
+        raise
+    try:
+        metadata, chunks = engine.decrypt_stream(data)
+    except BaseException:
+        stack.close()
+        raise
+
+    def generate():
+        with stack:
+            try:
+                yield from chunks
+            finally:
+                close = getattr(chunks, "close", None)
+                if close is not None:
+                    close()
+
+    return metadata, generate()
+
+
+def _read_plaintext(enc_path: str, key_path: str,
+                    range_header: Optional[str]) -> Tuple[bytes, Optional[Tuple[int, int]], int]:
+    """Runs in ThreadPoolExecutor. Returns (body, [start, end) or None, plaintext size)."""
+    key_manager = KeyManager()
+    engine = DecryptionEngine(key_bundle=key_manager.load_key_bundle(key_path),
+                              key_manager=key_manager)
+
+    with hold_file(enc_path), FileHandler.open_buffer(enc_path) as data:
+        header = parse_header(data)
+        span = _parse_range(range_header, header.original_size)
+        if header.flags["segmented"]:
+            start, end = span or (0, header.original_size)
+            body = engine.decrypt_range(data, start, end - start)
+        else:
+            plaintext = engine.decrypt(data)["data"]
+            body = plaintext if span is None else plaintext[span[0]:span[1]]
+        size = header.original_size
+        del header
+    return body, span, size
+
+
+async def _wait_for_status_change(file_svc: FileService, file_id: str, entry: dict,
+                                  timeout: float) -> dict:
+    """Return the entry once its status differs from entry's (or it is deleted), or at timeout.
+
+    Polls file_svc.change_token(), which also reflects writes made by other worker
+    processes when the registry is shared, and re-reads the job only when it moved.
+    """
+    deadline = time.monotonic() + timeout
+    status = entry.get("status")
+    token = file_svc.change_token()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(_WAIT_POLL_SECONDS)
+        current = file_svc.change_token()
+        if current == token:
+            continue
+        token = current
+        latest = file_svc.get(file_id)
+        if latest is None or latest.get("status") != status:
+            return latest
+    return entry
+
+
+def _completed_entry(file_svc: FileService, file_id: str) -> dict:
+    """Registry entry of a completed job, or 404."""
+    entry = file_svc.get(file_id)
+    if entry is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "error_code": "NOT_FOUND",
+                "message": "Job not found",
+                "detail": None,
+            },
+        )
+
+    status = entry.get("status")
+    if status != "complete":
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "error_code": "NOT_FOUND",
+                "message": f"File not ready for download — current status: {status}",
+                "detail": None,
+            },
+        )
+    return entry
+
+
+def _resolve_result_path(temp_dir: Path, rel_path: str) -> Path:
+    """Absolute path of a result file inside temp_dir (D-13/WR-03), or 400/404."""
     file_path = temp_dir / rel_path
     resolved = file_path.resolve()
     temp_resolved = temp_dir.resolve()
@@ -181,17 +493,4 @@ async def download_result(
             },
         )
 
-    # D-09: delete original AFTER building FileResponse (FileResponse streams lazily,
-    # but the path is recorded now — safe to unlink the source, not the result).
-    # T-02-03-03 mitigation: clear original_path in sidecar after first unlink so
-    # repeated downloads call unlink(missing_ok=True) on None which is a no-op.
-    original_path = entry.get("original_path")
-    if original_path:
-        (temp_dir / original_path).unlink(missing_ok=True)
-        file_svc.update_status(file_id, status, original_path=None)
-
-    return FileResponse(
-        path=str(resolved),
-        media_type=media_type,
-        filename=download_name,
-    )
+    return resolved
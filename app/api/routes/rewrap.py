@@ -0,0 +1,195 @@
+"""
+POST /api/rewrap — async job that rotates a container's key wrapping (HTTP 202).
+
+Replaces the RSA-wrapped keys section of an encrypted container and re-issues
+its key bundle (new RSA key pair and/or bundle password) without decrypting or
+re-encrypting the payload — see core/key_rotation.py.
+
+D-03: Returns AcceptedResponse; poll /api/files/{file_id}, then download type=encrypted / type=key.
+D-04/D-11/WR-01: Size check BEFORE write_bytes — oversized input never hits disk.
+D-12: Non-container uploads are rejected with 422 before anything is written.
+D-12/WR-02: try/except ensures both temp files are cleaned in all error paths.
+D-03/CR-02: Background task stores generic error string, not raw exception.
+Temp-dir writes/unlinks go through app.services.temp_io so large uploads never block the event loop.
+"""
+import logging
+import os
+import struct
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.api.deps import get_file_service
+from app.config import Settings, get_settings
+from app.schemas.common import AcceptedResponse, ErrorResponse
+from app.services import temp_io
+from app.services.file_service import FileService
+from core.header_parser import parse_header
+from core.key_manager import KeyManager
+from core.key_rotation import KeyRotator
+
+router = APIRouter(prefix="/api", tags=["encryption"])
+
+_logger = logging.getLogger(__name__)
+
+
+@router.post(
+    "/rewrap",
+    response_model=AcceptedResponse,
+    status_code=202,
+    summary="Rotate the key wrapping of an encrypted document",
+    description=(
+        "Upload an encrypted file and its key file. The symmetric keys are re-wrapped "
+        "under a new RSA key pair (unless rotate_rsa=false) and the key bundle is re-issued "
+        "with new_password; the encrypted payload is not re-encrypted. Returns a job ID "
+        "immediately (HTTP 202). Poll /api/files/{file_id} for status."
+    ),
+    responses={
+        413: {"model": ErrorResponse, "description": "File exceeds size limit"},
+        422: {"model": ErrorResponse, "description": "Not an encrypted document or validation error"},
+    },
+)
+async def rewrap_file(
+    encrypted_file: UploadFile = File(...),
+    key_file: UploadFile = File(...),
+    password: str = Form(None),
+    new_password: str = Form(None),
+    rotate_rsa: bool = Form(True),
+    background_tasks: BackgroundTasks = BackgroundTasks(),
+    settings: Settings = Depends(get_settings),
+    file_svc: FileService = Depends(get_file_service),
+):
+    # D-08: read BOTH UploadFiles NOW — both are closed after endpoint returns
+    enc_content: bytes = await encrypted_file.read()
+    key_content: bytes = await key_file.read()
+
+    max_bytes = settings.max_file_size_mb * 1024 * 1024
+    if len(enc_content) > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail={
+                "error_code": "FILE_TOO_LARGE",
+                "message": f"Encrypted file exceeds the {settings.max_file_size_mb} MB limit",
+                "detail": f"Received {len(enc_content):,} bytes",
+            },
+        )
+
+    try:
+        header = parse_header(enc_content)
+    except (ValueError, struct.error) as exc:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "error_code": "INVALID_ENCRYPTED_FILE",
+                "message": "File is not a valid encrypted document",
+                "detail": str(exc),
+            },
+        )
+
+    file_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=settings.file_ttl_seconds)
+    expires_at_str = expires_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    files_dir = Path(settings.temp_dir) / "files"
+    enc_path = files_dir / f"{file_id}_src.enc"
+    key_path = files_dir / f"{file_id}_src.key"
+    await temp_io.makedirs(files_dir)
+    await temp_io.write_bytes(enc_path, enc_content)
+    await temp_io.write_bytes(key_path, key_content)
+
+    try:
+        file_svc.register(file_id, {
+            "file_id": file_id,
+            "status": "queued",
+            "job_type": "rewrap",
+            "original_filename": header.filename,
+            "file_type": header.file_type,
+            "created_at": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "expires_at": expires_at_str,
+            "error": None,
+            "result_paths": {},
+            "original_path": f"files/{enc_path.name}",
+        })
+
+        background_tasks.add_task(
+            _run_rewrap_job, file_id, str(enc_path), str(key_path),
+            password, new_password, rotate_rsa, file_svc, settings,
+        )
+
+        return AcceptedResponse(
+            file_id=file_id,
+            status="queued",
+            poll_url=f"/api/files/{file_id}",
+            original_filename=header.filename,
+            file_type=header.file_type,
+            expires_at=expires_at_str,
+        )
+    except Exception:
+        await temp_io.unlink(enc_path)
+        await temp_io.unlink(key_path)
+        _logger.exception("Unexpected error in rewrap upload handler")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error_code": "PROCESSING_FAILED",
+                "message": "Internal processing error",
+                "detail": None,
+            },
+        )
+
+
+async def _run_rewrap_job(
+    file_id: str,
+    enc_path: str,
+    key_path: str,
+    password: Optional[str],
+    new_password: Optional[str],
+    rotate_rsa: bool,
+    file_svc: FileService,
+    settings: Settings,
+) -> None:
+    """Async wrapper — marks status, offloads RSA work to thread pool, updates status on completion."""
+    file_svc.update_status(file_id, "processing")
+    try:
+        result_paths = await run_in_threadpool(
+            _sync_rewrap, file_id, enc_path, key_path, password, new_password, rotate_rsa, settings
+        )
+        file_svc.update_status(file_id, "complete", result_paths=result_paths)
+    except Exception:
+        _logger.exception("Rewrap job failed for file_id=%s", file_id)
+        file_svc.update_status(file_id, "failed", error="Processing failed")
+
+
+def _sync_rewrap(
+    file_id: str,
+    enc_path: str,
+    key_path: str,
+    password: Optional[str],
+    new_password: Optional[str],
+    rotate_rsa: bool,
+    settings: Settings,
+) -> dict:
+    """Runs in ThreadPoolExecutor. Patches the uploaded container in place, then renames it."""
+    try:
+        key_manager = KeyManager()
+        key_bundle = key_manager.load_key_bundle(key_path, password)
+        rotator = KeyRotator(key_bundle, key_manager, rotate_rsa=rotate_rsa)
+
+        files_dir = Path(settings.temp_dir) / "files"
+        out_enc = files_dir / f"{file_id}_encrypted.enc"
+        out_key = files_dir / f"{file_id}_key.key"
+        rotator.rewrap_file(enc_path)
+        os.replace(enc_path, out_enc)
+        rotator.save_bundle(str(out_key), new_password)
+    finally:
+        Path(key_path).unlink(missing_ok=True)
+
+    return {
+        "encrypted_file": f"files/{out_enc.name}",
+        "key_file": f"files/{out_key.name}",
+    }
@@ -5,7 +5,7 @@ Crypto constants live in config/settings.py and config/constants.py — not here
 """
 from functools import lru_cache
 
-from pydantic import Field
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -22,12 +22,57 @@ class Settings(BaseSettings):
     temp_dir: str = Field(default="/tmp/enc_service")
     max_file_size_mb: int = Field(default=50, ge=1, le=500)
 
+    # Threads dedicated to temp_dir file I/O (separate from the crypto thread pool)
+    io_workers: int = Field(default=4, ge=1, le=64)
+
+    # Expired and downloaded job files are shredded on a background pool: each file is
+    # overwritten shred_passes times before removal (0 = plain unlink), shred_workers at a time
+    shred_passes: int = Field(default=1, ge=0, le=7)
+    shred_workers: int = Field(default=1, ge=1, le=16)
+
     # CORS
     cors_origins: str = Field(default="*")
 
+    # Content-addressed dedup of identical encrypt/decrypt requests (opt-in)
+    dedup_enabled: bool = Field(default=False)
+
+    # Inline processing (?mode=sync|auto): uploads up to this size may be encrypted/decrypted
+    # in the request and returned in the response; larger ones always use the 202 job flow
+    sync_max_file_size_kb: int = Field(default=1024, ge=0)
+    # Mode used when the request has no ?mode: "async" (202 + poll) or "auto" (inline when small)
+    default_job_mode: str = Field(default="async", pattern="^(async|auto)$")
+
+    # Job registry: "memory" (per process, JSON sidecars) or "sqlite" (WAL database in the
+    # jobs dir, shared by all uvicorn workers on the node). The dedup index and its reference
+    # counts stay per process, so dedup_enabled cannot be combined with "sqlite".
+    job_registry: str = Field(default="memory", pattern="^(memory|sqlite)$")
+
+    # Write-behind job persistence for the memory registry: status updates are queued and
+    # appended to jobs/journal.log in batches by a background thread instead of rewriting a
+    # sidecar per transition. Fsync policy: "batch" (every flush), "interval" (at most once
+    # a second) or "never" (left to the OS). register() is written before the 202; status
+    # updates newer than the last flush are lost on a crash.
+    job_write_behind: bool = Field(default=False)
+    job_journal_fsync: str = Field(default="batch", pattern="^(batch|interval|never)$")
+    job_flush_interval_ms: int = Field(default=50, ge=0, le=5000)
+
+    # Decrypt jobs over seekable (segmented) containers keep the verified container and an
+    # unprotected copy of the key bundle instead of writing the plaintext to disk; downloads
+    # decrypt segment by segment on the fly. Non-segmented containers have no per-segment
+    # authentication, so they are always decrypted whole into a temp file.
+    decrypt_streaming: bool = Field(default=True)
+
     # Cleanup TTL
     file_ttl_seconds: int = Field(default=3600, gt=0)
 
+    @model_validator(mode="after")
+    def _check_dedup_registry(self) -> "Settings":
+        # Any worker may expire a job from the shared registry, but only the worker that
+        # published its CAS entry can release it, so the files would leak
+        if self.dedup_enabled and self.job_registry == "sqlite":
+            raise ValueError("DEDUP_ENABLED is not supported with JOB_REGISTRY=sqlite")
+        return self
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
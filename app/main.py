@@ -19,9 +19,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
-from app.api.routes import encrypt, decrypt, files, health, keys, inspect
+from app.api.routes import encrypt, decrypt, files, health, keys, inspect, rewrap
 from app.config import get_settings
+from app.services import temp_io
 from app.services.file_service import file_service
+from app.services.result_store import result_store
+from app.services.shredder import shred_queue
 
 _logger = logging.getLogger(__name__)
 
@@ -30,7 +33,8 @@ async def _periodic_cleanup(file_svc, temp_dir: Path, settings) -> None:
     """Delete expired jobs every 5 minutes. Per D-10/D-11 and FILE-06.
 
     Runs as an asyncio background task started in the lifespan context manager.
-    Cancelled cleanly on shutdown (T-02-01-02 mitigation).
+    Cancelled cleanly on shutdown (T-02-01-02 mitigation). Expired files are handed
+    to the background shred queue, so a sweep over large files never blocks the event loop.
     """
     interval = 300  # 5 minutes
     while True:
@@ -51,19 +55,25 @@ async def _periodic_cleanup(file_svc, temp_dir: Path, settings) -> None:
                 continue
             if now >= expires_at:
                 # Delete associated files (missing_ok prevents cleanup loop crash)
+                # Shared CAS results are refcounted: drop this job's reference and
+                # unlink only when it was the last one.
                 result_paths = entry.get("result_paths") or {}
                 for rel_path in result_paths.values():
-                    if rel_path:
-                        (temp_dir / rel_path).unlink(missing_ok=True)
+                    if rel_path and not result_store.owns(rel_path):
+                        shred_queue.enqueue(temp_dir / rel_path)
+                cas_key = entry.get("cas_key")
+                if cas_key:
+                    for rel_path in result_store.release(cas_key):
+                        shred_queue.enqueue(temp_dir / rel_path)
                 orig = entry.get("original_path")
                 if orig:
-                    (temp_dir / orig).unlink(missing_ok=True)
+                    shred_queue.enqueue(temp_dir / orig)
                 file_svc.delete(file_id)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Startup: create dirs, restore job state, launch TTL cleanup. Shutdown: cancel cleanup."""
+    """Startup: create dirs, restore job state, re-queue leftover shreds, launch TTL cleanup. Shutdown: cancel cleanup, flush jobs, drain shredding, stop I/O pool."""
     settings = get_settings()
     temp_dir = Path(settings.temp_dir)
     (temp_dir / "jobs").mkdir(parents=True, exist_ok=True)
@@ -72,6 +82,13 @@ async def lifespan(app: FastAPI):
     restored = file_service.restore_from_disk(temp_dir)
     if restored:
         _logger.info("Restored %d job(s) from disk on startup", restored)
+        result_store.restore_from_jobs(
+            entry for entry in map(file_service.get, file_service.all_ids()) if entry
+        )
+    # Files moved aside for shredding by a process that crashed before finishing them
+    recovered = shred_queue.recover(temp_dir / "files")
+    if recovered:
+        _logger.info("Re-queued %d file(s) left over for shredding", recovered)
 
     cleanup_task = asyncio.create_task(
         _periodic_cleanup(file_service, temp_dir, settings)
@@ -82,6 +99,9 @@ async def lifespan(app: FastAPI):
         await cleanup_task
     except asyncio.CancelledError:
         pass
+    file_service.close()
+    shred_queue.shutdown()
+    temp_io.shutdown_io_executor()
 
 
 settings = get_settings()
@@ -105,7 +125,9 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException)
             "detail": None,
         }
     _logger.warning("HTTP %d %s: %s", exc.status_code, request.url.path, body.get("error_code"))
-    return JSONResponse(status_code=exc.status_code, content=body)
+    return JSONResponse(
+        status_code=exc.status_code, content=body, headers=getattr(exc, "headers", None)
+    )
 
 
 @app.exception_handler(RequestValidationError)
@@ -139,6 +161,7 @@ app.include_router(keys.router)        # NEW — per D-05, KEY-01
 app.include_router(inspect.router)     # NEW — registered BEFORE files.router (Pitfall 6)
 app.include_router(encrypt.router)
 app.include_router(decrypt.router)
+app.include_router(rewrap.router)
 app.include_router(files.router)       # files router LAST among /api/files/* routes
 
 # Conditional UI mount — D-07, UI-01
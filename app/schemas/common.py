@@ -57,7 +57,7 @@ class JobStatusResponse(BaseModel):
     """
     file_id: str
     status: str                          # queued | processing | complete | failed
-    job_type: str                        # encrypt | decrypt
+    job_type: str                        # encrypt | decrypt | rewrap
     original_filename: str
     file_type: str
     expires_at: str                      # ISO 8601 UTC
@@ -84,6 +84,9 @@ class InspectFlagsResponse(BaseModel):
     rsa_protected: bool
     integrity_check: bool
     metadata_encrypted: bool
+    key_fingerprint: bool = False
+    segmented: bool = False
+    office_zip: bool = False
 
 
 class InspectResponse(BaseModel):
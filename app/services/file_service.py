@@ -6,35 +6,140 @@ so that job state survives container restarts (FILE-08, D-04, D-05).
 
 threading.Lock (not asyncio.Lock) is used because background encryption/decryption
 tasks run in a ThreadPoolExecutor where asyncio primitives are not safe to await.
+
+Jobs are stored as immutable JobRecord snapshots (__slots__, interned enum-like
+strings, read-only result_paths) instead of free-form dicts: a record is a
+fraction of the size of the equivalent dict, and because it is never mutated,
+get() hands out the stored record itself with no lock and no copy. Writers
+build a new record and swap it in under one of _LOCK_STRIPES locks chosen by
+file_id, so pollers never contend with workers and workers updating different
+jobs rarely contend with each other. bench_jobs.py measures the footprint.
+
+This registry is per process. JOB_REGISTRY=sqlite selects the SQLite-backed
+variant in app/services/job_registry.py, shared by all uvicorn workers on a node;
+JOB_WRITE_BEHIND=true selects the journaling variant in app/services/job_journal.py,
+which moves sidecar writes off the request and worker paths.
 """
+import itertools
 import json
+import sys
 import threading
+from collections.abc import Mapping
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Optional
+
+_LOCK_STRIPES = 64
+
+_MISSING = object()
+_EMPTY = MappingProxyType({})
+
+
+class JobRecord(Mapping):
+    """Immutable snapshot of one job, readable like the dict it replaces.
+
+    Known fields live in slots; any other key goes to a small `extra` mapping.
+    Missing fields behave like missing dict keys (entry.get() returns None).
+    """
+
+    FIELDS = (
+        "file_id", "status", "job_type", "original_filename", "file_type",
+        "created_at", "expires_at", "error", "result_paths", "original_path", "cas_key",
+    )
+    # Small closed vocabularies: one shared string object per value across all records
+    _INTERNED = frozenset(("status", "job_type", "file_type"))
+
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, data: Mapping) -> None:
+        extra = None
+        for key in self.FIELDS:
+            object.__setattr__(self, key, _MISSING)
+        for key, value in data.items():
+            if key in self._INTERNED and type(value) is str:
+                value = sys.intern(value)
+            elif key == "result_paths" and value is not None:
+                value = MappingProxyType(dict(value)) if value else _EMPTY
+            if key in JobRecord.FIELDS:
+                object.__setattr__(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        object.__setattr__(self, "_extra", MappingProxyType(extra) if extra else _EMPTY)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("JobRecord is immutable; use replace()")
+
+    def replace(self, **changes: Any) -> "JobRecord":
+        """New record with `changes` merged in (the update_status semantics)."""
+        return JobRecord({**self, **changes})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain-dict copy for JSON serialization."""
+        data = dict(self)
+        if isinstance(data.get("result_paths"), Mapping):
+            data["result_paths"] = dict(data["result_paths"])
+        return data
+
+    # -- Mapping ---------------------------------------------------------------
+
+    def __getitem__(self, key: str) -> Any:
+        if key in JobRecord.FIELDS:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                return value
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.FIELDS:
+            if getattr(self, key) is not _MISSING:
+                yield key
+        yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"JobRecord({self.to_dict()!r})"
 
 
 class FileService:
     """Thread-safe job registry backed by JSON sidecar files on disk.
 
-    All public methods acquire self._lock before touching _storage.
-    _write_sidecar() MUST be called with the lock already held.
+    Reads are lock-free: _storage maps file_id to an immutable JobRecord and a
+    single dict lookup is atomic. Writers hold the stripe lock for the file_id
+    (_stripe()) while replacing the record, and _write_sidecar() MUST be called
+    with that lock held so sidecar writes for one job stay ordered.
     """
 
     def __init__(self, jobs_dir: Path) -> None:
-        self._storage: Dict[str, Dict[str, Any]] = {}
-        self._lock = threading.Lock()
+        self._storage: Dict[str, JobRecord] = {}
+        self._stripes = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        self._changes = itertools.count(1)
+        self._revision = 0
         self._jobs_dir = jobs_dir
         self._jobs_dir.mkdir(parents=True, exist_ok=True)
 
-    def register(self, file_id: str, metadata: Dict[str, Any]) -> None:
+    def _stripe(self, file_id: str) -> threading.Lock:
+        return self._stripes[hash(file_id) % _LOCK_STRIPES]
+
+    def _bump(self) -> None:
+        # next() on itertools.count is atomic, so no lock is needed across stripes
+        self._revision = next(self._changes)
+
+    def register(self, file_id: str, metadata: Mapping) -> None:
         """Store metadata and write JSON sidecar.
 
         Called from async endpoint before 202 is returned so the sidecar exists
         before any background task starts — prevents orphaned file_ids on crash.
         """
-        with self._lock:
-            self._storage[file_id] = metadata
-            self._write_sidecar(file_id, metadata)
+        record = JobRecord(metadata)
+        with self._stripe(file_id):
+            self._storage[file_id] = record
+            self._bump()
+            self._write_sidecar(file_id, record)
 
     def update_status(self, file_id: str, status: str, **kwargs: Any) -> None:
         """Merge status + extra kwargs into stored entry and flush sidecar.
@@ -43,32 +148,44 @@ class FileService:
         If file_id is unknown the update is silently ignored so callers
         do not need to guard against race-at-deletion.
         """
-        with self._lock:
-            entry = dict(self._storage.get(file_id, {}))
-            entry["status"] = status
-            entry.update(kwargs)
-            self._storage[file_id] = entry
-            self._write_sidecar(file_id, entry)
+        with self._stripe(file_id):
+            current = self._storage.get(file_id)
+            if current is None:
+                return
+            record = current.replace(status=status, **kwargs)
+            self._storage[file_id] = record
+            self._bump()
+            self._write_sidecar(file_id, record)
 
-    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
-        """Return a shallow copy of the entry or None.
+    def get(self, file_id: str) -> Optional[JobRecord]:
+        """Return the current immutable snapshot of the entry, or None.
 
-        Returns a copy so callers cannot accidentally mutate internal state.
+        No lock and no copy: records are never mutated, updates replace them.
         """
-        with self._lock:
-            entry = self._storage.get(file_id)
-            return dict(entry) if entry is not None else None
+        return self._storage.get(file_id)
 
     def delete(self, file_id: str) -> None:
         """Remove entry from memory and disk. No-op if not found."""
-        with self._lock:
+        with self._stripe(file_id):
             self._storage.pop(file_id, None)
-            (self._jobs_dir / f"{file_id}.json").unlink(missing_ok=True)
+            self._bump()
+            self._remove_sidecar(file_id)
 
     def all_ids(self) -> List[str]:
         """Return a snapshot list of all registered file_ids."""
-        with self._lock:
-            return list(self._storage.keys())
+        # list(dict) runs without releasing the GIL for str keys, so it cannot
+        # observe a concurrent resize.
+        return list(self._storage)
+
+    def close(self) -> None:
+        """Flush pending writes on shutdown. Sidecars are written synchronously, so no-op."""
+
+    def change_token(self) -> Any:
+        """Opaque value that changes whenever any job is registered, updated or deleted.
+
+        Cheap enough to poll; used by long-polling status requests.
+        """
+        return self._revision
 
     def restore_from_disk(self, temp_dir: Path) -> int:
         """Scan jobs_dir on startup and load all valid sidecars into memory.
@@ -91,27 +208,51 @@ class FileService:
                     sidecar.write_text(
                         json.dumps(data, default=str), encoding="utf-8"
                     )
-                with self._lock:
-                    self._storage[file_id] = data
+                record = JobRecord(data)
+                with self._stripe(file_id):
+                    self._storage[file_id] = record
                 count += 1
-            except (json.JSONDecodeError, KeyError, OSError):
+            except (json.JSONDecodeError, KeyError, OSError, AttributeError):
                 # Corrupt sidecar — unlink to avoid polluting storage on next restart.
                 sidecar.unlink(missing_ok=True)
+        self._bump()
         return count
 
-    def _write_sidecar(self, file_id: str, data: Dict[str, Any]) -> None:
+    def _write_sidecar(self, file_id: str, record: JobRecord) -> None:
         """Write serialized job metadata to disk.
 
-        MUST be called with self._lock held. Uses json.dumps(default=str) so that
-        datetime objects from older code paths are serialized gracefully.
+        MUST be called with the file_id's stripe lock held. Uses json.dumps(default=str)
+        so that datetime objects from older code paths are serialized gracefully.
         """
         (self._jobs_dir / f"{file_id}.json").write_text(
-            json.dumps(data, default=str), encoding="utf-8"
+            json.dumps(record.to_dict(), default=str), encoding="utf-8"
         )
 
+    def _remove_sidecar(self, file_id: str) -> None:
+        """Delete the job's sidecar. MUST be called with the file_id's stripe lock held."""
+        (self._jobs_dir / f"{file_id}.json").unlink(missing_ok=True)
+
 
 # ---------------------------------------------------------------------------
 # Module-level singleton — shared by all route modules in this process.
 # ---------------------------------------------------------------------------
 _DEFAULT_JOBS_DIR = Path("/tmp/enc_service/jobs")
-file_service = FileService(jobs_dir=_DEFAULT_JOBS_DIR)
+
+
+def _create_file_service() -> FileService:
+    from app.config import get_settings
+    settings = get_settings()
+    if settings.job_registry == "sqlite":
+        from app.services.job_registry import SQLiteFileService
+        return SQLiteFileService(jobs_dir=_DEFAULT_JOBS_DIR)
+    if settings.job_write_behind:
+        from app.services.job_journal import JournaledFileService
+        return JournaledFileService(
+            jobs_dir=_DEFAULT_JOBS_DIR,
+            fsync=settings.job_journal_fsync,
+            flush_interval=settings.job_flush_interval_ms / 1000,
+        )
+    return FileService(jobs_dir=_DEFAULT_JOBS_DIR)
+
+
+file_service = _create_file_service()
@@ -0,0 +1,230 @@
+"""
+Write-behind job persistence for the in-memory registry (JOB_WRITE_BEHIND=true).
+
+FileService rewrites a job's JSON sidecar on every transition (queued →
+processing → complete), so each job costs several synchronous file writes on
+the request and worker paths. JournaledFileService keeps the same in-memory
+registry but only queues changes:
+
+- _write_sidecar()/_remove_sidecar() record the latest snapshot per file_id
+  in a pending map and return. Several transitions of one job between two
+  flushes collapse into one journal line.
+- A background thread wakes every flush_interval seconds, appends the pending
+  snapshots to jobs/journal.log in a single write and fsyncs according to the
+  policy: "batch" after every write, "interval" at most once a second,
+  "never" leaves it to the OS.
+- When the journal grows past checkpoint_bytes, the jobs it mentions are
+  written out as regular sidecars and the journal is truncated.
+
+restore_from_disk() first replays the journal onto the sidecars (last line per
+file_id wins; a torn final line from a crash is skipped), then loads them as
+FileService does, so "processing" jobs are still failed after a restart.
+
+register() is the exception to write-behind: it appends the job's line (and
+anything else pending) itself before returning, so the route answers 202 only
+once the job is in the journal and a crash cannot orphan its uploaded source
+in files/. Only status transitions are batched; a transition lost in a crash
+leaves the job "processing", which restore_from_disk() reports as failed.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Set
+
+from app.services.file_service import FileService, JobRecord
+
+JOURNAL_NAME = "journal.log"
+
+_logger = logging.getLogger(__name__)
+
+
+class JournaledFileService(FileService):
+    """FileService whose sidecar writes are batched into an append-only journal."""
+
+    def __init__(
+        self,
+        jobs_dir: Path,
+        fsync: str = "batch",
+        flush_interval: float = 0.05,
+        checkpoint_bytes: int = 4 * 1024 * 1024,
+    ) -> None:
+        if fsync not in ("batch", "interval", "never"):
+            raise ValueError(f"Unknown fsync policy: {fsync!r}")
+        super().__init__(jobs_dir)
+        self._fsync = fsync
+        self._flush_interval = flush_interval
+        self._checkpoint_bytes = checkpoint_bytes
+        self._journal_path = self._jobs_dir / JOURNAL_NAME
+        self._journal = open(self._journal_path, "ab")
+        self._last_fsync = 0.0
+
+        # _pending maps file_id -> latest snapshot (None = deleted); guarded by _cond.
+        self._pending: Dict[str, Optional[JobRecord]] = {}
+        self._queued = 0
+        self._flushed = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        # Serialises journal appends, checkpoints and replay.
+        self._io_lock = threading.Lock()
+        # file_ids journaled since the last checkpoint; guarded by _io_lock.
+        self._dirty: Set[str] = set()
+
+        self._writer = threading.Thread(target=self._run, name="job-journal", daemon=True)
+        self._writer.start()
+
+    def register(self, file_id: str, metadata: Mapping) -> None:
+        """Store metadata and append it to the journal before returning (D-05)."""
+        super().register(file_id, metadata)
+        self._flush_batch()
+
+    # -- FileService persistence hooks -------------------------------------------
+
+    def _write_sidecar(self, file_id: str, record: JobRecord) -> None:
+        self._enqueue(file_id, record)
+
+    def _remove_sidecar(self, file_id: str) -> None:
+        self._enqueue(file_id, None)
+
+    def _enqueue(self, file_id: str, record: Optional[JobRecord]) -> None:
+        with self._cond:
+            self._pending[file_id] = record
+            self._queued += 1
+            self._cond.notify_all()
+
+    # -- Flushing ----------------------------------------------------------------
+
+    def flush(self) -> None:
+        """Block until every change queued before the call is in the journal."""
+        with self._cond:
+            target = self._queued
+            self._cond.notify_all()
+            while self._flushed < target and self._writer.is_alive():
+                self._cond.wait(0.1)
+
+    def close(self) -> None:
+        """Drain the queue, checkpoint into sidecars and close the journal."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+        with self._io_lock:
+            self._checkpoint()
+            self._journal.close()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                closing = self._closed
+            if self._flush_interval and not closing:
+                # Let the batch fill up: transitions of one job inside the window coalesce
+                time.sleep(self._flush_interval)
+            try:
+                self._flush_batch()
+            except OSError:
+                _logger.exception("Job journal write failed; retrying")
+                time.sleep(1.0)
+
+    def _flush_batch(self) -> None:
+        """Append everything pending. Raises OSError with the changes put back in the queue."""
+        # Taking the batch under _io_lock keeps appends in queue order when
+        # register() and the writer thread flush at the same time.
+        with self._io_lock:
+            with self._cond:
+                batch, self._pending = self._pending, {}
+                target = self._queued
+            try:
+                if batch:
+                    self._append(batch)
+            except OSError:
+                with self._cond:
+                    for file_id, record in batch.items():
+                        self._pending.setdefault(file_id, record)
+                raise
+        with self._cond:
+            self._flushed = max(self._flushed, target)
+            self._cond.notify_all()
+
+    def _append(self, batch: Dict[str, Optional[JobRecord]]) -> None:
+        """Append one line per change. Caller holds _io_lock."""
+        lines = b"".join(
+            json.dumps(
+                {"id": file_id, "job": record.to_dict() if record is not None else None},
+                default=str,
+            ).encode("utf-8") + b"\n"
+            for file_id, record in batch.items()
+        )
+        self._journal.write(lines)
+        self._journal.flush()
+        now = time.monotonic()
+        if self._fsync == "batch" or (self._fsync == "interval" and now - self._last_fsync >= 1.0):
+            os.fsync(self._journal.fileno())
+            self._last_fsync = now
+        self._dirty.update(batch)
+        if self._journal.tell() >= self._checkpoint_bytes:
+            self._checkpoint()
+
+    def _checkpoint(self) -> None:
+        """Write current state of journaled jobs to sidecars, then truncate. Caller holds _io_lock."""
+        for file_id in self._dirty:
+            with self._stripe(file_id):
+                record = self._storage.get(file_id)
+                if record is None:
+                    FileService._remove_sidecar(self, file_id)
+                else:
+                    self._write_durable(file_id, record.to_dict())
+        self._dirty.clear()
+        self._truncate_journal()
+
+    def _truncate_journal(self) -> None:
+        self._journal.truncate(0)
+        self._journal.seek(0)
+        if self._fsync != "never":
+            os.fsync(self._journal.fileno())
+
+    def _write_durable(self, file_id: str, data: dict) -> None:
+        with open(self._jobs_dir / f"{file_id}.json", "wb") as fh:
+            fh.write(json.dumps(data, default=str).encode("utf-8"))
+            if self._fsync != "never":
+                fh.flush()
+                os.fsync(fh.fileno())
+
+    # -- Recovery ----------------------------------------------------------------
+
+    def restore_from_disk(self, temp_dir: Path) -> int:
+        """Replay the journal onto the sidecars, then load them like FileService."""
+        with self._io_lock:
+            self._replay()
+        return super().restore_from_disk(temp_dir)
+
+    def _replay(self) -> None:
+        """Apply journal lines to sidecars (last line per file_id wins). Caller holds _io_lock."""
+        try:
+            raw = self._journal_path.read_bytes()
+        except FileNotFoundError:
+            return
+        latest: Dict[str, Optional[dict]] = {}
+        for line in raw.splitlines():
+            try:
+                change = json.loads(line)
+                file_id, job = change["id"], change["job"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                # Torn tail from a crash mid-write, or a corrupt line
+                continue
+            if not isinstance(file_id, str) or Path(file_id).name != file_id:
+                continue
+            latest[file_id] = job if isinstance(job, dict) else None
+        for file_id, job in latest.items():
+            if job is None:
+                FileService._remove_sidecar(self, file_id)
+            else:
+                self._write_durable(file_id, job)
+        self._truncate_journal()
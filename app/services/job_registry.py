@@ -0,0 +1,160 @@
+"""
+Cross-process job registry backed by SQLite in WAL mode (JOB_REGISTRY=sqlite).
+
+FileService keeps jobs in a per-process dict, so with `uvicorn --workers N` a
+status poll that lands on another worker returns 404. SQLiteFileService keeps
+the same interface but stores every job as a row in temp_dir/jobs/registry.sqlite3:
+
+- WAL lets pollers read while a worker commits; synchronous=NORMAL keeps
+  commits off the fsync path (a power loss can drop the last transitions,
+  which restore_from_disk then treats like any interrupted job).
+- update_status() is a read-modify-write inside BEGIN IMMEDIATE, so concurrent
+  updates from different processes never lose each other's fields.
+- sqlite3 connections are not shared between threads; each thread (event loop,
+  thread-pool workers) opens its own on first use.
+- change_token() combines PRAGMA data_version (bumped by commits from any
+  other connection, including other processes) with a counter of this
+  instance's own writes, so long-polling requests notice changes made
+  anywhere on the node without re-reading rows.
+
+Each row records the pid of the process that last wrote it. On startup every
+worker calls restore_from_disk(); it only fails "queued" and "processing" jobs
+whose owner process is gone (a queued job runs as a background task of the
+worker that accepted it, so nobody else will pick it up), so a worker
+restarting does not fail jobs its siblings are still running.
+
+The dedup ResultStore keeps its index and reference counts per process, so
+app.config.Settings refuses DEDUP_ENABLED together with JOB_REGISTRY=sqlite:
+a worker expiring a job it never published would leak the CAS files. Legacy JSON sidecars in the jobs dir are imported once and removed.
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, List, Optional
+
+from app.services.file_service import FileService, JobRecord
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    file_id   TEXT PRIMARY KEY,
+    status    TEXT NOT NULL,
+    owner_pid INTEGER NOT NULL,
+    data      TEXT NOT NULL
+)
+"""
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SQLiteFileService(FileService):
+    """FileService whose jobs live in a SQLite database shared by all processes on a node."""
+
+    def __init__(self, jobs_dir: Path, db_path: Optional[Path] = None) -> None:
+        super().__init__(jobs_dir)
+        self._db_path = Path(db_path or jobs_dir / "registry.sqlite3")
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: autocommit, transactions only where BEGIN is explicit
+            conn = sqlite3.connect(str(self._db_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def register(self, file_id: str, metadata: Mapping) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO jobs (file_id, status, owner_pid, data) VALUES (?, ?, ?, ?)",
+            (file_id, metadata.get("status", ""), os.getpid(), json.dumps(dict(metadata), default=str)),
+        )
+        self._bump()
+
+    def update_status(self, file_id: str, status: str, **kwargs: Any) -> None:
+        """Merge status + kwargs into the stored row. Unknown file_ids are ignored."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM jobs WHERE file_id = ?", (file_id,)).fetchone()
+            if row is not None:
+                entry = json.loads(row[0])
+                entry["status"] = status
+                entry.update(kwargs)
+                conn.execute(
+                    "UPDATE jobs SET status = ?, owner_pid = ?, data = ? WHERE file_id = ?",
+                    (status, os.getpid(), json.dumps(entry, default=str), file_id),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._bump()
+
+    def get(self, file_id: str) -> Optional[JobRecord]:
+        row = self._conn().execute(
+            "SELECT data FROM jobs WHERE file_id = ?", (file_id,)
+        ).fetchone()
+        return JobRecord(json.loads(row[0])) if row is not None else None
+
+    def delete(self, file_id: str) -> None:
+        self._conn().execute("DELETE FROM jobs WHERE file_id = ?", (file_id,))
+        (self._jobs_dir / f"{file_id}.json").unlink(missing_ok=True)
+        self._bump()
+
+    def all_ids(self) -> List[str]:
+        return [row[0] for row in self._conn().execute("SELECT file_id FROM jobs")]
+
+    def change_token(self) -> Any:
+        (data_version,) = self._conn().execute("PRAGMA data_version").fetchone()
+        return (data_version, self._revision)
+
+    def restore_from_disk(self, temp_dir: Path) -> int:
+        """Import legacy sidecars, fail orphaned unfinished jobs, return the job count."""
+        conn = self._conn()
+        for sidecar in self._jobs_dir.glob("*.json"):
+            try:
+                data = json.loads(sidecar.read_text(encoding="utf-8"))
+                conn.execute(
+                    "INSERT OR IGNORE INTO jobs (file_id, status, owner_pid, data) "
+                    "VALUES (?, ?, 0, ?)",
+                    (sidecar.stem, data.get("status", ""), json.dumps(data, default=str)),
+                )
+            except (json.JSONDecodeError, OSError):
+                pass
+            sidecar.unlink(missing_ok=True)
+
+        orphaned = [
+            (file_id, status)
+            for file_id, status, owner_pid in conn.execute(
+                "SELECT file_id, status, owner_pid FROM jobs "
+                "WHERE status IN ('queued', 'processing')"
+            ).fetchall()
+            if not _pid_alive(owner_pid)
+        ]
+        for file_id, status in orphaned:
+            self.update_status(
+                file_id, "failed",
+                error="Server restarted while job was processing" if status == "processing"
+                else "Server restarted before job was started",
+            )
+
+        (count,) = conn.execute("SELECT COUNT(*) FROM jobs").fetchone()
+        return count
@@ -0,0 +1,142 @@
+"""
+Content-addressed, reference-counted store for job results (optional dedup layer).
+
+When DEDUP_ENABLED is set, encrypt and decrypt requests compute a content key
+from the uploaded bytes, the key identity (password / key bundle) and the
+crypto parameters. The first job with a given key publishes its result files
+into temp_dir/cas/; later identical requests within the TTL register a job that
+points at the same files instead of re-running the crypto. Every job holding a
+CAS entry is one reference; _periodic_cleanup releases the reference when the
+job expires and the files are deleted once the last reference is gone.
+
+Content keys are HMAC-SHA256 under a per-process random secret, so nothing in
+the index or on disk can be used to confirm a guessed password or document.
+The index lives in memory; on restart, reference counts are rebuilt from the
+restored job sidecars (entries become unreachable for new lookups because the
+secret changes, but their files are still freed correctly).
+"""
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+CAS_DIR = "cas"
+
+
+class _Entry:
+    __slots__ = ("result_paths", "refs", "expires_at")
+
+    def __init__(self, result_paths: Dict[str, Any], expires_at: float) -> None:
+        self.result_paths = result_paths
+        self.refs = 0
+        self.expires_at = expires_at
+
+
+class ResultStore:
+    """Thread-safe content-addressed result index.
+
+    publish() is called from worker threads, acquire()/release() from the event
+    loop, so a threading.Lock guards the index (same rationale as FileService).
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._secret = secrets.token_bytes(32)
+
+    # -- keys -----------------------------------------------------------------
+
+    def content_key(self, kind: str, parts: Iterable[bytes]) -> str:
+        """Derive a content key from length-prefixed parts (digests, parameters)."""
+        mac = hmac.new(self._secret, kind.encode(), hashlib.sha256)
+        for part in parts:
+            mac.update(len(part).to_bytes(8, "big"))
+            mac.update(part)
+        return mac.hexdigest()
+
+    @staticmethod
+    def owns(rel_path: Optional[str]) -> bool:
+        """True if rel_path lives in the CAS directory (lifetime managed by refs)."""
+        return bool(rel_path) and Path(rel_path).parts[:1] == (CAS_DIR,)
+
+    # -- lookup / publish -------------------------------------------------------
+
+    def acquire(self, key: str, temp_dir: Path, ttl_seconds: int) -> Optional[Dict[str, Any]]:
+        """Take a reference on a live entry and return its result_paths, else None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                return None
+            for rel_path in entry.result_paths.values():
+                if self.owns(rel_path) and not (temp_dir / rel_path).exists():
+                    return None
+            entry.refs += 1
+            entry.expires_at = now + ttl_seconds
+            return dict(entry.result_paths)
+
+    def publish(self, key: str, temp_dir: Path, result_paths: Dict[str, Any],
+                path_keys: Iterable[str], ttl_seconds: int) -> Optional[Dict[str, Any]]:
+        """Move a finished job's result files into the CAS and take the first reference.
+
+        path_keys names the entries of result_paths that are file paths. Returns the
+        rewritten result_paths, or None if an identical result was published
+        concurrently (the caller then keeps its own, unshared files).
+        """
+        with self._lock:
+            if key in self._entries:
+                return None
+            cas_dir = temp_dir / CAS_DIR
+            cas_dir.mkdir(parents=True, exist_ok=True)
+            published = dict(result_paths)
+            for name in path_keys:
+                rel_path = result_paths.get(name)
+                if not rel_path:
+                    continue
+                target = Path(CAS_DIR) / f"{key}_{Path(rel_path).name.split('_', 1)[-1]}"
+                os.replace(temp_dir / rel_path, temp_dir / target)
+                published[name] = target.as_posix()
+            entry = _Entry(published, time.time() + ttl_seconds)
+            entry.refs = 1
+            self._entries[key] = entry
+            return dict(published)
+
+    def release(self, key: str) -> List[str]:
+        """Drop one reference. Returns the CAS paths to delete once none remain."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return []
+            entry.refs -= 1
+            if entry.refs > 0:
+                return []
+            del self._entries[key]
+        return [p for p in entry.result_paths.values() if self.owns(p)]
+
+    def restore_from_jobs(self, jobs: Iterable[Dict[str, Any]]) -> int:
+        """Rebuild reference counts from restored job entries. Returns entry count."""
+        with self._lock:
+            for job in jobs:
+                key = job.get("cas_key")
+                if not key:
+                    continue
+                entry = self._entries.get(key)
+                if entry is None:
+                    # Unreachable for lookups (new secret) — expire immediately.
+                    entry = self._entries[key] = _Entry(dict(job.get("result_paths") or {}), 0.0)
+                entry.refs += 1
+            return len(self._entries)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+# ---------------------------------------------------------------------------
+# Module-level singleton — shared by all route modules in this process.
+# ---------------------------------------------------------------------------
+result_store = ResultStore()
@@ -0,0 +1,249 @@
+"""
+Background shredding queue for temp_dir files.
+
+The TTL cleanup and the download handler used to unlink job files inline. Plain
+unlink leaves uploaded plaintext and decrypted results readable on the
+device, and overwriting them inline would hold the event loop (or an I/O
+worker) for as long as it takes to rewrite a multi-hundred-MB file.
+enqueue() hands the path to a small dedicated pool and returns at once:
+
+- enqueue() first renames the file to a hidden name in its directory, so no
+  new download can open it, then queues the rename target.
+- Downloads take a shared flock on the file they serve (hold_file()). The
+  shredder overwrites only under an exclusive lock; while a download still
+  reads the file (in any worker process) it retries later instead of feeding
+  random bytes to a 200 response.
+- Each file is overwritten SHRED_PASSES times through FileHandler.secure_delete
+  (chunked, one reusable buffer), then removed. SHRED_PASSES=0 just unlinks.
+- Concurrency is bounded by SHRED_WORKERS, separate from the crypto pool and
+  the temp_io pool, so a cleanup sweep cannot starve requests.
+- Worker threads lower their own CPU priority (nice 19) and, on Linux, switch
+  to the idle I/O class with ioprio_set(2), so overwrite traffic only gets the
+  disk when requests do not need it.
+
+shutdown() drains the queue so no file is left half-shredded on a clean stop;
+files still held by a download at that point are unlinked without overwriting.
+The queue itself lives in memory: after a crash the renamed files stay behind,
+and recover() (called from the lifespan startup) queues them again.
+"""
+import ctypes
+import logging
+import os
+import platform
+import sys
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Set, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: an open file cannot be renamed there anyway
+    fcntl = None
+
+from app.config import get_settings
+from utils.file_handler import FileHandler
+
+_logger = logging.getLogger(__name__)
+
+_LOW_PRIORITY = 19
+# Seconds before a file held by a download is tried again
+_RETRY_SECONDS = 5.0
+
+# ioprio_set(2) has no libc wrapper; syscall numbers per architecture
+_IOPRIO_SET = {
+    "x86_64": 251, "i386": 289, "i686": 289, "armv7l": 314,
+    "aarch64": 30, "riscv64": 30, "ppc64le": 273, "s390x": 282,
+}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+
+PathLike = Union[str, Path]
+
+
+def _set_idle_io_priority() -> None:
+    number = _IOPRIO_SET.get(platform.machine())
+    if not sys.platform.startswith("linux") or number is None:
+        return
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        # Failure (e.g. seccomp) just leaves the thread in the best-effort class
+        libc.syscall(
+            number, _IOPRIO_WHO_PROCESS, threading.get_native_id(),
+            _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT,
+        )
+    except (AttributeError, OSError):
+        pass
+
+
+def _lower_priority() -> None:
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), _LOW_PRIORITY)
+    except (AttributeError, OSError):
+        # Not available on this platform or not permitted — shred at normal priority
+        pass
+    _set_idle_io_priority()
+
+
+def _try_lock(fd: int, operation: int) -> bool:
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fd, operation | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+class FileHold:
+    """Shared lock that keeps the shredder from overwriting a file while it is served.
+
+    Raises FileNotFoundError if the file is gone or already moved aside for shredding.
+    """
+
+    def __init__(self, path: PathLike) -> None:
+        self._fd: Optional[int] = os.open(path, os.O_RDONLY)
+        try:
+            held = _try_lock(self._fd, fcntl.LOCK_SH if fcntl else 0)
+            # The path must still name the locked file: it may have been renamed aside
+            # (and even shredded) between open() and flock()
+            current = os.stat(path)
+            opened = os.fstat(self._fd)
+            if not held or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+                raise FileNotFoundError(str(path))
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "FileHold":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+def hold_file(path: PathLike) -> FileHold:
+    """Hold `path` for reading; see FileHold."""
+    return FileHold(path)
+
+
+class ShredQueue:
+    """Bounded background pool that securely deletes files."""
+
+    def __init__(self, passes: int, workers: int, retry_seconds: float = _RETRY_SECONDS) -> None:
+        self._passes = passes
+        self._workers = workers
+        self._retry_seconds = retry_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._queued: Set[str] = set()
+        self._deferred: Dict[str, threading.Timer] = {}
+        self._stopping = False
+        self._lock = threading.Lock()
+
+    def enqueue(self, path: PathLike) -> Optional[Future]:
+        """Move `path` aside and schedule it for shredding. Returns None if it is already gone."""
+        path = Path(path)
+        aside = str(path.with_name(f".shred-{uuid.uuid4().hex}"))
+        try:
+            os.rename(path, aside)
+        except FileNotFoundError:
+            # Missing, or moved aside by an earlier enqueue / another worker's sweep
+            return None
+        with self._lock:
+            self._queued.add(aside)
+            return self._submit_locked(aside)
+
+    def recover(self, directory: PathLike) -> int:
+        """Queue files an earlier process moved aside but never shredded. Returns how many."""
+        count = 0
+        for path in Path(directory).glob(".shred-*"):
+            if not path.is_file():
+                continue
+            with self._lock:
+                if str(path) in self._queued:
+                    continue
+                self._queued.add(str(path))
+                self._submit_locked(str(path))
+            count += 1
+        return count
+
+    def _submit_locked(self, path: str) -> Future:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._workers,
+                thread_name_prefix="shred",
+                initializer=_lower_priority,
+            )
+        return self._executor.submit(self._shred, path)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queued)
+
+    def shutdown(self) -> None:
+        """Finish every queued file, then stop the pool. Called from the lifespan shutdown hook."""
+        with self._lock:
+            self._stopping = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        with self._lock:
+            deferred, self._deferred = self._deferred, {}
+        for path, timer in deferred.items():
+            timer.cancel()
+            self._shred(path)
+        with self._lock:
+            self._stopping = False
+
+    def _retry(self, path: str) -> None:
+        with self._lock:
+            if self._deferred.pop(path, None) is not None:
+                self._submit_locked(path)
+
+    def _shred(self, path: str) -> None:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            self._finish(path)
+            return
+        try:
+            if not _try_lock(fd, fcntl.LOCK_EX if fcntl else 0):
+                with self._lock:
+                    if not self._stopping:
+                        # A download still reads the file: overwrite it once that is done
+                        timer = threading.Timer(self._retry_seconds, self._retry, (path,))
+                        timer.daemon = True
+                        self._deferred[path] = timer
+                        timer.start()
+                        return
+                # Shutting down: drop the name, leave the data to the reader's open fd
+                os.remove(path)
+            elif self._passes:
+                FileHandler.secure_delete(path, passes=self._passes)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            _logger.exception("Failed to shred %s", path)
+        finally:
+            os.close(fd)
+        self._finish(path)
+
+    def _finish(self, path: str) -> None:
+        with self._lock:
+            self._queued.discard(path)
+
+
+# ---------------------------------------------------------------------------
+# Module-level singleton — shared by the cleanup task and route modules.
+# ---------------------------------------------------------------------------
+_settings = get_settings()
+shred_queue = ShredQueue(passes=_settings.shred_passes, workers=_settings.shred_workers)
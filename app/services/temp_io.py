@@ -0,0 +1,73 @@
+"""
+Non-blocking temp-storage I/O for the API layer.
+
+Route handlers and the TTL cleanup task run on the event loop, so writing a
+multi-hundred-MB upload with Path.write_bytes() would stall every other request
+(including /health and status polls) until the disk write finished. All temp_dir
+reads, writes and unlinks go through the helpers below instead: they use
+aiofiles on a dedicated I/O thread pool, kept separate from the CPU pool that
+run_in_threadpool uses for encryption/decryption so a burst of crypto jobs cannot
+starve file I/O (and vice versa).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Union
+
+import aiofiles
+import aiofiles.os
+
+from app.config import get_settings
+
+_CHUNK_SIZE = 1024 * 1024
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+PathLike = Union[str, Path]
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Return the shared I/O pool, creating it on first use (and after shutdown)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_settings().io_workers,
+                thread_name_prefix="temp-io",
+            )
+        return _executor
+
+
+def shutdown_io_executor() -> None:
+    """Stop the I/O pool. Called from the lifespan shutdown hook."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+async def write_bytes(path: PathLike, data: bytes) -> None:
+    """Write `data` to `path` in chunks without blocking the event loop."""
+    view = memoryview(data)
+    async with aiofiles.open(path, "wb", executor=get_io_executor()) as f:
+        for start in range(0, len(view), _CHUNK_SIZE):
+            await f.write(view[start:start + _CHUNK_SIZE])
+
+
+async def read_bytes(path: PathLike) -> bytes:
+    async with aiofiles.open(path, "rb", executor=get_io_executor()) as f:
+        return await f.read()
+
+
+async def unlink(path: PathLike, missing_ok: bool = True) -> None:
+    try:
+        await aiofiles.os.unlink(path, executor=get_io_executor())
+    except FileNotFoundError:
+        if not missing_ok:
+            raise
+
+
+async def makedirs(path: PathLike) -> None:
+    await aiofiles.os.makedirs(path, exist_ok=True, executor=get_io_executor())
@@ -0,0 +1,56 @@
+"""
+Бенчмарк памяти реестра задач FileService: dict против JobRecord.
+Запуск: python bench_jobs.py [количество_задач]
+
+Создаёт N задач (по умолчанию 1 000 000) в двух представлениях и печатает
+объём памяти по данным tracemalloc:
+1. Старый формат — свободный dict на задачу
+2. JobRecord — __slots__, интернированные status/job_type/file_type,
+   общий пустой result_paths
+"""
+
+import sys
+import tracemalloc
+import uuid
+
+from app.services.file_service import JobRecord
+
+COUNT = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+
+def make_job(file_id):
+    return {
+        "file_id": file_id,
+        "status": "complete",
+        "job_type": "encrypt",
+        "original_filename": "report.pdf",
+        "file_type": "pdf",
+        "created_at": "2026-04-12T00:00:00Z",
+        "expires_at": "2026-04-12T01:00:00Z",
+        "error": None,
+        "result_paths": {},
+        "original_path": f"files/{file_id}.pdf",
+    }
+
+
+def measure(build):
+    ids = [str(uuid.uuid4()) for _ in range(COUNT)]
+    tracemalloc.start()
+    storage = {file_id: build(make_job(file_id)) for file_id in ids}
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del storage
+    return current
+
+
+def main():
+    print(f"Задач: {COUNT:,}")
+    dict_bytes = measure(dict)
+    print(f"dict:      {dict_bytes / 2**20:8.1f} MiB  ({dict_bytes / COUNT:.0f} B/задача)")
+    record_bytes = measure(JobRecord)
+    print(f"JobRecord: {record_bytes / 2**20:8.1f} MiB  ({record_bytes / COUNT:.0f} B/задача)")
+    print(f"Экономия:  {(1 - record_bytes / dict_bytes) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,16 @@ class CryptoConstants:
     MAGIC_NUMBER = b'DOCENC'  
     VERSION_BYTES = b'\x01\x00'  
     
+    # Флаги, меняющие разметку контейнера, поднимают минорную версию формата:
+    # старые читатели сверяют версию и отказываются, а не разбирают неверно
+    FLAG_VERSIONS = {
+        'KEY_FINGERPRINT': b'\x01\x01',
+        'SEGMENTED': b'\x01\x02',
+        'SEGMENT_TRAILER': b'\x01\x02',
+        # Таблица фрагментов с CRC32 и версией zlib (processors/office_zip.py)
+        'OFFICE_ZIP': b'\x01\x03',
+    }
+    
     
     HEADER_SEPARATOR = b'\xFF\xFE\xFD\xFC'
     SECTION_SEPARATOR = b'\xFB\xFA\xF9\xF8'
@@ -112,8 +122,27 @@ class CryptoConstants:
         'RSA_PROTECTED': 0b00000100,
         'INTEGRITY_CHECK': 0b00001000,
         'METADATA_ENCRYPTED': 0b00010000,
+        'KEY_FINGERPRINT': 0b00100000,
+        'SEGMENTED': 0b01000000,
+        'OFFICE_ZIP': 0b10000000,
+        # Индекс сегментов записан после сегментов (потоковая запись)
+        'SEGMENT_TRAILER': 0b100000000,
     }
     
+    @classmethod
+    def version_for_flags(cls, flags: int) -> bytes:
+        
+        version = cls.VERSION_BYTES
+        for name, required in cls.FLAG_VERSIONS.items():
+            if flags & cls.FLAGS[name] and required > version:
+                version = required
+        return version
+    
+    @classmethod
+    def latest_version(cls) -> bytes:
+        
+        return max(cls.VERSION_BYTES, *cls.FLAG_VERSIONS.values())
+    
     @classmethod
     def get_header_size(cls) -> int:
         
@@ -127,7 +156,8 @@ class CryptoConstants:
     @classmethod
     def create_flags(cls, compressed=True, multi_layer=True, 
                     rsa_protected=True, integrity_check=True,
-                    metadata_encrypted=True) -> int:
+                    metadata_encrypted=True, key_fingerprint=False,
+                    segmented=False, office_zip=False, segment_trailer=False) -> int:
         
         flags = 0
         if compressed:
@@ -140,6 +170,14 @@ class CryptoConstants:
             flags |= cls.FLAGS['INTEGRITY_CHECK']
         if metadata_encrypted:
             flags |= cls.FLAGS['METADATA_ENCRYPTED']
+        if key_fingerprint:
+            flags |= cls.FLAGS['KEY_FINGERPRINT']
+        if segmented:
+            flags |= cls.FLAGS['SEGMENTED']
+        if office_zip:
+            flags |= cls.FLAGS['OFFICE_ZIP']
+        if segment_trailer:
+            flags |= cls.FLAGS['SEGMENT_TRAILER']
         return flags
     
     @classmethod
@@ -151,6 +189,10 @@ class CryptoConstants:
             'rsa_protected': bool(flags & cls.FLAGS['RSA_PROTECTED']),
             'integrity_check': bool(flags & cls.FLAGS['INTEGRITY_CHECK']),
             'metadata_encrypted': bool(flags & cls.FLAGS['METADATA_ENCRYPTED']),
+            'key_fingerprint': bool(flags & cls.FLAGS['KEY_FINGERPRINT']),
+            'segmented': bool(flags & cls.FLAGS['SEGMENTED']),
+            'office_zip': bool(flags & cls.FLAGS['OFFICE_ZIP']),
+            'segment_trailer': bool(flags & cls.FLAGS['SEGMENT_TRAILER']),
         }
 
 
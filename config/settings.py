@@ -21,6 +21,7 @@ class Settings:
     
     HASH_ALGORITHM = 'sha512'
     PBKDF2_ITERATIONS = 600000  
+    KEY_BUNDLE_MAX_ITERATIONS = 2400000  
     SALT_SIZE = 32  
     IV_SIZE = 16  
     NONCE_SIZE = 12  
@@ -28,6 +29,32 @@ class Settings:
     
     COMPRESSION_ENABLED = True
     COMPRESSION_LEVEL = 9  
+    # Перепаковка DOCX/XLSX привязывает контейнер к сборке zlib: на хосте с другим
+    # zlib (zlib-ng, вендорские форки) исходный ZIP не восстановить, поэтому только явно
+    OFFICE_RECOMPRESSION = False  
+    
+    
+    KEY_SCHEDULE_CACHE_SIZE = 32  
+    KEY_SCHEDULE_MAX_KEYSTREAM = 4 * 1024 * 1024  
+    KEY_SCHEDULE_CACHE_BYTES = 64 * 1024 * 1024  
+    
+    
+    MMAP_INPUT_THRESHOLD = 1024 * 1024  
+    SECURE_DELETE_CHUNK_SIZE = 1024 * 1024  
+    
+    
+    SEGMENTED_CONTAINERS = False  
+    SEGMENT_SIZE = 1024 * 1024  
+    
+    
+    KEY_BUNDLE_FORMAT = 'binary'  
+    EMBED_KEY_FINGERPRINT = True  
+    STRICT_KEY_VERIFICATION = False  
+    RSA_KEY_CACHE_SIZE = 16  
+    
+    
+    LOCAL_SOCKET_ENV = 'DOCENC_SOCKET'  
+    LOCAL_KEY_POOL_SIZE = 4  
     
     
     SUPPORTED_FORMATS = {
@@ -37,6 +64,13 @@ class Settings:
         'text': ['.txt', '.md', '.csv', '.json', '.xml']
     }
     
+    # Обратный индекс расширение -> формат, строится один раз
+    EXTENSION_FORMATS = {
+        ext: format_name
+        for format_name, format_list in SUPPORTED_FORMATS.items()
+        for ext in format_list
+    }
+    
     
     MAX_FILE_SIZE = 500 * 1024 * 1024  
     MIN_PASSWORD_LENGTH = 12
@@ -56,12 +90,6 @@ class Settings:
     SECURE_DELETE_PASSES = 3  
     MEMORY_WIPE_ENABLED = True  
     
-    def __init__(self):
-        
-        
-        for directory in [self.LOGS_DIR]:
-            directory.mkdir(parents=True, exist_ok=True)
-    
     @classmethod
     def get_supported_extensions(cls) -> list:
         
@@ -77,10 +105,6 @@ class Settings:
         if not extension.startswith('.'):
             extension = '.' + extension
         
-        for format_name, extensions in cls.SUPPORTED_FORMATS.items():
-            if extension in extensions:
-                return format_name
-        
-        return 'unknown'
+        return cls.EXTENSION_FORMATS.get(extension, 'unknown')
 
 
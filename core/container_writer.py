@@ -0,0 +1,227 @@
+"""
+Direct-to-sink writer for the encrypted container format.
+
+EncryptionEngine used to assemble header, crypto info, ciphertext and HMAC in
+one bytearray, copy it into bytes and only then write it out. ContainerWriter
+instead serialises the small header/trailer sections into their own buffers
+and emits them together with a memoryview of the ciphertext in a single
+vectored write (os.writev for files, socket.sendmsg for sockets), so the
+ciphertext is never duplicated in memory.
+
+For producers that do not know the ciphertext length up front, begin() /
+write_data() / finish() reserve the uint64 length field (and, if asked, the
+original/compressed sizes in the header) and back-patch them once the data
+section is complete (requires a seekable sink).
+
+The byte layout is documented in core/header_parser.py.
+"""
+import os
+import socket
+import struct
+import time
+from typing import BinaryIO, List, Optional, Sequence, Union
+
+from config.constants import CryptoConstants
+from core.header_parser import FIXED_HEADER, U16, U64, SIZES
+
+Buffer = Union[bytes, bytearray, memoryview]
+# Ciphertext as one buffer, or as consecutive parts (e.g. index + segments)
+Data = Union[Buffer, Sequence[Buffer]]
+Sink = Union[str, os.PathLike, BinaryIO, socket.socket]
+
+# Linux IOV_MAX is 1024; stay well below it.
+_MAX_IOV = 512
+
+
+def _writev_all(fd: int, buffers: Sequence[Buffer]) -> int:
+    """os.writev() that retries until every buffer has been fully written."""
+    views = [memoryview(b).cast('B') for b in buffers if len(b)]
+    total = 0
+    while views:
+        written = os.writev(fd, views[:_MAX_IOV])
+        total += written
+        while views and written >= len(views[0]):
+            written -= len(views[0])
+            views.pop(0)
+        if written:
+            views[0] = views[0][written:]
+    return total
+
+
+def _sendmsg_all(sock: socket.socket, buffers: Sequence[Buffer]) -> int:
+    """socket.sendmsg() that retries until every buffer has been fully sent."""
+    views = [memoryview(b).cast('B') for b in buffers if len(b)]
+    total = 0
+    while views:
+        sent = sock.sendmsg(views[:_MAX_IOV])
+        total += sent
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if sent:
+            views[0] = views[0][sent:]
+    return total
+
+
+def _data_views(encrypted_data: Data) -> List[memoryview]:
+    if isinstance(encrypted_data, (list, tuple)):
+        return [memoryview(part) for part in encrypted_data]
+    return [memoryview(encrypted_data)]
+
+
+class ContainerWriter:
+    """Serialise one encrypted container to a path, binary file object or socket."""
+
+    def __init__(self, sink: Sink):
+        self._owns_file = isinstance(sink, (str, os.PathLike))
+        if self._owns_file:
+            os.makedirs(os.path.dirname(os.fspath(sink)) or '.', exist_ok=True)
+            self._sink = open(sink, 'wb')
+        else:
+            self._sink = sink
+        self._length_offset: Optional[int] = None
+        self._sizes_offset: Optional[int] = None
+        self._data_len = 0
+        self.bytes_written = 0
+
+    # -- context manager ---------------------------------------------------
+
+    def __enter__(self) -> 'ContainerWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._owns_file and not self._sink.closed:
+            self._sink.close()
+
+    # -- section builders --------------------------------------------------
+
+    @staticmethod
+    def build_prefix(*, flags: int, file_type: str, filename: str,
+                     original_size: int, compressed_size: int, salt: bytes,
+                     aes_tag: bytes, encrypted_keys: bytes,
+                     data_length: int, timestamp: Optional[int] = None,
+                     key_fingerprint: bytes = b'') -> bytes:
+        """Everything before the ciphertext: header, crypto info and data length."""
+        c = CryptoConstants
+        file_type_bytes = file_type.encode('utf-8')
+        filename_bytes = filename.encode('utf-8')
+        if key_fingerprint:
+            flags |= c.FLAGS['KEY_FINGERPRINT']
+            fingerprint_field = U16.pack(len(key_fingerprint)) + key_fingerprint
+        else:
+            flags &= ~c.FLAGS['KEY_FINGERPRINT']
+            fingerprint_field = b''
+        return b''.join((
+            c.MAGIC_NUMBER,
+            c.version_for_flags(flags),
+            struct.pack('<I', flags),
+            U64.pack(int(time.time()) if timestamp is None else timestamp),
+            c.HEADER_SEPARATOR,
+            U16.pack(len(file_type_bytes)), file_type_bytes,
+            U16.pack(len(filename_bytes)), filename_bytes,
+            SIZES.pack(original_size, compressed_size),
+            c.SECTION_SEPARATOR,
+            U16.pack(len(salt)), salt,
+            U16.pack(len(aes_tag)), aes_tag,
+            U16.pack(len(encrypted_keys)), encrypted_keys,
+            fingerprint_field,
+            c.SECTION_SEPARATOR,
+            U64.pack(data_length),
+        ))
+
+    @staticmethod
+    def build_trailer(hmac_signature: bytes) -> bytes:
+        return CryptoConstants.SECTION_SEPARATOR + hmac_signature
+
+    # -- output ------------------------------------------------------------
+
+    def _write_buffers(self, buffers: Sequence[Buffer]) -> int:
+        sink = self._sink
+        if isinstance(sink, socket.socket):
+            written = _sendmsg_all(sink, buffers)
+        elif hasattr(os, 'writev') and hasattr(sink, 'fileno'):
+            try:
+                fd = sink.fileno()
+            except (OSError, ValueError):
+                fd = None
+            if fd is None:
+                written = self._write_sequential(buffers)
+            else:
+                # Drain Python-level buffering before writing below it.
+                sink.flush()
+                written = _writev_all(fd, buffers)
+                if sink.seekable():
+                    # Resync the buffered object's cached position with the fd.
+                    sink.seek(0, os.SEEK_CUR)
+        else:
+            written = self._write_sequential(buffers)
+        self.bytes_written += written
+        return written
+
+    def _write_sequential(self, buffers: Sequence[Buffer]) -> int:
+        written = 0
+        for buf in buffers:
+            self._sink.write(buf)
+            written += len(buf)
+        return written
+
+    def write_container(self, *, encrypted_data: Data, hmac_signature: bytes,
+                        **prefix_fields) -> int:
+        """Write a complete container in one vectored write. Returns bytes written."""
+        return self._write_buffers(container_segments(
+            encrypted_data=encrypted_data, hmac_signature=hmac_signature, **prefix_fields
+        ))
+
+    def begin(self, **prefix_fields) -> None:
+        """Write the prefix with a placeholder data length, to be patched by finish()."""
+        if not self._sink.seekable():
+            raise ValueError("Потоковая запись контейнера требует seekable вывода")
+        prefix = self.build_prefix(data_length=0, **prefix_fields)
+        start = self._sink.tell()
+        self._write_buffers([prefix])
+        self._length_offset = start + len(prefix) - U64.size
+        self._sizes_offset = start + FIXED_HEADER.size + sum(
+            U16.size + len(prefix_fields[name].encode('utf-8'))
+            for name in ('file_type', 'filename')
+        )
+        self._data_len = 0
+
+    def write_data(self, chunk: Buffer) -> None:
+        if self._length_offset is None:
+            raise RuntimeError("Перед write_data() необходимо вызвать begin()")
+        self._data_len += memoryview(chunk).nbytes
+        self._write_buffers([chunk])
+
+    def finish(self, hmac_signature: bytes, original_size: Optional[int] = None,
+               compressed_size: Optional[int] = None) -> int:
+        """Write the trailer and back-patch the data length (and the sizes, if given).
+
+        Returns total bytes written.
+        """
+        if self._length_offset is None:
+            raise RuntimeError("Перед finish() необходимо вызвать begin()")
+        self._write_buffers([self.build_trailer(hmac_signature)])
+        end = self._sink.tell()
+        if original_size is not None:
+            self._sink.seek(self._sizes_offset)
+            self._sink.write(SIZES.pack(original_size, compressed_size))
+        self._sink.seek(self._length_offset)
+        self._sink.write(U64.pack(self._data_len))
+        self._sink.seek(end)
+        self._sink.flush()
+        self._length_offset = None
+        return self.bytes_written
+
+
+def container_segments(*, encrypted_data: Data, hmac_signature: bytes,
+                       **prefix_fields) -> List[Buffer]:
+    """Container as a list of buffers (prefix, ciphertext views, trailer)."""
+    data = _data_views(encrypted_data)
+    return [
+        ContainerWriter.build_prefix(data_length=sum(v.nbytes for v in data), **prefix_fields),
+        *data,
+        ContainerWriter.build_trailer(hmac_signature),
+    ]
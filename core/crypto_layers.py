@@ -1,35 +1,40 @@
 
 
 import hashlib
-from typing import List
+from typing import List, Optional
+
+from core.key_schedule import KeySchedule, KeyScheduleCache, get_key_schedule_cache
 
 
 class CryptoLayerManager:
     
     
-    def __init__(self):
+    def __init__(self, schedule_cache: Optional[KeyScheduleCache] = None):
         self.permutation_rounds = 16
         self.sbox_count = 8
+        self.schedule_cache = (
+            schedule_cache if schedule_cache is not None else get_key_schedule_cache()
+        )
     
     def apply_custom_transformations(self, data: bytes, key: bytes) -> bytes:
         
         result = bytearray(data)
         
         
-        sboxes = self._generate_sboxes(key)
         permutation_key = self._generate_permutation_key(key, len(data))
         
-        
-        for round_num in range(self.permutation_rounds):
-            
-            result = self._apply_substitution(result, sboxes, round_num)
-            
-            
-            result = self._apply_permutation(result, permutation_key, round_num)
-            
-            
-            round_key = self._derive_round_key(key, round_num, len(result))
-            result = self._xor_with_key(result, round_key)
+        with self.schedule_cache.lease(key, self.permutation_rounds,
+                                       self.sbox_count) as schedule:
+            for round_num in range(self.permutation_rounds):
+                
+                result = self._apply_substitution(result, schedule.sboxes, round_num)
+                
+                
+                result = self._apply_permutation(result, permutation_key, round_num)
+                
+                
+                round_key = schedule.round_keystream(round_num, len(result))
+                result = self._xor_with_key(result, round_key)
         
         return bytes(result)
     
@@ -38,57 +43,30 @@ class CryptoLayerManager:
         result = bytearray(data)
         
         
-        sboxes = self._generate_sboxes(key)
-        inv_sboxes = self._generate_inverse_sboxes(sboxes)
         permutation_key = self._generate_permutation_key(key, len(data))
         
-        
-        for round_num in range(self.permutation_rounds - 1, -1, -1):
-            
-            round_key = self._derive_round_key(key, round_num, len(result))
-            result = self._xor_with_key(result, round_key)
-            
-            
-            result = self._apply_inverse_permutation(result, permutation_key, round_num)
-            
-            
-            result = self._apply_substitution(result, inv_sboxes, round_num)
+        with self.schedule_cache.lease(key, self.permutation_rounds,
+                                       self.sbox_count) as schedule:
+            for round_num in range(self.permutation_rounds - 1, -1, -1):
+                
+                round_key = schedule.round_keystream(round_num, len(result))
+                result = self._xor_with_key(result, round_key)
+                
+                
+                result = self._apply_inverse_permutation(result, permutation_key, round_num)
+                
+                
+                result = self._apply_substitution(result, schedule.inv_sboxes, round_num)
         
         return bytes(result)
     
     def _generate_sboxes(self, key: bytes) -> List[List[int]]:
         
-        sboxes = []
-        
-        for i in range(self.sbox_count):
-            
-            seed = hashlib.sha256(key + i.to_bytes(4, 'big')).digest()
-            
-            
-            sbox = list(range(256))
-            
-            
-            for j in range(255, 0, -1):
-                
-                rand_byte = seed[j % len(seed)]
-                k = rand_byte % (j + 1)
-                sbox[j], sbox[k] = sbox[k], sbox[j]
-            
-            sboxes.append(sbox)
-        
-        return sboxes
+        return KeySchedule._generate_sboxes(key, self.sbox_count)
     
     def _generate_inverse_sboxes(self, sboxes: List[List[int]]) -> List[List[int]]:
         
-        inv_sboxes = []
-        
-        for sbox in sboxes:
-            inv_sbox = [0] * 256
-            for i, val in enumerate(sbox):
-                inv_sbox[val] = i
-            inv_sboxes.append(inv_sbox)
-        
-        return inv_sboxes
+        return KeySchedule._generate_inverse_sboxes(sboxes)
     
     def _apply_substitution(self, data: bytearray, sboxes: List[List[int]], 
                            round_num: int) -> bytearray:
@@ -150,16 +128,7 @@ class CryptoLayerManager:
         round_data = master_key + round_num.to_bytes(4, 'big')
         key_material = hashlib.sha512(round_data).digest()
         
-        
-        result = b''
-        counter = 0
-        while len(result) < length:
-            result += hashlib.sha512(
-                key_material + counter.to_bytes(4, 'big')
-            ).digest()
-            counter += 1
-        
-        return result[:length]
+        return KeySchedule._expand(key_material, 0, length)[:length]
     
     def _xor_with_key(self, data: bytearray, key: bytes) -> bytearray:
         
@@ -1,7 +1,8 @@
 
 
+import hmac
 import struct
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Iterator, Optional, Tuple, Union
 
 from config.constants import CryptoConstants
 from config.settings import Settings
@@ -9,6 +10,12 @@ from algorithms.aes_handler import AESHandler
 from algorithms.chacha_handler import ChaChaHandler
 from algorithms.rsa_handler import RSAHandler
 from core.crypto_layers import CryptoLayerManager
+from core.header_parser import EncryptedContainer, parse_container
+from core.segmented_container import (
+    AES_TAG_SIZE, SEGMENT_COMPRESSED, SegmentIndex, index_mac_parts,
+    parse_segment_index, segment_aad, segment_nonce
+)
+from processors import OFFICE_PROCESSORS
 from utils.compression import CompressionHandler
 from security.integrity_checker import IntegrityChecker
 
@@ -16,12 +23,15 @@ from security.integrity_checker import IntegrityChecker
 class DecryptionEngine:
     
     
-    def __init__(self, key_bundle: dict, key_manager):
+    def __init__(self, key_bundle: dict, key_manager, strict_keys: Optional[bool] = None):
         
         self.key_bundle = key_bundle
         self.key_manager = key_manager
         self.settings = Settings()
         self.constants = CryptoConstants()
+        self.strict_keys = (
+            self.settings.STRICT_KEY_VERIFICATION if strict_keys is None else strict_keys
+        )
         
         
         self.master_key = key_bundle['master_key']
@@ -33,200 +43,286 @@ class DecryptionEngine:
         self.chacha_nonce = key_bundle['chacha_nonce']
         
         
-        self.rsa_private_key = self.key_manager.deserialize_private_key(
-            key_bundle['rsa_private_key']
-        )
         self.rsa_public_key = self.key_manager.deserialize_public_key(
             key_bundle['rsa_public_key']
         )
+        self._rsa_private_key = None
+        self._rsa_handler = None
         
         
         self.aes_handler = AESHandler(self.aes_key)
         self.chacha_handler = ChaChaHandler(self.chacha_key)
-        self.rsa_handler = RSAHandler(self.rsa_public_key, self.rsa_private_key)
         self.crypto_layer_manager = CryptoLayerManager()
         self.compression_handler = CompressionHandler()
         self.integrity_checker = IntegrityChecker()
     
-    def decrypt(self, encrypted_file: bytes) -> Dict[str, Any]:
+    @property
+    def rsa_private_key(self):
         
-        
-        parsed = self._parse_encrypted_file(encrypted_file)
-        
-        
-        if parsed['version'] != self.key_bundle.get('version'):
-            raise ValueError(
-                f"Несовместимая версия: файл {parsed['version']}, "
-                f"ключ {self.key_bundle.get('version')}"
+        if self._rsa_private_key is None:
+            self._rsa_private_key = self.key_manager.deserialize_private_key(
+                self.key_bundle['rsa_private_key']
             )
+        return self._rsa_private_key
+    
+    @property
+    def rsa_handler(self) -> RSAHandler:
         
+        if self._rsa_handler is None:
+            self._rsa_handler = RSAHandler(self.rsa_public_key, self.rsa_private_key)
+        return self._rsa_handler
+    
+    def decrypt(self, encrypted_file: Union[bytes, memoryview]) -> Dict[str, Any]:
         
-        self._verify_integrity(parsed)
         
+        parsed = self._parse_encrypted_file(encrypted_file)
         
-        decrypted_keys = self.rsa_handler.decrypt(parsed['encrypted_keys'])
-        self._verify_keys(decrypted_keys)
         
-        
-        after_custom = self.crypto_layer_manager.remove_custom_transformations(
-            data=parsed['encrypted_data'],
-            key=self.master_key
-        )
+        self._check_version(parsed)
         
         
-        after_chacha = self.chacha_handler.decrypt(
-            data=after_custom,
-            nonce=self.chacha_nonce
-        )
+        self._verify_integrity(parsed)
         
         
-        decrypted_data = self.aes_handler.decrypt(
-            data=after_chacha,
-            iv=self.aes_iv,
-            tag=parsed['aes_tag'],
-            associated_data=parsed['metadata']['filename'].encode()
-        )
+        self.verify_key_wrap(parsed)
         
         
-        final_data = decrypted_data
-        if parsed['flags']['compressed']:
-            final_data = self.compression_handler.decompress(decrypted_data)
+        if parsed.flags['segmented']:
+            index = self._segment_index(parsed)
+            final_data = b''.join(
+                self._decrypt_segment(parsed, index, i) for i in range(len(index))
+            )
+        else:
+            final_data = self._decrypt_payload(parsed)
         
         
-        if len(final_data) != parsed['metadata']['original_size']:
+        if len(final_data) != parsed.original_size:
             raise ValueError(
                 f"Несоответствие размера: ожидалось "
-                f"{parsed['metadata']['original_size']}, "
+                f"{parsed.original_size}, "
                 f"получено {len(final_data)}"
             )
         
         return {
             'data': final_data,
-            'file_type': parsed['metadata']['file_type'],
-            'original_filename': parsed['metadata']['filename'],
-            'timestamp': parsed['timestamp'],
-            'original_size': parsed['metadata']['original_size']
+            'file_type': parsed.file_type,
+            'original_filename': parsed.filename,
+            'timestamp': parsed.timestamp,
+            'original_size': parsed.original_size
         }
     
-    def _parse_encrypted_file(self, encrypted_file: bytes) -> Dict[str, Any]:
-        
-        offset = 0
-        
+    def decrypt_stream(self, encrypted_file: Union[bytes, memoryview]
+                       ) -> Tuple[Dict[str, Any], Iterator[bytes]]:
         
-        magic = encrypted_file[offset:offset + 6]
-        if magic != self.constants.MAGIC_NUMBER:
-            raise ValueError("Неверный формат файла: магическое число не совпадает")
-        offset += 6
+        parsed = self._parse_encrypted_file(encrypted_file)
+        self._check_version(parsed)
+        self._verify_integrity(parsed)
+        self.verify_key_wrap(parsed)
         
+        metadata = {
+            'file_type': parsed.file_type,
+            'original_filename': parsed.filename,
+            'timestamp': parsed.timestamp,
+            'original_size': parsed.original_size
+        }
         
-        version_bytes = encrypted_file[offset:offset + 2]
-        version = f"{version_bytes[0]}.{version_bytes[1]}.0"  
-        offset += 2
+        if parsed.flags['segmented']:
+            index = self._segment_index(parsed)
+            return metadata, (
+                self._decrypt_segment(parsed, index, i) for i in range(len(index))
+            )
         
+        # Несегментированный контейнер аутентифицируется только целиком:
+        # открытый текст собирается полностью и отдаётся одним блоком
+        final_data = self._decrypt_payload(parsed)
+        if len(final_data) != parsed.original_size:
+            raise ValueError(
+                f"Несоответствие размера: ожидалось "
+                f"{parsed.original_size}, "
+                f"получено {len(final_data)}"
+            )
+        return metadata, iter((final_data,))
+    
+    def decrypt_range(self, encrypted_file: Union[bytes, memoryview], offset: int,
+                      length: Optional[int] = None) -> bytes:
         
-        flags_int = struct.unpack('<I', encrypted_file[offset:offset + 4])[0]
-        flags = self.constants.parse_flags(flags_int)
-        offset += 4
+        if offset < 0 or (length is not None and length < 0):
+            raise ValueError("Смещение и длина диапазона должны быть неотрицательными")
         
+        parsed = self._parse_encrypted_file(encrypted_file)
+        self._check_version(parsed)
         
-        timestamp = struct.unpack('<Q', encrypted_file[offset:offset + 8])[0]
-        offset += 8
+        if not parsed.flags['segmented']:
+            raise ValueError(
+                "Файл не поддерживает произвольный доступ: "
+                "контейнер зашифрован без сегментов"
+            )
         
         
-        offset += len(self.constants.HEADER_SEPARATOR)
+        index = self._segment_index(parsed)
+        self.verify_key_wrap(parsed)
         
+        end = index.plain_size if length is None else min(offset + length, index.plain_size)
+        covering = index.covering(offset, end)
+        if not covering:
+            return b''
         
-        file_type_len = struct.unpack('<H', encrypted_file[offset:offset + 2])[0]
-        offset += 2
-        file_type = encrypted_file[offset:offset + file_type_len].decode('utf-8')
-        offset += file_type_len
+        data = b''.join(self._decrypt_segment(parsed, index, i) for i in covering)
+        start = offset - covering[0] * index.segment_size
+        return data[start:start + end - offset]
+    
+    def _check_version(self, parsed: EncryptedContainer):
         
-        filename_len = struct.unpack('<H', encrypted_file[offset:offset + 2])[0]
-        offset += 2
-        filename = encrypted_file[offset:offset + filename_len].decode('utf-8')
-        offset += filename_len
+        # Минорная версия контейнера зависит от флагов разметки (FLAG_VERSIONS),
+        # с комплектом ключей сверяется только мажорная
+        bundle_version = str(self.key_bundle.get('version'))
+        if parsed.version.split('.')[0] != bundle_version.split('.')[0]:
+            raise ValueError(
+                f"Несовместимая версия: файл {parsed.version}, "
+                f"ключ {self.key_bundle.get('version')}"
+            )
+    
+    def _decrypt_payload(self, parsed: EncryptedContainer) -> bytes:
         
-        original_size = struct.unpack('<Q', encrypted_file[offset:offset + 8])[0]
-        offset += 8
-        compressed_size = struct.unpack('<Q', encrypted_file[offset:offset + 8])[0]
-        offset += 8
+        after_custom = self.crypto_layer_manager.remove_custom_transformations(
+            data=parsed.encrypted_data,
+            key=self.master_key
+        )
         
         
-        offset += len(self.constants.SECTION_SEPARATOR)
+        after_chacha = self.chacha_handler.decrypt(
+            data=after_custom,
+            nonce=self.chacha_nonce
+        )
         
         
-        salt_len = struct.unpack('<H', encrypted_file[offset:offset + 2])[0]
-        offset += 2
-        salt = encrypted_file[offset:offset + salt_len]
-        offset += salt_len
+        decrypted_data = self.aes_handler.decrypt(
+            data=after_chacha,
+            iv=self.aes_iv,
+            tag=parsed.aes_tag,
+            associated_data=parsed.filename.encode()
+        )
         
-        aes_tag_len = struct.unpack('<H', encrypted_file[offset:offset + 2])[0]
-        offset += 2
-        aes_tag = encrypted_file[offset:offset + aes_tag_len]
-        offset += aes_tag_len
         
-        encrypted_keys_len = struct.unpack('<H', encrypted_file[offset:offset + 2])[0]
-        offset += 2
-        encrypted_keys = encrypted_file[offset:offset + encrypted_keys_len]
-        offset += encrypted_keys_len
+        if parsed.flags['compressed']:
+            decrypted_data = self.compression_handler.decompress(decrypted_data)
         
+        if parsed.flags['office_zip']:
+            processor_class = OFFICE_PROCESSORS.get(parsed.file_type)
+            if processor_class is None:
+                raise ValueError(
+                    f"Неверный формат файла: Office-перепаковка для типа {parsed.file_type}"
+                )
+            decrypted_data = processor_class().postprocess(decrypted_data)
+        return decrypted_data
+    
+    def _segment_index(self, parsed: EncryptedContainer) -> SegmentIndex:
         
-        offset += len(self.constants.SECTION_SEPARATOR)
+        try:
+            index = parse_segment_index(
+                parsed.encrypted_data, trailer=parsed.flags['segment_trailer']
+            )
+        except struct.error:
+            raise ValueError("Неверный формат файла: файл обрезан или поврежден")
+        
+        expected = self.integrity_checker.create_hmac_parts(
+            parts=index_mac_parts(
+                (parsed.file_type_raw, parsed.filename_raw, parsed.sizes_raw),
+                index.index_raw
+            ),
+            key=self.hmac_key,
+            algorithm='sha256'
+        )
+        if not hmac.compare_digest(expected, index.index_mac):
+            raise ValueError(
+                "Проверка целостности не пройдена: индекс сегментов поврежден или изменен"
+            )
         
+        if index.plain_size != parsed.original_size:
+            raise ValueError(
+                f"Несоответствие размера: ожидалось "
+                f"{parsed.original_size}, "
+                f"получено {index.plain_size}"
+            )
+        return index
+    
+    def _decrypt_segment(self, parsed: EncryptedContainer, index: SegmentIndex,
+                         i: int) -> bytes:
         
-        encrypted_data_len = struct.unpack('<Q', encrypted_file[offset:offset + 8])[0]
-        offset += 8
-        encrypted_data = encrypted_file[offset:offset + encrypted_data_len]
-        offset += encrypted_data_len
+        plain_len = index.plain_lens[i]
+        aad = segment_aad(parsed.filename_raw, i, i == len(index) - 1, plain_len)
         
+        after_custom = self.crypto_layer_manager.remove_custom_transformations(
+            data=index.segment(parsed.encrypted_data, i),
+            key=self.master_key
+        )
         
-        offset += len(self.constants.SECTION_SEPARATOR)
+        after_chacha = self.chacha_handler.decrypt(
+            data=after_custom,
+            nonce=segment_nonce(self.chacha_nonce, i),
+            associated_data=aad
+        )
         
+        decrypted_data = self.aes_handler.decrypt(
+            data=after_chacha[:-AES_TAG_SIZE],
+            iv=segment_nonce(self.aes_iv, i),
+            tag=after_chacha[-AES_TAG_SIZE:],
+            associated_data=aad
+        )
         
-        hmac_signature = encrypted_file[offset:offset + self.constants.HMAC_SIZE]
+        if index.seg_flags[i] & SEGMENT_COMPRESSED:
+            decrypted_data = self.compression_handler.decompress(decrypted_data)
         
-        return {
-            'version': version,
-            'flags': flags,
-            'timestamp': timestamp,
-            'metadata': {
-                'file_type': file_type,
-                'filename': filename,
-                'original_size': original_size,
-                'compressed_size': compressed_size
-            },
-            'salt': salt,
-            'aes_tag': aes_tag,
-            'encrypted_keys': encrypted_keys,
-            'encrypted_data': encrypted_data,
-            'hmac_signature': hmac_signature
-        }
+        if len(decrypted_data) != plain_len:
+            raise ValueError(
+                f"Несоответствие размера сегмента {i}: ожидалось "
+                f"{plain_len}, получено {len(decrypted_data)}"
+            )
+        return decrypted_data
     
-    def _verify_integrity(self, parsed: Dict[str, Any]):
-        
-        
-        hmac_data = parsed['encrypted_data']
-        hmac_data += parsed['metadata']['file_type'].encode()
-        hmac_data += parsed['metadata']['filename'].encode()
-        hmac_data += struct.pack('<Q', parsed['metadata']['original_size'])
-        hmac_data += struct.pack('<Q', parsed['metadata']['compressed_size'])
-        
-        
-        calculated_hmac = self.integrity_checker.create_hmac(
-            data=hmac_data,
-            key=self.hmac_key
-        )
+    def _parse_encrypted_file(self, encrypted_file: Union[bytes, memoryview]) -> EncryptedContainer:
         
+        try:
+            return parse_container(encrypted_file)
+        except struct.error:
+            raise ValueError("Неверный формат файла: файл обрезан или поврежден")
+    
+    def _verify_integrity(self, parsed: EncryptedContainer):
         
-        if not self.integrity_checker.verify_hmac(
-            data=hmac_data,
-            hmac_signature=parsed['hmac_signature'],
+        if not self.integrity_checker.verify_hmac_parts(
+            parts=parsed.hmac_parts(),
+            hmac_signature=parsed.hmac_signature,
             key=self.hmac_key
         ):
             raise ValueError(
                 "Проверка целостности не пройдена: файл поврежден или изменен"
             )
     
+    def keys_bundle(self) -> bytes:
+        
+        return b''.join(
+            struct.pack('<H', len(value)) + value
+            for value in (self.aes_key, self.chacha_key, self.hmac_key,
+                          self.aes_iv, self.chacha_nonce)
+        )
+    
+    def verify_key_wrap(self, parsed: EncryptedContainer):
+        
+        if self.strict_keys or not parsed.key_fingerprint:
+            decrypted_keys = self.rsa_handler.decrypt(parsed.encrypted_keys)
+            self._verify_keys(decrypted_keys)
+        else:
+            self._verify_key_fingerprint(parsed)
+    
+    def _verify_key_fingerprint(self, parsed: EncryptedContainer):
+        
+        expected = self.integrity_checker.create_key_fingerprint(
+            self.keys_bundle(), self.hmac_key
+        )
+        
+        if not hmac.compare_digest(expected, parsed.key_fingerprint):
+            raise ValueError("Отпечаток ключей не совпадает")
+    
     def _verify_keys(self, decrypted_keys: bytes):
         
         offset = 0
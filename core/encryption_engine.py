@@ -3,7 +3,7 @@
 import os
 import struct
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Union
 
 from config.constants import CryptoConstants
 from config.settings import Settings
@@ -11,7 +11,13 @@ from algorithms.aes_handler import AESHandler
 from algorithms.chacha_handler import ChaChaHandler
 from algorithms.rsa_handler import RSAHandler
 from algorithms.hash_functions import HashFunctions
+from core.container_writer import ContainerWriter, container_segments
 from core.crypto_layers import CryptoLayerManager
+from core.segmented_container import (
+    SEGMENT_COMPRESSED, SEGMENT_COUNT, encode_index, index_mac_parts, segment_aad,
+    segment_nonce
+)
+from processors import OFFICE_PROCESSORS
 from utils.compression import CompressionHandler
 from security.salt_generator import SaltGenerator
 from security.iv_generator import IVGenerator
@@ -87,25 +93,119 @@ class EncryptionEngine:
         self.chacha_handler = ChaChaHandler(self.chacha_key)
         self.rsa_handler = RSAHandler(self.rsa_public_key, self.rsa_private_key)
     
-    def encrypt(self, data: bytes, file_type: str, original_filename: str) -> bytes:
+    def encrypt(self, data: Union[bytes, memoryview], file_type: str,
+                original_filename: str, seekable: Optional[bool] = None) -> bytes:
         
+        return b''.join(container_segments(
+            **self._encrypt_sections(data, file_type, original_filename, seekable)
+        ))
+    
+    def encrypt_to(self, data: Union[bytes, memoryview], file_type: str,
+                   original_filename: str, sink, seekable: Optional[bool] = None) -> int:
         
-        original_size = len(data)
-        compressed_data = data
-        compressed = False
+        sections = self._encrypt_sections(data, file_type, original_filename, seekable)
+        with ContainerWriter(sink) as writer:
+            return writer.write_container(**sections)
+    
+    def stream_encryptor(self, file_type: str, original_filename: str,
+                         sink=None) -> 'StreamEncryptor':
         
-        if self.settings.COMPRESSION_ENABLED:
-            compressed_data = self.compression_handler.compress(
-                data, 
-                level=self.settings.COMPRESSION_LEVEL
-            )
-            compressed = len(compressed_data) < len(data)
-            
-            if not compressed:
-                compressed_data = data
+        return StreamEncryptor(self, file_type, original_filename, sink)
+    
+    def _encrypt_sections(self, data: Union[bytes, memoryview], file_type: str,
+                          original_filename: str,
+                          seekable: Optional[bool] = None) -> Dict[str, Any]:
+        
+        if seekable is None:
+            seekable = self.settings.SEGMENTED_CONTAINERS
+        
+        if seekable:
+            encryptor = self.stream_encryptor(file_type, original_filename)
+            encryptor.update(data)
+            return encryptor.finish()
+        
+        payload, compressed, office_zip = self._prepare_payload(data, file_type)
+        final_encrypted, aes_tag = self._encrypt_payload(payload, original_filename)
+        
+        return self._sealed_sections(
+            encrypted_data=[final_encrypted],
+            aes_tag=aes_tag,
+            metadata={
+                'file_type': file_type,
+                'filename': original_filename,
+                'original_size': len(data),
+                'compressed_size': len(payload),
+                'compressed': compressed,
+                'segmented': False,
+                'office_zip': office_zip
+            }
+        )
+    
+    def _sealed_sections(self, encrypted_data: List[bytes], aes_tag: bytes,
+                         metadata: dict) -> Dict[str, Any]:
+        
+        encrypted_keys, key_fingerprint = self._wrapped_keys()
+        
+        
+        hmac_parts = self._prepare_hmac_data(
+            encrypted_data=encrypted_data,
+            metadata=metadata,
+            key_fingerprint=key_fingerprint
+        )
+        
+        hmac_signature = self.integrity_checker.create_hmac_parts(
+            parts=hmac_parts,
+            key=self.hmac_key
+        )
+        
+        
+        return self._container_fields(
+            encrypted_data=encrypted_data,
+            encrypted_keys=encrypted_keys,
+            hmac_signature=hmac_signature,
+            aes_tag=aes_tag,
+            metadata=metadata,
+            key_fingerprint=key_fingerprint
+        )
+    
+    def _wrapped_keys(self):
         
-        compressed_size = len(compressed_data)
+        keys_bundle = self._create_keys_bundle()
+        encrypted_keys = self.rsa_handler.encrypt(keys_bundle)
         
+        key_fingerprint = b''
+        if self.settings.EMBED_KEY_FINGERPRINT:
+            key_fingerprint = self.integrity_checker.create_key_fingerprint(
+                keys_bundle, self.hmac_key
+            )
+        return encrypted_keys, key_fingerprint
+    
+    def _prepare_payload(self, data: Union[bytes, memoryview], file_type: str):
+        
+        if not self.settings.COMPRESSION_ENABLED:
+            return data, False, False
+        
+        # DOCX/XLSX: сжатие распакованного XML вместо уже сжатого ZIP
+        processor_class = OFFICE_PROCESSORS.get(file_type)
+        if processor_class is not None and self.settings.OFFICE_RECOMPRESSION:
+            expanded = processor_class().preprocess(data)
+            if expanded is not data:
+                packed = self.compression_handler.compress(
+                    expanded,
+                    level=self.settings.COMPRESSION_LEVEL
+                )
+                if len(packed) < len(data):
+                    return packed, True, True
+        
+        compressed_data = self.compression_handler.compress(
+            data, 
+            level=self.settings.COMPRESSION_LEVEL
+        )
+        if len(compressed_data) < len(data):
+            return compressed_data, True, False
+        return data, False, False
+    
+    def _encrypt_payload(self, compressed_data: Union[bytes, memoryview], original_filename: str):
         
         aes_encrypted, aes_tag = self.aes_handler.encrypt(
             data=compressed_data,
@@ -125,42 +225,59 @@ class EncryptionEngine:
             key=self.master_key
         )
         
+        return final_encrypted, aes_tag
+    
+    def _seal_segment(self, index: int, chunk: Union[bytes, memoryview], final: bool,
+                      filename_raw: bytes):
         
-        keys_bundle = self._create_keys_bundle()
-        encrypted_keys = self.rsa_handler.encrypt(keys_bundle)
+        stored = chunk
+        seg_flags = 0
         
+        if self.settings.COMPRESSION_ENABLED:
+            packed = self.compression_handler.compress(
+                chunk,
+                level=self.settings.COMPRESSION_LEVEL
+            )
+            if len(packed) < len(chunk):
+                stored = packed
+                seg_flags = SEGMENT_COMPRESSED
         
-        hmac_data = self._prepare_hmac_data(
-            encrypted_data=final_encrypted,
-            metadata={
-                'file_type': file_type,
-                'filename': original_filename,
-                'original_size': original_size,
-                'compressed_size': compressed_size
-            }
-        )
+        aad = segment_aad(filename_raw, index, final, len(chunk))
         
-        hmac_signature = self.integrity_checker.create_hmac(
-            data=hmac_data,
-            key=self.hmac_key
+        aes_encrypted, aes_tag = self.aes_handler.encrypt(
+            data=stored,
+            iv=segment_nonce(self.aes_iv, index),
+            associated_data=aad
         )
         
+        chacha_encrypted = self.chacha_handler.encrypt(
+            data=aes_encrypted + aes_tag,
+            nonce=segment_nonce(self.chacha_nonce, index),
+            associated_data=aad
+        )
         
-        encrypted_file = self._build_encrypted_file(
-            encrypted_data=final_encrypted,
-            encrypted_keys=encrypted_keys,
-            hmac_signature=hmac_signature,
-            aes_tag=aes_tag,
-            metadata={
-                'file_type': file_type,
-                'filename': original_filename,
-                'original_size': original_size,
-                'compressed_size': compressed_size,
-                'compressed': compressed
-            }
+        sealed = self.crypto_layer_manager.apply_custom_transformations(
+            data=chacha_encrypted,
+            key=self.master_key
         )
         
-        return encrypted_file
+        return sealed, (len(sealed), len(chunk), seg_flags), len(stored)
+    
+    def _segment_index_parts(self, entries: List[tuple], file_type: str, filename_raw: bytes,
+                             original_size: int, compressed_size: int) -> List[bytes]:
+        
+        index_raw = encode_index(self.settings.SEGMENT_SIZE, entries)
+        index_mac = self.integrity_checker.create_hmac_parts(
+            parts=index_mac_parts(
+                (file_type.encode(), filename_raw,
+                 struct.pack('<QQ', original_size, compressed_size)),
+                index_raw
+            ),
+            key=self.hmac_key,
+            algorithm='sha256'
+        )
+        # Индекс записывается после сегментов (flags.segment_trailer)
+        return [index_raw, index_mac, SEGMENT_COUNT.pack(len(entries))]
     
     def _create_keys_bundle(self) -> bytes:
         
@@ -173,80 +290,69 @@ class EncryptionEngine:
         
         return keys_bundle
     
-    def _prepare_hmac_data(self, encrypted_data: bytes, metadata: dict) -> bytes:
-        
-        hmac_data = encrypted_data
-        hmac_data += metadata['file_type'].encode()
-        hmac_data += metadata['filename'].encode()
-        hmac_data += struct.pack('<Q', metadata['original_size'])
-        hmac_data += struct.pack('<Q', metadata['compressed_size'])
-        
-        return hmac_data
+    def _prepare_hmac_data(self, encrypted_data: List[bytes], metadata: dict,
+                           key_fingerprint: bytes = b'') -> List[bytes]:
+        
+        parts = [
+            *encrypted_data,
+            metadata['file_type'].encode(),
+            metadata['filename'].encode(),
+            struct.pack('<Q', metadata['original_size']),
+            struct.pack('<Q', metadata['compressed_size']),
+        ]
+        if key_fingerprint:
+            parts.append(key_fingerprint)
+        return parts
     
-    def _build_encrypted_file(self,
-                             encrypted_data: bytes,
-                             encrypted_keys: bytes,
-                             hmac_signature: bytes,
-                             aes_tag: bytes,
-                             metadata: dict) -> bytes:
-        
-        result = bytearray()
-        
-        
-        result.extend(self.constants.MAGIC_NUMBER)  
-        result.extend(self.constants.VERSION_BYTES)  
-        
+    def _container_fields(self,
+                          encrypted_data: List[bytes],
+                          encrypted_keys: bytes,
+                          hmac_signature: bytes,
+                          aes_tag: bytes,
+                          metadata: dict,
+                          key_fingerprint: bytes = b'') -> Dict[str, Any]:
         
         flags = self.constants.create_flags(
             compressed=metadata['compressed'],
             multi_layer=True,
             rsa_protected=True,
             integrity_check=True,
-            metadata_encrypted=False
+            metadata_encrypted=False,
+            key_fingerprint=bool(key_fingerprint),
+            segmented=metadata.get('segmented', False),
+            office_zip=metadata.get('office_zip', False),
+            segment_trailer=metadata.get('segmented', False)
         )
-        result.extend(struct.pack('<I', flags))
-        
-        
-        result.extend(struct.pack('<Q', int(time.time())))
-        
-        result.extend(self.constants.HEADER_SEPARATOR)
         
+        return {
+            'flags': flags,
+            'timestamp': int(time.time()),
+            'file_type': metadata['file_type'],
+            'filename': metadata['filename'],
+            'original_size': metadata['original_size'],
+            'compressed_size': metadata['compressed_size'],
+            'salt': self.salt,
+            'aes_tag': aes_tag,
+            'encrypted_keys': encrypted_keys,
+            'key_fingerprint': key_fingerprint,
+            'encrypted_data': encrypted_data,
+            'hmac_signature': hmac_signature,
+        }
+    
+    def _build_encrypted_file(self,
+                             encrypted_data: bytes,
+                             encrypted_keys: bytes,
+                             hmac_signature: bytes,
+                             aes_tag: bytes,
+                             metadata: dict) -> bytes:
         
-        file_type_bytes = metadata['file_type'].encode('utf-8')
-        result.extend(struct.pack('<H', len(file_type_bytes)))
-        result.extend(file_type_bytes)
-        
-        filename_bytes = metadata['filename'].encode('utf-8')
-        result.extend(struct.pack('<H', len(filename_bytes)))
-        result.extend(filename_bytes)
-        
-        result.extend(struct.pack('<Q', metadata['original_size']))
-        result.extend(struct.pack('<Q', metadata['compressed_size']))
-        
-        result.extend(self.constants.SECTION_SEPARATOR)
-        
-        
-        result.extend(struct.pack('<H', len(self.salt)))
-        result.extend(self.salt)
-        
-        result.extend(struct.pack('<H', len(aes_tag)))
-        result.extend(aes_tag)
-        
-        result.extend(struct.pack('<H', len(encrypted_keys)))
-        result.extend(encrypted_keys)
-        
-        result.extend(self.constants.SECTION_SEPARATOR)
-        
-        
-        result.extend(struct.pack('<Q', len(encrypted_data)))
-        result.extend(encrypted_data)
-        
-        result.extend(self.constants.SECTION_SEPARATOR)
-        
-        
-        result.extend(hmac_signature)
-        
-        return bytes(result)
+        return b''.join(container_segments(**self._container_fields(
+            encrypted_data=encrypted_data,
+            encrypted_keys=encrypted_keys,
+            hmac_signature=hmac_signature,
+            aes_tag=aes_tag,
+            metadata=metadata
+        )))
     
     def get_key_bundle(self) -> dict:
         
@@ -261,4 +367,130 @@ class EncryptionEngine:
             'rsa_private_key': self.key_manager.serialize_private_key(self.rsa_private_key),
             'rsa_public_key': self.key_manager.serialize_public_key(self.rsa_public_key),
             'version': self.settings.ENCRYPTION_VERSION
-        }
\ No newline at end of file
+        }
+
+
+class StreamEncryptor:
+    """Incremental encryption into a seekable container.
+
+    update() seals each complete segment as soon as the plaintext following it
+    arrives. Sealed segments are folded into the container HMAC right away;
+    with a sink they are also written straight through ContainerWriter, so
+    only one segment of plaintext and the segment index stay in memory, and
+    finish() appends the index, back-patches the header sizes and returns the
+    number of bytes written. Without a sink the segments are kept and finish()
+    returns the container sections for ContainerWriter.write_container().
+    """
+    
+    def __init__(self, engine: EncryptionEngine, file_type: str, original_filename: str,
+                 sink=None):
+        self.engine = engine
+        self.file_type = file_type
+        self.original_filename = original_filename
+        self.segment_size = engine.settings.SEGMENT_SIZE
+        self.original_size = 0
+        self.compressed_size = 0
+        self._filename_raw = original_filename.encode()
+        self._pending = bytearray()
+        self._entries: List[tuple] = []
+        self._segments: List[bytes] = []
+        self._encrypted_keys, self._key_fingerprint = engine._wrapped_keys()
+        self._mac = engine.integrity_checker.new_hmac(engine.hmac_key)
+        self._sink = sink
+        self._writer: Optional[ContainerWriter] = None
+    
+    def update(self, chunk: Union[bytes, memoryview]) -> None:
+        
+        view = memoryview(chunk)
+        self.original_size += len(view)
+        
+        if self._pending:
+            take = self.segment_size - len(self._pending)
+            self._pending += view[:take]
+            view = view[take:]
+            if not view:
+                return
+            self._seal(memoryview(self._pending), final=False)
+            self._pending = bytearray()
+        
+        # A full segment is only known not to be the final one once more data
+        # follows it, so the tail always stays buffered until finish().
+        while len(view) > self.segment_size:
+            self._seal(view[:self.segment_size], final=False)
+            view = view[self.segment_size:]
+        self._pending += view
+    
+    def _seal(self, chunk: memoryview, final: bool) -> None:
+        
+        with chunk:
+            sealed, entry, stored_len = self.engine._seal_segment(
+                len(self._entries), chunk, final, self._filename_raw
+            )
+        self._entries.append(entry)
+        self.compressed_size += stored_len
+        self._emit(sealed)
+    
+    def _emit(self, part: bytes) -> None:
+        
+        self._mac.update(part)
+        if self._sink is None:
+            self._segments.append(part)
+            return
+        if self._writer is None:
+            # Размеры ещё неизвестны: finish() допишет их в заголовок
+            fields = self._fields(hmac_signature=b'')
+            del fields['encrypted_data'], fields['hmac_signature']
+            self._writer = ContainerWriter(self._sink)
+            self._writer.begin(**fields)
+        self._writer.write_data(part)
+    
+    def _metadata(self) -> Dict[str, Any]:
+        
+        return {
+            'file_type': self.file_type,
+            'filename': self.original_filename,
+            'original_size': self.original_size,
+            'compressed_size': self.compressed_size,
+            'compressed': self.engine.settings.COMPRESSION_ENABLED,
+            'segmented': True
+        }
+    
+    def _fields(self, hmac_signature: bytes) -> Dict[str, Any]:
+        
+        return self.engine._container_fields(
+            encrypted_data=self._segments,
+            encrypted_keys=self._encrypted_keys,
+            hmac_signature=hmac_signature,
+            aes_tag=b'',
+            metadata=self._metadata(),
+            key_fingerprint=self._key_fingerprint
+        )
+    
+    def finish(self) -> Union[Dict[str, Any], int]:
+        
+        self._seal(memoryview(self._pending), final=True)
+        self._pending = bytearray()
+        
+        for part in self.engine._segment_index_parts(
+            self._entries, self.file_type, self._filename_raw,
+            self.original_size, self.compressed_size
+        ):
+            self._emit(part)
+        for part in self.engine._prepare_hmac_data(
+            encrypted_data=[], metadata=self._metadata(),
+            key_fingerprint=self._key_fingerprint
+        ):
+            self._mac.update(part)
+        hmac_signature = self._mac.digest()
+        
+        if self._writer is None:
+            return self._fields(hmac_signature)
+        with self._writer:
+            return self._writer.finish(
+                hmac_signature, self.original_size, self.compressed_size
+            )
+    
+    def close(self) -> None:
+        
+        if self._writer is not None:
+            self._writer.close()
@@ -1,12 +1,17 @@
 """
-Standalone encrypted file header parser.
+Encrypted container parser shared by DecryptionEngine and POST /api/files/inspect.
 
-Parses the public portion of the binary header format without requiring
-key material. Used by POST /api/files/inspect.
+The public header can be parsed without key material (parse_encrypted_header /
+parse_header); parse_container additionally walks the crypto-info, data and
+HMAC sections. All parsing goes through precompiled struct.Struct layouts over
+a memoryview, so the ciphertext is returned as a zero-copy slice of the input
+buffer (bytes, bytearray or an mmap view).
 
 Header layout (little-endian):
   0..5   MAGIC_NUMBER b'DOCENC' (6 bytes)
-  6..7   version major.minor (2 bytes)
+  6..7   version major.minor (2 bytes); flags that change the layout raise the
+         minor version (CryptoConstants.FLAG_VERSIONS), so readers that only
+         know an older layout refuse the container instead of misparsing it
   8..11  flags uint32 LE (4 bytes)
   12..19 timestamp uint64 LE (8 bytes)
   20..23 HEADER_SEPARATOR b'\\xFF\\xFE\\xFD\\xFC' (4 bytes)
@@ -16,83 +21,207 @@ Header layout (little-endian):
   ...    filename UTF-8 string
   ...    original_size uint64 LE (8 bytes)
   ...    compressed_size uint64 LE (8 bytes)
+
+Body layout (follows the header):
+  SECTION_SEPARATOR (4 bytes)
+  salt_len uint16 LE + salt
+  aes_tag_len uint16 LE + aes_tag
+  encrypted_keys_len uint16 LE + encrypted_keys
+  [key_fingerprint_len uint16 LE + key_fingerprint]  only if flags.key_fingerprint
+  SECTION_SEPARATOR (4 bytes)
+  encrypted_data_len uint64 LE + encrypted_data
+  SECTION_SEPARATOR (4 bytes)
+  hmac_signature (HMAC_SIZE bytes)
+
+key_fingerprint is HMAC-SHA256 (hmac_key) over the RSA-wrapped keys bundle. It
+lets DecryptionEngine confirm the supplied key bundle matches the container
+without an RSA private-key operation; when present it is also covered by the
+container HMAC.
+
+When flags.segmented is set, aes_tag is empty and encrypted_data holds
+independently encrypted segments and a segment index (before the segments, or
+after them with flags.segment_trailer); see core/segmented_container.py. When flags.office_zip is set, the decompressed
+payload is an expanded DOCX/XLSX package that processors/office_zip.py turns
+back into the original file.
 """
 import struct
+from typing import List, Union
 
 from config.constants import CryptoConstants
 
-
-def parse_encrypted_header(data: bytes) -> dict:
-    """Parse public header metadata from an encrypted file.
-
-    Args:
-        data: Raw bytes of the encrypted file (full file or at least ~200 bytes).
-
-    Returns:
-        dict with keys: format_version, original_filename, file_type, timestamp,
-        flags, original_size, compressed_size.
-
-    Raises:
-        ValueError: If magic number does not match (not an encrypted file).
-        struct.error: If file is truncated (too short to parse header).
-    """
-    constants = CryptoConstants()
-    offset = 0
-
+# magic, version, flags, timestamp, header separator
+FIXED_HEADER = struct.Struct('<6s2sIQ4s')
+U16 = struct.Struct('<H')
+U64 = struct.Struct('<Q')
+SIZES = struct.Struct('<QQ')
+
+_MAGIC_LEN = len(CryptoConstants.MAGIC_NUMBER)
+_SEPARATOR_LEN = len(CryptoConstants.SECTION_SEPARATOR)
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class ContainerHeader:
+    """Public header fields of an encrypted container."""
+
+    __slots__ = (
+        'version', 'flags', 'timestamp', 'file_type', 'filename',
+        'original_size', 'compressed_size', 'header_end',
+        'file_type_raw', 'filename_raw', 'sizes_raw',
+    )
+
+    def to_dict(self) -> dict:
+        return {
+            "format_version": self.version,
+            "original_filename": self.filename,
+            "file_type": self.file_type,
+            "timestamp": self.timestamp,
+            "flags": self.flags,
+            "original_size": self.original_size,
+            "compressed_size": self.compressed_size,
+        }
+
+
+class EncryptedContainer(ContainerHeader):
+    """Fully parsed container. encrypted_data is a view into the input buffer."""
+
+    __slots__ = (
+        'salt', 'aes_tag', 'encrypted_keys', 'encrypted_keys_offset',
+        'key_fingerprint', 'encrypted_data', 'hmac_signature',
+    )
+
+    def hmac_parts(self) -> List[Buffer]:
+        """Buffers covered by the container HMAC, in order, taken from the input as-is."""
+        parts = [
+            self.encrypted_data,
+            self.file_type_raw,
+            self.filename_raw,
+            self.sizes_raw,
+        ]
+        if self.key_fingerprint:
+            parts.append(self.key_fingerprint)
+        return parts
+
+
+def _parse_header_into(record: ContainerHeader, view: memoryview) -> int:
+    """Fill header fields of `record` from `view`; return the offset after the header."""
     # Magic number check
-    if len(data) < 6:
+    if len(view) < _MAGIC_LEN:
         raise ValueError(
-            f"File too short to contain magic number (need 6 bytes, got {len(data)})"
+            f"File too short to contain magic number (need {_MAGIC_LEN} bytes, got {len(view)})"
         )
-    magic = data[offset:offset + 6]
-    if magic != constants.MAGIC_NUMBER:
+    magic = bytes(view[:_MAGIC_LEN])
+    if magic != CryptoConstants.MAGIC_NUMBER:
         raise ValueError(
             f"Invalid file format: magic number mismatch "
-            f"(expected {constants.MAGIC_NUMBER!r}, got {magic!r})"
+            f"(expected {CryptoConstants.MAGIC_NUMBER!r}, got {magic!r})"
         )
-    offset += 6
-
-    # Version: major.minor as two bytes
-    version_major = data[offset]
-    version_minor = data[offset + 1]
-    version = f"{version_major}.{version_minor}.0"
-    offset += 2
-
-    # Flags: uint32 LE
-    (flags_int,) = struct.unpack('<I', data[offset:offset + 4])
-    flags = constants.parse_flags(flags_int)
-    offset += 4
-
-    # Timestamp: uint64 LE
-    (timestamp,) = struct.unpack('<Q', data[offset:offset + 8])
-    offset += 8
 
-    # Header separator (skip)
-    offset += len(constants.HEADER_SEPARATOR)
+    # Fixed-size prefix: raises struct.error if truncated
+    _, version, flags_int, timestamp, _ = FIXED_HEADER.unpack_from(view, 0)
+    if (version[0] != CryptoConstants.VERSION_BYTES[0]
+            or version > CryptoConstants.latest_version()):
+        raise ValueError(f"Unsupported container format version {version[0]}.{version[1]}")
+    required = CryptoConstants.version_for_flags(flags_int)
+    if version < required:
+        raise ValueError(
+            f"Invalid container: flags require format version {required[0]}.{required[1]}, "
+            f"header declares {version[0]}.{version[1]}"
+        )
+    record.version = f"{version[0]}.{version[1]}.0"
+    record.flags = CryptoConstants.parse_flags(flags_int)
+    record.timestamp = timestamp
+    offset = FIXED_HEADER.size
 
     # file_type_len + file_type
-    (file_type_len,) = struct.unpack('<H', data[offset:offset + 2])
-    offset += 2
-    file_type = data[offset:offset + file_type_len].decode('utf-8')
+    (file_type_len,) = U16.unpack_from(view, offset)
+    offset += U16.size
+    record.file_type_raw = view[offset:offset + file_type_len]
+    record.file_type = bytes(record.file_type_raw).decode('utf-8')
     offset += file_type_len
 
     # filename_len + filename
-    (filename_len,) = struct.unpack('<H', data[offset:offset + 2])
-    offset += 2
-    filename = data[offset:offset + filename_len].decode('utf-8')
+    (filename_len,) = U16.unpack_from(view, offset)
+    offset += U16.size
+    record.filename_raw = view[offset:offset + filename_len]
+    record.filename = bytes(record.filename_raw).decode('utf-8')
     offset += filename_len
 
     # Sizes
-    (original_size,) = struct.unpack('<Q', data[offset:offset + 8])
-    offset += 8
-    (compressed_size,) = struct.unpack('<Q', data[offset:offset + 8])
-
-    return {
-        "format_version": version,
-        "original_filename": filename,
-        "file_type": file_type,
-        "timestamp": timestamp,
-        "flags": flags,
-        "original_size": original_size,
-        "compressed_size": compressed_size,
-    }
+    record.original_size, record.compressed_size = SIZES.unpack_from(view, offset)
+    record.sizes_raw = view[offset:offset + SIZES.size]
+    offset += SIZES.size
+
+    record.header_end = offset
+    return offset
+
+
+def _read_u16_field(view: memoryview, offset: int):
+    (length,) = U16.unpack_from(view, offset)
+    offset += U16.size
+    end = offset + length
+    if end > len(view):
+        raise struct.error(f"field truncated at offset {offset}")
+    return bytes(view[offset:end]), end
+
+
+def parse_header(data: Buffer) -> ContainerHeader:
+    """Parse only the public header.
+
+    Raises:
+        ValueError: If magic number does not match (not an encrypted file).
+        struct.error: If file is truncated (too short to parse header).
+    """
+    record = ContainerHeader()
+    _parse_header_into(record, memoryview(data))
+    return record
+
+
+def parse_container(data: Buffer) -> EncryptedContainer:
+    """Parse a complete encrypted container without copying the ciphertext.
+
+    Raises:
+        ValueError: If magic number does not match (not an encrypted file).
+        struct.error: If the container is truncated.
+    """
+    view = memoryview(data)
+    record = EncryptedContainer()
+    offset = _parse_header_into(record, view)
+
+    offset += _SEPARATOR_LEN
+    record.salt, offset = _read_u16_field(view, offset)
+    record.aes_tag, offset = _read_u16_field(view, offset)
+    record.encrypted_keys_offset = offset
+    record.encrypted_keys, offset = _read_u16_field(view, offset)
+    record.key_fingerprint = b''
+    if record.flags['key_fingerprint']:
+        record.key_fingerprint, offset = _read_u16_field(view, offset)
+
+    offset += _SEPARATOR_LEN
+    (data_len,) = U64.unpack_from(view, offset)
+    offset += U64.size
+    if offset + data_len > len(view):
+        raise struct.error(f"encrypted data truncated at offset {offset}")
+    record.encrypted_data = view[offset:offset + data_len]
+    offset += data_len
+
+    offset += _SEPARATOR_LEN
+    record.hmac_signature = bytes(view[offset:offset + CryptoConstants.HMAC_SIZE])
+    return record
+
+
+def parse_encrypted_header(data: Buffer) -> dict:
+    """Parse public header metadata from an encrypted file.
+
+    Args:
+        data: Raw bytes of the encrypted file (full file or at least ~200 bytes).
+
+    Returns:
+        dict with keys: format_version, original_filename, file_type, timestamp,
+        flags, original_size, compressed_size.
+
+    Raises:
+        ValueError: If magic number does not match (not an encrypted file).
+        struct.error: If file is truncated (too short to parse header).
+    """
+    return parse_header(data).to_dict()
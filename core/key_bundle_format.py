@@ -0,0 +1,188 @@
+"""
+Compact binary key-bundle format (.key files).
+
+The legacy format is pretty-printed JSON with base64 fields and PEM-encoded RSA
+keys, so loading a bundle meant a JSON parse, nine base64 decodes and, in
+DecryptionEngine, a PEM (base64 + armor) parse of the private key. The binary
+format stores every field raw and the RSA keys as DER, so loading is a single
+pass over a memoryview. KeyManager.load_key_bundle still accepts the JSON format.
+
+Layout (little-endian):
+  0..5   KEY_BUNDLE_MAGIC b'DOCKEY' (6 bytes)
+  6      format version uint8 (currently 1)
+  7      flags uint8 (bit 0: password-protected)
+
+Unprotected: the TLV records follow directly.
+
+Protected (bit 0 set):
+  iterations uint32 LE (PBKDF2-HMAC-SHA512)
+  salt_len uint8 + salt
+  iv (16 bytes)
+  tag (16 bytes)
+  AES-256-GCM ciphertext of the TLV records; everything before the
+  ciphertext is authenticated as associated data.
+
+TLV record: tag uint8, length uint32 LE, value. Unknown tags are skipped so
+newer writers can add fields without breaking older readers.
+"""
+import base64
+import json
+import struct
+from typing import Callable, Dict, Optional, Union
+
+KEY_BUNDLE_MAGIC = b'DOCKEY'
+FORMAT_VERSION = 1
+FLAG_PROTECTED = 0x01
+
+PREAMBLE = struct.Struct('<6sBB')
+RECORD = struct.Struct('<BI')
+PROTECTION = struct.Struct('<IB')
+IV_SIZE = 16
+TAG_SIZE = 16
+
+# Field name <-> TLV tag. rsa_* are stored as DER (PKCS8 / SubjectPublicKeyInfo).
+FIELD_TAGS = {
+    'master_key': 1,
+    'aes_key': 2,
+    'chacha_key': 3,
+    'hmac_key': 4,
+    'salt': 5,
+    'aes_iv': 6,
+    'chacha_nonce': 7,
+    'rsa_private_key': 8,
+    'rsa_public_key': 9,
+    'version': 10,
+}
+TAG_FIELDS = {tag: name for name, tag in FIELD_TAGS.items()}
+STRING_FIELDS = frozenset({'version'})
+# Any other JSON-serialisable bundle entries travel together in one record.
+EXTRA_TAG = 0xFF
+
+Buffer = Union[bytes, bytearray, memoryview]
+# Crypto is injected by KeyManager so this module stays free of AES/KDF imports.
+Sealer = Callable[[bytes, bytes], tuple]
+Opener = Callable[[bytes, bytes, bytes, bytes], bytes]
+
+
+def is_binary_bundle(data: Buffer) -> bool:
+    """True if data starts with the binary key-bundle magic."""
+    return bytes(data[:len(KEY_BUNDLE_MAGIC)]) == KEY_BUNDLE_MAGIC
+
+
+def pem_to_der(pem: bytes) -> bytes:
+    """Strip PEM armor and base64-decode the body (no key parsing).
+
+    Only valid for unencrypted PKCS8 / SubjectPublicKeyInfo PEM, which is what
+    KeyManager.serialize_private_key / serialize_public_key produce for bundles.
+    """
+    if not pem.lstrip().startswith(b'-----'):
+        return pem
+    body = b''.join(
+        line for line in pem.strip().splitlines()
+        if line and not line.startswith(b'-----')
+    )
+    return base64.b64decode(body)
+
+
+def encode_records(key_bundle: Dict) -> bytes:
+    """Serialise a key bundle dict into TLV records."""
+    parts = []
+    extra = {}
+    for name, value in key_bundle.items():
+        tag = FIELD_TAGS.get(name)
+        if tag is None:
+            extra[name] = value
+            continue
+        if name in STRING_FIELDS:
+            value = str(value).encode('utf-8')
+        elif name.startswith('rsa_'):
+            value = pem_to_der(value)
+        parts.append(RECORD.pack(tag, len(value)))
+        parts.append(value)
+    if extra:
+        value = json.dumps(extra).encode('utf-8')
+        parts.append(RECORD.pack(EXTRA_TAG, len(value)))
+        parts.append(value)
+    return b''.join(parts)
+
+
+def decode_records(data: Buffer) -> Dict:
+    """Parse TLV records into a key bundle dict (byte fields returned as bytes)."""
+    view = memoryview(data)
+    bundle = {}
+    offset = 0
+    end = len(view)
+    while offset < end:
+        tag, length = RECORD.unpack_from(view, offset)
+        offset += RECORD.size
+        if offset + length > end:
+            raise ValueError("Файл ключа поврежден: запись выходит за границы")
+        value = view[offset:offset + length]
+        offset += length
+        if tag == EXTRA_TAG:
+            bundle.update(json.loads(bytes(value).decode('utf-8')))
+            continue
+        name = TAG_FIELDS.get(tag)
+        if name is None:
+            continue
+        if name in STRING_FIELDS:
+            bundle[name] = bytes(value).decode('utf-8')
+        else:
+            bundle[name] = bytes(value)
+    return bundle
+
+
+def encode_key_bundle(key_bundle: Dict, seal: Optional[Sealer] = None,
+                      salt: bytes = b'', iterations: int = 0) -> bytes:
+    """Serialise a key bundle.
+
+    seal(plaintext, aad) -> (iv, ciphertext, tag) encrypts the records when
+    the bundle is password-protected; salt/iterations describe the key
+    derivation so the loader can reproduce it.
+    """
+    records = encode_records(key_bundle)
+    if seal is None:
+        return PREAMBLE.pack(KEY_BUNDLE_MAGIC, FORMAT_VERSION, 0) + records
+    aad = (PREAMBLE.pack(KEY_BUNDLE_MAGIC, FORMAT_VERSION, FLAG_PROTECTED)
+           + PROTECTION.pack(iterations, len(salt)) + salt)
+    iv, ciphertext, tag = seal(records, aad)
+    return b''.join((aad, iv, tag, ciphertext))
+
+
+def read_protection(data: Buffer) -> Optional[Dict]:
+    """Return {'iterations', 'salt'} for a protected bundle, else None."""
+    view = memoryview(data)
+    magic, version, flags = PREAMBLE.unpack_from(view, 0)
+    if magic != KEY_BUNDLE_MAGIC:
+        raise ValueError("Неверный формат файла ключа")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия формата ключа: {version}")
+    if not flags & FLAG_PROTECTED:
+        return None
+    iterations, salt_len = PROTECTION.unpack_from(view, PREAMBLE.size)
+    start = PREAMBLE.size + PROTECTION.size
+    return {'iterations': iterations, 'salt': bytes(view[start:start + salt_len])}
+
+
+def decode_key_bundle(data: Buffer, open_: Optional[Opener] = None) -> Dict:
+    """Parse a binary key bundle.
+
+    open_(ciphertext, iv, tag, aad) -> plaintext decrypts the records of a
+    protected bundle; it is required exactly when read_protection() is not None.
+    """
+    view = memoryview(data)
+    try:
+        protection = read_protection(view)
+        if protection is None:
+            return decode_records(view[PREAMBLE.size:])
+        if open_ is None:
+            raise ValueError("Требуется пароль для расшифровки ключей")
+        aad_end = PREAMBLE.size + PROTECTION.size + len(protection['salt'])
+        iv = bytes(view[aad_end:aad_end + IV_SIZE])
+        tag = bytes(view[aad_end + IV_SIZE:aad_end + IV_SIZE + TAG_SIZE])
+        if len(tag) != TAG_SIZE:
+            raise ValueError("Файл ключа обрезан")
+        ciphertext = bytes(view[aad_end + IV_SIZE + TAG_SIZE:])
+        return decode_records(open_(ciphertext, iv, tag, bytes(view[:aad_end])))
+    except struct.error:
+        raise ValueError("Файл ключа обрезан или поврежден")
@@ -8,12 +8,18 @@ from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.backends import default_backend
 
+from config.settings import Settings
+from core.key_bundle_format import decode_key_bundle, encode_key_bundle, is_binary_bundle, read_protection
+from core.rsa_key_cache import RSAKeyCache, get_rsa_key_cache
+
 
 class KeyManager:
     
     
-    def __init__(self):
+    def __init__(self, key_cache: Optional[RSAKeyCache] = None, key_pool=None):
         self.backend = default_backend()
+        self.key_cache = key_cache if key_cache is not None else get_rsa_key_cache()
+        self.key_pool = key_pool
     
     def generate_master_password(self, length: int = 32) -> str:
         
@@ -30,6 +36,15 @@ class KeyManager:
     
     def generate_rsa_keypair(self, key_size: int = 4096) -> Tuple:
         
+        if self.key_pool is not None:
+            pair = self.key_pool.take(key_size)
+            if pair is not None:
+                return pair
+        
+        return self._generate_rsa_keypair(key_size)
+    
+    def _generate_rsa_keypair(self, key_size: int = 4096) -> Tuple:
+        
         private_key = rsa.generate_private_key(
             public_exponent=65537,
             key_size=key_size,
@@ -66,22 +81,58 @@ class KeyManager:
         
         password_bytes = password.encode() if password else None
         
-        return serialization.load_pem_private_key(
-            key_bytes,
-            password=password_bytes,
-            backend=self.backend
+        if not key_bytes.lstrip().startswith(b'-----'):
+            loader = serialization.load_der_private_key
+        else:
+            loader = serialization.load_pem_private_key
+        
+        return self.key_cache.get_or_load(
+            b'private', key_bytes,
+            lambda: loader(key_bytes, password=password_bytes, backend=self.backend),
+            password_bytes
         )
     
     def deserialize_public_key(self, key_bytes: bytes):
         
-        return serialization.load_pem_public_key(
-            key_bytes,
-            backend=self.backend
+        if not key_bytes.lstrip().startswith(b'-----'):
+            loader = serialization.load_der_public_key
+        else:
+            loader = serialization.load_pem_public_key
+        
+        return self.key_cache.get_or_load(
+            b'public', key_bytes,
+            lambda: loader(key_bytes, backend=self.backend)
         )
     
-    def save_key_bundle(self, key_bundle: Dict, filepath: str, password: Optional[str] = None):
+    def serialize_key_bundle(self, key_bundle: Dict, password: Optional[str] = None) -> bytes:
+        
+        if not password:
+            return encode_key_bundle(key_bundle)
+        
+        from algorithms.aes_handler import AESHandler
+        from security.password_derivation import PasswordDerivation
+        from security.salt_generator import SaltGenerator
+        
+        iterations = Settings.PBKDF2_ITERATIONS
+        salt = SaltGenerator().generate_salt(32)
+        aes = AESHandler(PasswordDerivation().derive_key(password, salt, 32, iterations))
+        
+        def seal(records: bytes, aad: bytes):
+            iv = os.urandom(16)
+            ciphertext, tag = aes.encrypt(records, iv, aad)
+            return iv, ciphertext, tag
+        
+        return encode_key_bundle(key_bundle, seal, salt, iterations)
+    
+    def save_key_bundle(self, key_bundle: Dict, filepath: str, password: Optional[str] = None,
+                        bundle_format: Optional[str] = None):
         
         
+        if (bundle_format or Settings.KEY_BUNDLE_FORMAT) == 'binary':
+            with open(filepath, 'wb') as f:
+                f.write(self.serialize_key_bundle(key_bundle, password))
+            return
+        
         import base64
         
         serializable_bundle = {}
@@ -127,10 +178,19 @@ class KeyManager:
     
     def load_key_bundle(self, filepath: str, password: Optional[str] = None) -> Dict:
         
+        with open(filepath, 'rb') as f:
+            raw = f.read()
+        
+        return self.parse_key_bundle(raw, password)
+    
+    def parse_key_bundle(self, raw: bytes, password: Optional[str] = None) -> Dict:
+        
+        if is_binary_bundle(raw):
+            return self._parse_binary_bundle(raw, password)
+        
         import base64
         
-        with open(filepath, 'r') as f:
-            data = json.load(f)
+        data = json.loads(raw)
         
         
         if data.get('encrypted'):
@@ -165,3 +225,28 @@ class KeyManager:
                 key_bundle[key] = value
         
         return key_bundle
+    
+    def _parse_binary_bundle(self, raw: bytes, password: Optional[str] = None) -> Dict:
+        
+        protection = read_protection(raw)
+        if protection is None:
+            return decode_key_bundle(raw)
+        
+        if not password:
+            raise ValueError("Требуется пароль для расшифровки ключей")
+        
+        # Число итераций берётся из загруженного файла — ограничиваем, чтобы
+        # чужой файл не занял воркер на PBKDF2 с 2^32 итерациями
+        iterations = protection['iterations']
+        if not Settings.PBKDF2_ITERATIONS <= iterations <= Settings.KEY_BUNDLE_MAX_ITERATIONS:
+            raise ValueError(f"Недопустимое число итераций PBKDF2 в файле ключа: {iterations}")
+        
+        from algorithms.aes_handler import AESHandler
+        from security.password_derivation import PasswordDerivation
+        
+        key = PasswordDerivation().derive_key(
+            password, protection['salt'], 32, iterations
+        )
+        aes = AESHandler(key)
+        
+        return decode_key_bundle(raw, aes.decrypt)
@@ -0,0 +1,212 @@
+"""
+Envelope key rotation: re-wrap a container's keys without touching its payload.
+
+A container's ciphertext, HMAC and key fingerprint depend only on the
+symmetric keys (AES, ChaCha20, HMAC, IV, nonce). The RSA key pair only wraps
+those keys in the encrypted_keys section, and the bundle password only
+protects the .key file. Rotating either therefore means:
+
+  1. confirming the supplied bundle matches the container (key fingerprint,
+     or an RSA unwrap for containers without one — DecryptionEngine.verify_key_wrap);
+  2. wrapping the same symmetric keys under the new RSA public key;
+  3. replacing encrypted_keys in the container and re-saving the bundle with
+     the new RSA key pair and/or password.
+
+When the new wrap has the same length as the old one (same RSA key size), the
+section is patched in place. Otherwise the container is rewritten to a
+temporary file next to the original, copying the unchanged ciphertext
+kernel-side with copy_file_range where available, and atomically renamed over it.
+
+rewrap_directory() rotates every container in a directory in parallel. Callers
+pass one new RSA key pair to all rotators of a run, so the expensive key
+generation happens once rather than per container.
+
+Because verification and the key fingerprint only involve the symmetric keys,
+a container and its bundle that are briefly out of step (e.g. after a crash
+between the two writes) still decrypt; only strict RSA verification notices.
+Legacy containers without a fingerprint do need the matching RSA private key,
+so the rotated bundle is staged on disk (<key>.rewrap-new) before any
+container is touched and only moved over the old bundle afterwards
+(commit_bundle). When some containers of a shared bundle could not be
+re-wrapped, the old bundle is kept as <key>.prev for them.
+"""
+import os
+import shutil
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from algorithms.rsa_handler import RSAHandler
+from config.constants import CryptoConstants
+from config.settings import Settings
+from core.decryption_engine import DecryptionEngine
+from core.header_parser import U16, parse_container
+from utils.file_handler import FileHandler
+
+_COPY_CHUNK = 8 * 1024 * 1024
+
+
+class KeyRotator:
+    """Re-wrap containers that belong to one key bundle under a new RSA key pair."""
+
+    def __init__(self, key_bundle: dict, key_manager, new_keypair: Optional[Tuple] = None,
+                 rotate_rsa: bool = True):
+        self.key_manager = key_manager
+        self.verifier = DecryptionEngine(key_bundle=key_bundle, key_manager=key_manager)
+        self.rotate_rsa = rotate_rsa
+
+        if not rotate_rsa:
+            self.new_bundle = dict(key_bundle)
+            self._wrapped_keys = None
+            return
+
+        if new_keypair is None:
+            new_keypair = key_manager.generate_rsa_keypair(key_size=Settings.RSA_KEY_SIZE)
+        public_key, private_key = new_keypair
+        self.new_bundle = dict(
+            key_bundle,
+            rsa_private_key=key_manager.serialize_private_key(private_key),
+            rsa_public_key=key_manager.serialize_public_key(public_key),
+        )
+        # One wrap serves every container of this bundle: they all carry the
+        # same symmetric keys.
+        self._wrapped_keys = RSAHandler(public_key, None).encrypt(self.verifier.keys_bundle())
+
+    def rewrap_file(self, path: str, output_path: Optional[str] = None) -> Dict:
+        """Re-wrap one container. Writes to output_path, or in place if omitted."""
+        with FileHandler.open_buffer(path, mmap_threshold=0) as data:
+            try:
+                parsed = parse_container(data)
+            except (ValueError, struct.error):
+                raise ValueError(f"Неверный формат файла: {path}") from None
+            self.verifier.verify_key_wrap(parsed)
+            keys_offset = parsed.encrypted_keys_offset
+            old_keys_end = keys_offset + U16.size + len(parsed.encrypted_keys)
+            del parsed
+
+        if not self.rotate_rsa:
+            if output_path and os.path.abspath(output_path) != os.path.abspath(path):
+                shutil.copyfile(path, output_path)
+            return {'input_file': path, 'output_file': output_path or path, 'patched': False}
+
+        new_field = U16.pack(len(self._wrapped_keys)) + self._wrapped_keys
+        in_place = output_path is None or os.path.abspath(output_path) == os.path.abspath(path)
+
+        if in_place and len(new_field) == old_keys_end - keys_offset:
+            with open(path, 'r+b') as f:
+                f.seek(keys_offset)
+                f.write(new_field)
+                f.flush()
+                os.fsync(f.fileno())
+            return {'input_file': path, 'output_file': path, 'patched': True}
+
+        target = path if in_place else output_path
+        tmp_path = f"{target}.rewrap-{os.getpid()}.tmp"
+        try:
+            with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                _copy_range(src, dst, 0, keys_offset)
+                dst.write(new_field)
+                _copy_range(src, dst, old_keys_end, os.fstat(src.fileno()).st_size - old_keys_end)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return {'input_file': path, 'output_file': target, 'patched': False}
+
+    def stage_bundle(self, filepath: str, password: Optional[str] = None) -> str:
+        """Save the rotated bundle next to filepath, before any container is re-wrapped."""
+        staged = f"{filepath}.rewrap-new"
+        self.save_bundle(staged, password)
+        return staged
+
+    @staticmethod
+    def commit_bundle(staged: str, filepath: str, keep_previous: bool = False) -> Optional[str]:
+        """Move a staged bundle over filepath; with keep_previous, return where the old one went."""
+        previous = None
+        if keep_previous and os.path.exists(filepath):
+            previous = f"{filepath}.prev"
+            shutil.copy2(filepath, previous)
+        os.replace(staged, filepath)
+        return previous
+
+    def save_bundle(self, filepath: str, password: Optional[str] = None) -> None:
+        """Atomically write the rotated bundle (new RSA keys and/or protection)."""
+        tmp_path = f"{filepath}.rewrap-{os.getpid()}.tmp"
+        try:
+            self.key_manager.save_key_bundle(self.new_bundle, tmp_path, password)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+def _copy_range(src, dst, offset: int, count: int) -> None:
+    """Copy count bytes from src[offset:] to the current position of dst, kernel-side if possible."""
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    dst.flush()
+    copier: Optional[Callable] = getattr(os, 'copy_file_range', None)
+    while count > 0:
+        n = 0
+        if copier is not None:
+            try:
+                n = copier(src_fd, dst_fd, min(count, _COPY_CHUNK), offset)
+            except OSError:
+                copier = None
+        if not n:
+            src.seek(offset)
+            chunk = src.read(min(count, _COPY_CHUNK))
+            if not chunk:
+                raise ValueError("Файл обрезан во время перезаписи")
+            dst.write(chunk)
+            dst.flush()
+            n = len(chunk)
+        offset += n
+        count -= n
+    dst.seek(0, os.SEEK_END)
+
+
+def is_container(path: Path) -> bool:
+    magic = CryptoConstants.MAGIC_NUMBER
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(magic)) == magic
+    except OSError:
+        return False
+
+
+def rewrap_directory(directory: str,
+                     rotator_for: Callable[[Path], Tuple['KeyRotator', Optional[str]]],
+                     workers: int = 4, bundle_password: Optional[str] = None) -> List[Dict]:
+    """Re-wrap every container under directory in parallel.
+
+    rotator_for(path) returns (rotator, key_file): one shared rotator and None
+    for a single-bundle archive (the caller saves that bundle once), or a
+    per-container rotator and the key file to rewrite after its container.
+    """
+    paths = sorted(p for p in Path(directory).rglob('*') if p.is_file() and is_container(p))
+
+    def _one(path: Path) -> Dict:
+        try:
+            rotator, key_file = rotator_for(path)
+            staged = rotator.stage_bundle(key_file, bundle_password) if key_file else None
+            try:
+                result = rotator.rewrap_file(str(path))
+            except BaseException:
+                if staged:
+                    os.unlink(staged)
+                raise
+            if key_file:
+                KeyRotator.commit_bundle(staged, key_file)
+                result['key_file'] = key_file
+            result['status'] = 'success'
+        except Exception as e:
+            result = {'input_file': str(path), 'status': 'error', 'message': str(e)}
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        return list(pool.map(_one, paths))
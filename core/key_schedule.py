@@ -0,0 +1,260 @@
+"""
+Per-key schedule cache for the custom transformation layer.
+
+CryptoLayerManager derives eight S-boxes, their inverses and sixteen round
+keystreams from the master key. All of it depends only on the key, so it is
+computed once per key and kept in a small LRU cache keyed by a fingerprint of
+the key (the raw key is never used as a dict key). Evicted schedules have
+their tables and keystreams overwritten before being dropped.
+
+The cache is bounded twice: by entry count and by the total bytes of cached
+keystream across all schedules (KEY_SCHEDULE_CACHE_BYTES). A schedule asks the
+cache before growing a keystream; the cache evicts idle least-recently-used
+schedules to make room, and if that is not enough the keystream is generated
+uncached for that call.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from config.settings import Settings
+
+
+class KeySchedule:
+    """S-box tables, inverse tables and round keystreams for one master key."""
+
+    __slots__ = (
+        'sboxes', 'inv_sboxes', '_round_material', '_keystreams',
+        '_max_cached', '_lock', '_reserve',
+    )
+
+    def __init__(self, key: bytes, rounds: int, sbox_count: int,
+                 max_cached_keystream: int = 0,
+                 reserve: Optional[Callable[['KeySchedule', int], bool]] = None):
+        self.sboxes = self._generate_sboxes(key, sbox_count)
+        self.inv_sboxes = self._generate_inverse_sboxes(self.sboxes)
+        self._round_material = [
+            bytearray(hashlib.sha512(key + r.to_bytes(4, 'big')).digest())
+            for r in range(rounds)
+        ]
+        self._keystreams = [bytearray() for _ in range(rounds)]
+        self._max_cached = max_cached_keystream
+        self._lock = threading.Lock()
+        # Asked before a keystream grows; False means generate uncached instead
+        self._reserve = reserve
+
+    @property
+    def cached_bytes(self) -> int:
+        return sum(len(stream) for stream in self._keystreams)
+
+    @staticmethod
+    def _generate_sboxes(key: bytes, sbox_count: int) -> List[List[int]]:
+        sboxes = []
+        for i in range(sbox_count):
+            seed = hashlib.sha256(key + i.to_bytes(4, 'big')).digest()
+            sbox = list(range(256))
+            for j in range(255, 0, -1):
+                k = seed[j % len(seed)] % (j + 1)
+                sbox[j], sbox[k] = sbox[k], sbox[j]
+            sboxes.append(sbox)
+        return sboxes
+
+    @staticmethod
+    def _generate_inverse_sboxes(sboxes: List[List[int]]) -> List[List[int]]:
+        inv_sboxes = []
+        for sbox in sboxes:
+            inv_sbox = [0] * 256
+            for i, val in enumerate(sbox):
+                inv_sbox[val] = i
+            inv_sboxes.append(inv_sbox)
+        return inv_sboxes
+
+    @staticmethod
+    def _expand(material: bytes, start_block: int, length: int) -> bytes:
+        """SHA-512 counter-mode expansion of `material`, starting at block `start_block`."""
+        blocks = (length + 63) // 64
+        return b''.join(
+            hashlib.sha512(material + counter.to_bytes(4, 'big')).digest()
+            for counter in range(start_block, start_block + blocks)
+        )
+
+    def round_keystream(self, round_num: int, length: int) -> bytes:
+        """Return the first `length` bytes of the keystream for `round_num`.
+
+        Keystreams up to `max_cached_keystream` bytes are generated once and
+        extended on demand; longer requests are generated in bulk uncached so a
+        single huge file cannot pin 16x its size in the cache.
+        """
+        material = bytes(self._round_material[round_num])
+        if length > self._max_cached:
+            return self._expand(material, 0, length)[:length]
+
+        with self._lock:
+            stream = self._keystreams[round_num]
+            if len(stream) < length:
+                have_blocks = len(stream) // 64
+                growth = ((length - len(stream) + 63) // 64) * 64
+                if self._reserve is not None and not self._reserve(self, growth):
+                    return self._expand(material, 0, length)[:length]
+                stream.extend(
+                    self._expand(material, have_blocks, length - len(stream))
+                )
+            return bytes(stream[:length])
+
+    def wipe(self) -> None:
+        """Overwrite all key-derived material in place."""
+        with self._lock:
+            for table in self.sboxes + self.inv_sboxes:
+                for i in range(len(table)):
+                    table[i] = 0
+            for buf in self._round_material + self._keystreams:
+                buf[:] = bytes(len(buf))
+                buf.clear()
+
+
+class KeyScheduleCache:
+    """Thread-safe LRU of KeySchedule objects keyed by key fingerprint.
+
+    Schedules are handed out through lease() so that an entry evicted while a
+    worker thread is still transforming data with it is only wiped once the
+    last lease is released. Cached keystream bytes are accounted across all
+    schedules (including evicted ones still leased) against max_bytes.
+    """
+
+    def __init__(self, max_entries: int = Settings.KEY_SCHEDULE_CACHE_SIZE,
+                 max_cached_keystream: int = Settings.KEY_SCHEDULE_MAX_KEYSTREAM,
+                 max_bytes: int = Settings.KEY_SCHEDULE_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_cached_keystream = max_cached_keystream
+        self.max_bytes = max_bytes
+        self._bytes = 0
+        self._entries: 'OrderedDict[bytes, KeySchedule]' = OrderedDict()
+        self._refs: Dict[int, int] = {}
+        self._retired: Set[int] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(key: bytes, rounds: int, sbox_count: int) -> bytes:
+        return hashlib.blake2b(
+            key,
+            digest_size=32,
+            person=b'DOCENC-KSCHED',
+            salt=rounds.to_bytes(8, 'big') + sbox_count.to_bytes(8, 'big'),
+        ).digest()
+
+    @contextmanager
+    def lease(self, key: bytes, rounds: int, sbox_count: int) -> Iterator[KeySchedule]:
+        schedule = self._acquire(key, rounds, sbox_count)
+        try:
+            yield schedule
+        finally:
+            self._release(schedule)
+
+    def _acquire(self, key: bytes, rounds: int, sbox_count: int) -> KeySchedule:
+        fp = self.fingerprint(key, rounds, sbox_count)
+        with self._lock:
+            schedule = self._entries.get(fp)
+            if schedule is not None:
+                self._entries.move_to_end(fp)
+                self._refs[id(schedule)] = self._refs.get(id(schedule), 0) + 1
+                return schedule
+
+        # Build outside the lock: S-box generation is pure Python and other
+        # threads may be looking up different keys meanwhile.
+        built = KeySchedule(key, rounds, sbox_count, self.max_cached_keystream,
+                            reserve=self._reserve)
+        to_wipe = []
+        with self._lock:
+            schedule = self._entries.get(fp)
+            if schedule is not None:
+                self._entries.move_to_end(fp)
+                to_wipe.append(built)
+            else:
+                schedule = built
+                self._entries[fp] = schedule
+                while len(self._entries) > self.max_entries:
+                    _, old = self._entries.popitem(last=False)
+                    self._evict_locked(old, to_wipe)
+            self._refs[id(schedule)] = self._refs.get(id(schedule), 0) + 1
+        for old in to_wipe:
+            old.wipe()
+        return schedule
+
+    def _evict_locked(self, schedule: KeySchedule, to_wipe: List[KeySchedule]) -> None:
+        if self._refs.get(id(schedule)):
+            # Still in use: its bytes stay counted until the last lease wipes it
+            self._retired.add(id(schedule))
+        else:
+            self._bytes -= schedule.cached_bytes
+            to_wipe.append(schedule)
+
+    def _reserve(self, schedule: KeySchedule, growth: int) -> bool:
+        """Account `growth` keystream bytes for `schedule`, evicting idle LRU entries if needed.
+
+        Called with the schedule's own lock held, so only idle schedules (no
+        lease, hence no lock holder) are wiped here.
+        """
+        to_wipe: List[KeySchedule] = []
+        with self._lock:
+            if id(schedule) in self._retired:
+                return False
+            if self._bytes + growth > self.max_bytes:
+                for fp in [fp for fp, entry in self._entries.items()
+                           if entry is not schedule and not self._refs.get(id(entry))]:
+                    self._evict_locked(self._entries.pop(fp), to_wipe)
+                    if self._bytes + growth <= self.max_bytes:
+                        break
+            granted = self._bytes + growth <= self.max_bytes
+            if granted:
+                self._bytes += growth
+        for old in to_wipe:
+            old.wipe()
+        return granted
+
+    @property
+    def cached_bytes(self) -> int:
+        with self._lock:
+            return self._bytes
+
+    def _release(self, schedule: KeySchedule) -> None:
+        with self._lock:
+            sid = id(schedule)
+            remaining = self._refs.get(sid, 1) - 1
+            if remaining > 0:
+                self._refs[sid] = remaining
+                return
+            self._refs.pop(sid, None)
+            if sid not in self._retired:
+                return
+            self._retired.discard(sid)
+            self._bytes -= schedule.cached_bytes
+        schedule.wipe()
+
+    def clear(self) -> None:
+        to_wipe = []
+        with self._lock:
+            for schedule in self._entries.values():
+                self._evict_locked(schedule, to_wipe)
+            self._entries.clear()
+        for schedule in to_wipe:
+            schedule.wipe()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_default_cache: Optional[KeyScheduleCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_key_schedule_cache() -> KeyScheduleCache:
+    """Return the process-wide schedule cache, creating it on first use."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = KeyScheduleCache()
+    return _default_cache
@@ -0,0 +1,247 @@
+"""
+`main.py serve-local`: a resident encryption daemon on a Unix domain socket.
+
+Each CLI invocation otherwise pays interpreter startup, the cryptography
+import, Settings/Logger setup and cold key caches before doing any work. The
+daemon keeps one DocumentEncryptionSystem (KeyManager, RSA key cache, key
+schedule cache) resident, pre-generates RSA key pairs in an RSAKeyPool, and
+serves encrypt/decrypt requests from thin CLI clients.
+
+Protocol: one JSON object per line in each direction.
+  request  {"command": "encrypt" | "decrypt" | "ping", "args": {...}}
+  response the result dict of DocumentEncryptionSystem.encrypt_document /
+           decrypt_document ({"status": "success" | "error", ...})
+
+Clients send absolute paths. Requests can carry passwords, so both sides
+authenticate each other by uid: the socket is created with mode 0600 inside a
+directory only its owner can write (the fallback location is a 0700 per-user
+directory), and before sending anything the client checks that the socket and
+its directory belong to it and that the peer process (SO_PEERCRED, where the
+platform has it) runs as the same user. If any check fails the client refuses
+to forward and the command runs in-process; the server likewise drops
+connections from other users.
+
+This module imports only the standard library and config at import time, so
+the client side adds nothing measurable to CLI startup.
+"""
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import tempfile
+from typing import Any, Dict, Optional
+
+from config.settings import Settings
+
+ENCRYPT_ARGS = ('input_file', 'output_file', 'password')
+DECRYPT_ARGS = ('input_file', 'key_file', 'output_file', 'password', 'strict_keys')
+PATH_ARGS = ('input_file', 'output_file', 'key_file')
+
+
+class DaemonUnavailable(Exception):
+    """No daemon is listening on the socket (callers fall back to in-process)."""
+
+
+class UntrustedSocket(DaemonUnavailable):
+    """The socket or the process behind it is not owned by the current user."""
+
+
+_UCRED = struct.Struct('3i')  # pid, uid, gid
+
+
+def default_socket_path() -> str:
+    """DOCENC_SOCKET, else $XDG_RUNTIME_DIR/docenc.sock, else a 0700 per-user temp directory."""
+    override = os.environ.get(Settings.LOCAL_SOCKET_ENV)
+    if override:
+        return override
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'docenc.sock')
+    return os.path.join(tempfile.gettempdir(), f'docenc-{os.getuid()}', 'docenc.sock')
+
+
+def _check_private_dir(directory: str) -> None:
+    """Owned by us (or root) and not writable by group/others, so nobody else can plant a socket."""
+    st = os.stat(directory)
+    if st.st_uid not in (os.getuid(), 0) or st.st_mode & 0o022:
+        raise UntrustedSocket(
+            f'Каталог сокета доступен для записи другим пользователям: {directory}'
+        )
+
+
+def _check_socket_owner(path: str) -> None:
+    _check_private_dir(os.path.dirname(path) or '.')
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError as e:
+        raise DaemonUnavailable(str(e)) from e
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise UntrustedSocket(f'Сокет принадлежит другому пользователю: {path}')
+
+
+def peer_uid(sock: socket.socket) -> Optional[int]:
+    """uid of the process on the other end of a Unix socket, or None if the platform cannot tell."""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _UCRED.size)
+    return _UCRED.unpack(creds)[1]
+
+
+# -- client -------------------------------------------------------------------
+
+def call(command: str, args: Dict[str, Any], socket_path: Optional[str] = None,
+         timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Send one request to the daemon and return its response.
+
+    Raises DaemonUnavailable if nothing is listening, and UntrustedSocket if
+    the socket or the daemon is not owned by the current user, so the caller
+    can run the command in-process instead. Nothing is sent in either case.
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        raise DaemonUnavailable('AF_UNIX is not supported on this platform')
+
+    args = dict(args)
+    for name in PATH_ARGS:
+        if args.get(name):
+            args[name] = os.path.abspath(args[name])
+
+    path = socket_path or default_socket_path()
+    try:
+        _check_socket_owner(path)
+    except OSError as e:
+        raise DaemonUnavailable(str(e)) from e
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(path)
+        except OSError as e:
+            raise DaemonUnavailable(str(e)) from e
+        # The path may have been swapped after the stat; the kernel's answer is authoritative
+        uid = peer_uid(sock)
+        if uid is not None and uid != os.getuid():
+            raise UntrustedSocket(f'Демон на сокете {path} запущен другим пользователем (uid {uid})')
+        sock.settimeout(timeout)
+        request = json.dumps({'command': command, 'args': args}) + '\n'
+        sock.sendall(request.encode('utf-8'))
+        with sock.makefile('rb') as reader:
+            line = reader.readline()
+    finally:
+        sock.close()
+
+    if not line:
+        return {'status': 'error', 'message': 'Демон закрыл соединение без ответа'}
+    return json.loads(line)
+
+
+# -- server -------------------------------------------------------------------
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self) -> None:
+        uid = peer_uid(self.connection)
+        if uid is not None and uid != os.getuid():
+            return
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.dispatch(json.loads(line))
+            except Exception as e:
+                response = {'status': 'error', 'message': str(e)}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class LocalDaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix-socket server dispatching requests to a DocumentEncryptionSystem."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, system):
+        self.system = system
+        self.socket_path = socket_path
+        directory = os.path.dirname(socket_path) or '.'
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        _check_private_dir(directory)
+        _remove_stale_socket(socket_path)
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        command = request.get('command')
+        args = request.get('args') or {}
+        if command == 'ping':
+            return {'status': 'ok', 'pid': os.getpid()}
+        if command == 'encrypt':
+            return self.system.encrypt_document(
+                **{k: args.get(k) for k in ENCRYPT_ARGS}
+            )
+        if command == 'decrypt':
+            return self.system.decrypt_document(
+                **{k: args.get(k) for k in DECRYPT_ARGS}
+            )
+        return {'status': 'error', 'message': f'Неизвестная команда: {command}'}
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f'Демон уже запущен: {socket_path}')
+
+
+def serve(system, socket_path: Optional[str] = None,
+          pool_size: int = Settings.LOCAL_KEY_POOL_SIZE) -> int:
+    """Run the daemon in the foreground until SIGINT/SIGTERM."""
+    if not hasattr(socket, 'AF_UNIX'):
+        raise RuntimeError('serve-local требует поддержки Unix-сокетов')
+
+    # Warm the crypto stack once, before the first request arrives.
+    import core.decryption_engine  # noqa: F401
+    import core.encryption_engine  # noqa: F401
+
+    key_pool = None
+    if pool_size > 0:
+        from core.rsa_key_pool import RSAKeyPool
+        key_manager = system.key_manager
+        key_pool = RSAKeyPool(
+            key_manager._generate_rsa_keypair, Settings.RSA_KEY_SIZE, pool_size
+        ).start()
+        key_manager.key_pool = key_pool
+
+    def _terminate(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _terminate)
+    server = LocalDaemonServer(socket_path or default_socket_path(), system)
+    system.logger.info(f"Демон слушает сокет: {server.socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if key_pool is not None:
+            key_pool.stop()
+        system.logger.info("Демон остановлен")
+    return 0
@@ -0,0 +1,88 @@
+"""
+Process-wide cache of deserialized RSA key objects.
+
+Loading an RSA-4096 private key runs cryptography's key consistency checks,
+which cost hundreds of milliseconds — far more than the rest of a small-file
+decrypt. Every job builds a fresh KeyManager/DecryptionEngine, so the parsed
+key objects are kept here instead, in a bounded LRU shared by all worker
+threads and keyed by a digest of the serialized key (PEM or DER) and the
+password used to load it. Key objects are immutable, so a cached object can
+be handed to any number of threads at once.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from config.settings import Settings
+
+
+class RSAKeyCache:
+    """Thread-safe LRU of loaded RSA key objects. max_entries=0 disables caching."""
+
+    def __init__(self, max_entries: int = Settings.RSA_KEY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[bytes, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(kind: bytes, key_bytes: bytes, password: Optional[bytes] = None) -> bytes:
+        password_digest = hashlib.sha256(password).digest() if password else b''
+        return hashlib.blake2b(
+            key_bytes,
+            digest_size=32,
+            person=b'DOCENC-RSAKEY',
+            key=password_digest,
+            salt=kind.ljust(16, b'\0')[:16],
+        ).digest()
+
+    def get_or_load(self, kind: bytes, key_bytes: bytes, loader: Callable[[], Any],
+                    password: Optional[bytes] = None) -> Any:
+        """Return the cached key object for key_bytes, calling loader() on a miss."""
+        if self.max_entries <= 0:
+            return loader()
+
+        fp = self.fingerprint(kind, bytes(key_bytes), password)
+        with self._lock:
+            key = self._entries.get(fp)
+            if key is not None:
+                self._entries.move_to_end(fp)
+                self.hits += 1
+                return key
+            self.misses += 1
+
+        # Load outside the lock: validation is slow and other threads may be
+        # looking up different keys meanwhile.
+        loaded = loader()
+        with self._lock:
+            key = self._entries.setdefault(fp, loaded)
+            self._entries.move_to_end(fp)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return key
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+_default_cache: Optional[RSAKeyCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_rsa_key_cache() -> RSAKeyCache:
+    """Return the process-wide RSA key cache, creating it on first use."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = RSAKeyCache()
+    return _default_cache
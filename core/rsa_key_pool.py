@@ -0,0 +1,60 @@
+"""
+Pre-generated RSA key pairs for long-running processes.
+
+Every EncryptionEngine generates a fresh RSA-4096 key pair, which takes on the
+order of a second and is the largest fixed cost of encrypting a small file.
+A process that encrypts many files (the serve-local daemon) can attach an
+RSAKeyPool to its KeyManager: a background thread keeps up to `size` key pairs
+ready, and generate_rsa_keypair() takes one from the pool instead of
+generating inline. Each pooled pair is handed out exactly once.
+"""
+import queue
+import threading
+from typing import Callable, Optional, Tuple
+
+
+class RSAKeyPool:
+    """Bounded pool of fresh RSA key pairs of one size, refilled in the background."""
+
+    def __init__(self, generate: Callable[[int], Tuple], key_size: int, size: int):
+        self.key_size = key_size
+        self._generate = generate
+        self._pairs: 'queue.Queue[Tuple]' = queue.Queue(maxsize=max(size, 1))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'RSAKeyPool':
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._fill, name='rsa-key-pool', daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _fill(self) -> None:
+        while not self._stop.is_set():
+            pair = self._generate(self.key_size)
+            while not self._stop.is_set():
+                try:
+                    self._pairs.put(pair, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    def take(self, key_size: int) -> Optional[Tuple]:
+        """Return a pooled (public_key, private_key) pair, or None if none is ready."""
+        if key_size != self.key_size:
+            return None
+        try:
+            return self._pairs.get_nowait()
+        except queue.Empty:
+            return None
+
+    def __len__(self) -> int:
+        return self._pairs.qsize()
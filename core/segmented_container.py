@@ -0,0 +1,158 @@
+"""
+Seekable (segmented) payload layout for random-access decryption.
+
+A regular container encrypts the compressed document as one AES-GCM /
+ChaCha20-Poly1305 message, so reading any byte of it means decrypting all of
+them. A seekable container (flags.segmented) splits the plaintext into
+fixed-size segments that are compressed and encrypted independently, and
+starts its data section with a segment index:
+
+  segment_size uint32 LE
+  segment_count uint32 LE
+  segment_count x (stored_len uint32 LE, plain_len uint32 LE, seg_flags uint8)
+  index_mac (32 bytes)
+  segment 0 || segment 1 || ...
+
+When flags.segment_trailer is set (container format 1.2) the same index follows
+the segments instead, and a copy of segment_count closes the data section so
+the index can be located from the end:
+
+  segment 0 || segment 1 || ...
+  segment_size uint32 LE, segment_count uint32 LE, entries, index_mac
+  segment_count uint32 LE
+
+StreamEncryptor writes this form: each segment goes to the sink as soon as it
+is sealed, and the index is appended once the segment count is known.
+
+Every segment but the last holds exactly segment_size plaintext bytes, so the
+segments covering a byte range are found arithmetically. Segment i goes
+through the same layers as a regular payload (optional compression,
+AES-256-GCM, ChaCha20-Poly1305, custom layers) with:
+
+  - AES IV / ChaCha20 nonce = the container IV / nonce with the low 64 bits XOR i;
+  - associated data = filename || i uint64 || final uint8 || plain_len uint32,
+    so segments cannot be reordered, resized or cut off at the end;
+  - the 16-byte AES tag appended to the AES ciphertext (the container aes_tag
+    field is left empty).
+
+index_mac is HMAC-SHA256 (hmac_key) over the public header metadata and the
+index, so DecryptionEngine.decrypt_range() can trust the index without reading
+the rest of the file; each segment it touches is authenticated by its own AEAD
+tags. DecryptionEngine.decrypt() still verifies the container HMAC over the
+whole data section.
+"""
+import struct
+from itertools import accumulate
+from typing import Iterable, List, Sequence, Tuple, Union
+
+SEGMENT_HEADER = struct.Struct('<II')
+SEGMENT_ENTRY = struct.Struct('<IIB')
+SEGMENT_COUNT = struct.Struct('<I')
+SEGMENT_AAD = struct.Struct('<QBI')
+INDEX_MAC_SIZE = 32
+AES_TAG_SIZE = 16
+
+SEGMENT_COMPRESSED = 0x01
+
+_INDEX_MAC_CONTEXT = b'DOCENC-SEGMENT-INDEX\x01'
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def segment_nonce(base: bytes, index: int) -> bytes:
+    """Per-segment IV / nonce: base with its low 64 bits XOR index."""
+    low = int.from_bytes(base[-8:], 'big') ^ index
+    return bytes(base[:-8]) + low.to_bytes(8, 'big')
+
+
+def segment_aad(filename_raw: Buffer, index: int, final: bool, plain_len: int) -> bytes:
+    return bytes(filename_raw) + SEGMENT_AAD.pack(index, final, plain_len)
+
+
+def encode_index(segment_size: int, entries: Sequence[Tuple[int, int, int]]) -> bytes:
+    """Serialise the index header and (stored_len, plain_len, seg_flags) entries."""
+    return SEGMENT_HEADER.pack(segment_size, len(entries)) + b''.join(
+        SEGMENT_ENTRY.pack(*entry) for entry in entries
+    )
+
+
+def index_mac_parts(header_parts: Iterable[Buffer], index_raw: Buffer) -> List[Buffer]:
+    """Buffers covered by index_mac: file_type, filename and sizes, then the index."""
+    return [_INDEX_MAC_CONTEXT, *header_parts, index_raw]
+
+
+class SegmentIndex:
+    """Parsed segment index. Offsets are relative to the start of the data section."""
+
+    __slots__ = (
+        'segment_size', 'stored_lens', 'plain_lens', 'seg_flags',
+        'stored_offsets', 'index_raw', 'index_mac', 'plain_size',
+    )
+
+    def __len__(self) -> int:
+        return len(self.plain_lens)
+
+    def covering(self, start: int, end: int) -> range:
+        """Indices of the segments holding plaintext bytes [start, end)."""
+        if start >= end:
+            return range(0)
+        last = min(-(-end // self.segment_size), len(self))
+        return range(start // self.segment_size, last)
+
+    def segment(self, data: Buffer, index: int) -> memoryview:
+        """Zero-copy view of segment `index` inside the data section."""
+        return memoryview(data)[self.stored_offsets[index]:self.stored_offsets[index + 1]]
+
+
+def parse_segment_index(data: Buffer, trailer: bool = False) -> SegmentIndex:
+    """Parse the index of a seekable data section (leading, or trailing if `trailer`).
+
+    Raises:
+        struct.error: If the index or the segment data is truncated.
+        ValueError: If the index is inconsistent.
+    """
+    view = memoryview(data)
+    if trailer:
+        if len(view) < SEGMENT_COUNT.size:
+            raise struct.error("segment index truncated")
+        index_end = len(view) - SEGMENT_COUNT.size
+        (count,) = SEGMENT_COUNT.unpack_from(view, index_end)
+        index_start = index_end - (
+            SEGMENT_HEADER.size + count * SEGMENT_ENTRY.size + INDEX_MAC_SIZE
+        )
+        if index_start < 0:
+            raise struct.error("segment index truncated")
+    else:
+        index_start = 0
+
+    segment_size, count = SEGMENT_HEADER.unpack_from(view, index_start)
+    entries_start = index_start + SEGMENT_HEADER.size
+    entries_end = entries_start + count * SEGMENT_ENTRY.size
+    mac_end = entries_end + INDEX_MAC_SIZE
+    if mac_end > len(view):
+        raise struct.error("segment index truncated")
+    if trailer:
+        if mac_end != index_end:
+            raise ValueError("Неверный индекс сегментов: число сегментов не совпадает")
+        data_start, data_end = 0, index_start
+    else:
+        data_start, data_end = mac_end, len(view)
+    if segment_size == 0 or count == 0:
+        raise ValueError("Неверный индекс сегментов")
+
+    entries = list(SEGMENT_ENTRY.iter_unpack(view[entries_start:entries_end]))
+    record = SegmentIndex()
+    record.segment_size = segment_size
+    record.stored_lens = [entry[0] for entry in entries]
+    record.plain_lens = [entry[1] for entry in entries]
+    record.seg_flags = [entry[2] for entry in entries]
+    record.index_raw = view[index_start:entries_end]
+    record.index_mac = bytes(view[entries_end:mac_end])
+    record.stored_offsets = list(accumulate(record.stored_lens, initial=data_start))
+    record.plain_size = sum(record.plain_lens)
+
+    if record.stored_offsets[-1] != data_end:
+        raise struct.error("segment data truncated")
+    if any(n != segment_size for n in record.plain_lens[:-1]) or record.plain_lens[-1] > segment_size:
+        raise ValueError("Неверный индекс сегментов: размеры сегментов не согласованы")
+    return record
@@ -7,12 +7,9 @@ from typing import Optional
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from core.encryption_engine import EncryptionEngine
-from core.decryption_engine import DecryptionEngine
-from core.key_manager import KeyManager
-from utils.logger import Logger
-from utils.validator import Validator
-from utils.file_handler import FileHandler
+# Only lightweight modules are imported at startup. The crypto engines (and
+# with them the cryptography backend) are imported by the subcommand that
+# needs them, so `main.py --help` and argument errors stay fast.
 from config.settings import Settings
 
 
@@ -20,27 +17,47 @@ class DocumentEncryptionSystem:
     
     
     def __init__(self):
-        self.logger = Logger()
         self.settings = Settings()
-        self.validator = Validator()
-        self.file_handler = FileHandler()
-        self.key_manager = KeyManager()
+        self._logger = None
+        self._validator = None
+        self._file_handler = None
+        self._key_manager = None
+    
+    @property
+    def logger(self):
         
+        if self._logger is None:
+            from utils.logger import Logger
+            self._logger = Logger()
+        return self._logger
+    
+    @property
+    def validator(self):
         
-        self._create_directories()
+        if self._validator is None:
+            from utils.validator import Validator
+            self._validator = Validator()
+        return self._validator
     
-    def _create_directories(self):
+    @property
+    def file_handler(self):
         
-        directories = [
-            self.settings.ENCRYPTED_DIR,
-            self.settings.DECRYPTED_DIR,
-            self.settings.KEYS_DIR
-        ]
+        if self._file_handler is None:
+            from utils.file_handler import FileHandler
+            self._file_handler = FileHandler()
+        return self._file_handler
+    
+    @property
+    def key_manager(self):
         
-        for directory in directories:
-            Path(directory).mkdir(parents=True, exist_ok=True)
+        if self._key_manager is None:
+            from core.key_manager import KeyManager
+            self._key_manager = KeyManager()
+        return self._key_manager
+    
+    def _ensure_directory(self, directory):
         
-        self.logger.info("Директории инициализированы")
+        Path(directory).mkdir(parents=True, exist_ok=True)
     
     def encrypt_document(self, 
                         input_file: str, 
@@ -53,7 +70,9 @@ class DocumentEncryptionSystem:
                 raise ValueError(f"Файл не найден или недоступен: {input_file}")
             
             
-            file_type = self.validator.get_file_type(input_file)
+            from utils.content_sniffer import ContentSniffer
+            head = self.file_handler.read_head(input_file, ContentSniffer.HEAD_SIZE)
+            file_type = self.validator.get_file_type(input_file, head)
             if not self.validator.is_supported_format(file_type):
                 raise ValueError(f"Неподдерживаемый формат файла: {file_type}")
             
@@ -66,23 +85,13 @@ class DocumentEncryptionSystem:
                 self.logger.info("Сгенерирован мастер-пароль")
             
             
+            from core.encryption_engine import EncryptionEngine
             encryption_engine = EncryptionEngine(
                 password=password,
                 key_manager=self.key_manager
             )
             
             
-            file_data = self.file_handler.read_file(input_file)
-            self.logger.info(f"Прочитано байт: {len(file_data)}")
-            
-            
-            encrypted_data = encryption_engine.encrypt(
-                data=file_data,
-                file_type=file_type,
-                original_filename=os.path.basename(input_file)
-            )
-            
-            
             if output_file is None:
                 output_file = self._generate_output_filename(
                     input_file, 
@@ -91,7 +100,17 @@ class DocumentEncryptionSystem:
                 )
             
             
-            self.file_handler.write_file(output_file, encrypted_data)
+            with self.file_handler.open_buffer(input_file) as file_data:
+                original_size = len(file_data)
+                self.logger.info(f"Прочитано байт: {original_size}")
+                
+                
+                encrypted_size = encryption_engine.encrypt_to(
+                    data=file_data,
+                    file_type=file_type,
+                    original_filename=os.path.basename(input_file),
+                    sink=output_file
+                )
             self.logger.info(f"Зашифрованный файл сохранен: {output_file}")
             
             
@@ -106,9 +125,9 @@ class DocumentEncryptionSystem:
                 'output_file': output_file,
                 'key_file': key_file,
                 'file_type': file_type,
-                'original_size': len(file_data),
-                'encrypted_size': len(encrypted_data),
-                'compression_ratio': len(file_data) / len(encrypted_data) if len(encrypted_data) > 0 else 0
+                'original_size': original_size,
+                'encrypted_size': encrypted_size,
+                'compression_ratio': original_size / encrypted_size if encrypted_size > 0 else 0
             }
             
             self.logger.info("Шифрование успешно завершено")
@@ -125,7 +144,8 @@ class DocumentEncryptionSystem:
                         input_file: str,
                         key_file: str,
                         output_file: Optional[str] = None,
-                        password: Optional[str] = None) -> dict:
+                        password: Optional[str] = None,
+                        strict_keys: Optional[bool] = None) -> dict:
         
         try:
             
@@ -142,17 +162,20 @@ class DocumentEncryptionSystem:
             self.logger.info("Ключи успешно загружены")
             
             
+            from core.decryption_engine import DecryptionEngine
             decryption_engine = DecryptionEngine(
                 key_bundle=key_bundle,
-                key_manager=self.key_manager
+                key_manager=self.key_manager,
+                strict_keys=strict_keys
             )
             
             
-            encrypted_data = self.file_handler.read_file(input_file)
-            self.logger.info(f"Прочитано зашифрованных байт: {len(encrypted_data)}")
-            
-            
-            decrypted_result = decryption_engine.decrypt(encrypted_data)
+            with self.file_handler.open_buffer(input_file) as encrypted_data:
+                encrypted_size = len(encrypted_data)
+                self.logger.info(f"Прочитано зашифрованных байт: {encrypted_size}")
+                
+                
+                decrypted_result = decryption_engine.decrypt(encrypted_data)
             
             
             if output_file is None:
@@ -172,7 +195,7 @@ class DocumentEncryptionSystem:
                 'output_file': output_file,
                 'original_filename': decrypted_result['original_filename'],
                 'file_type': decrypted_result['file_type'],
-                'encrypted_size': len(encrypted_data),
+                'encrypted_size': encrypted_size,
                 'decrypted_size': len(decrypted_result['data'])
             }
             
@@ -186,6 +209,124 @@ class DocumentEncryptionSystem:
                 'message': str(e)
             }
     
+    def rewrap_document(self,
+                        input_file: str,
+                        key_file: str,
+                        output_file: Optional[str] = None,
+                        password: Optional[str] = None,
+                        new_password: Optional[str] = None,
+                        new_key_file: Optional[str] = None,
+                        rotate_rsa: bool = True) -> dict:
+        
+        try:
+            
+            if not self.validator.validate_file(input_file):
+                raise ValueError(f"Зашифрованный файл не найден: {input_file}")
+            
+            if not self.validator.validate_file(key_file):
+                raise ValueError(f"Файл ключа не найден: {key_file}")
+            
+            self.logger.info(f"Начинается перешифрование ключей: {input_file}")
+            
+            
+            from core.key_rotation import KeyRotator
+            key_bundle = self.key_manager.load_key_bundle(key_file, password)
+            rotator = KeyRotator(key_bundle, self.key_manager, rotate_rsa=rotate_rsa)
+            
+            
+            new_key_file = new_key_file or key_file
+            # Новый ключ сохраняется до изменения контейнера, чтобы сбой не оставил его без ключа
+            staged = rotator.stage_bundle(new_key_file, new_password)
+            try:
+                result = rotator.rewrap_file(input_file, output_file)
+            except BaseException:
+                os.unlink(staged)
+                raise
+            rotator.commit_bundle(staged, new_key_file)
+            self.logger.info(f"Ключи перешифрованы, новый ключ: {new_key_file}")
+            
+            result.update({'status': 'success', 'key_file': new_key_file})
+            return result
+            
+        except Exception as e:
+            self.logger.error(f"Ошибка при перешифровании ключей: {str(e)}")
+            return {
+                'status': 'error',
+                'message': str(e)
+            }
+    
+    def rewrap_directory(self,
+                         directory: str,
+                         key_file: Optional[str] = None,
+                         keys_dir: Optional[str] = None,
+                         password: Optional[str] = None,
+                         new_password: Optional[str] = None,
+                         rotate_rsa: bool = True,
+                         workers: int = 4) -> dict:
+        
+        from core.key_rotation import KeyRotator, rewrap_directory
+        
+        if not key_file and not keys_dir:
+            raise ValueError("Для каталога укажите --key или --keys-dir")
+        
+        
+        key_pool = None
+        if key_file:
+            # Одна пара RSA только для контейнеров одного общего комплекта ключей
+            shared = KeyRotator(
+                self.key_manager.load_key_bundle(key_file, password),
+                self.key_manager, rotate_rsa=rotate_rsa
+            )
+            rotator_for = lambda path: (shared, None)
+        else:
+            # У каждого комплекта своя новая пара RSA: общий закрытый ключ позволил бы
+            # владельцу одного комплекта снять RSA-обёртку ключей всех остальных.
+            # Пары заранее генерирует пул, чтобы не ждать генерации на каждый файл
+            if rotate_rsa and self.key_manager.key_pool is None:
+                from core.rsa_key_pool import RSAKeyPool
+                key_pool = RSAKeyPool(
+                    self.key_manager._generate_rsa_keypair, self.settings.RSA_KEY_SIZE, workers
+                ).start()
+                self.key_manager.key_pool = key_pool
+            
+            def rotator_for(path):
+                bundle_path = os.path.join(keys_dir, f"{os.path.splitext(path.name)[0]}.key")
+                bundle = self.key_manager.load_key_bundle(bundle_path, password)
+                return KeyRotator(bundle, self.key_manager, rotate_rsa=rotate_rsa), bundle_path
+        
+        # Общий ключ сохраняется до первого контейнера: после сбоя посреди
+        # каталога новый закрытый ключ уже на диске (<key>.rewrap-new)
+        staged = shared.stage_bundle(key_file, new_password) if key_file else None
+        
+        self.logger.info(f"Перешифрование ключей в каталоге: {directory}")
+        try:
+            results = rewrap_directory(directory, rotator_for, workers=workers,
+                                       bundle_password=new_password)
+        finally:
+            if key_pool is not None:
+                self.key_manager.key_pool = None
+                key_pool.stop()
+        
+        failed = [r for r in results if r['status'] != 'success']
+        previous_key_file = None
+        if staged:
+            if len(failed) < len(results):
+                # Не перешифрованные контейнеры по-прежнему требуют старый ключ
+                previous_key_file = KeyRotator.commit_bundle(staged, key_file, keep_previous=bool(failed))
+            else:
+                os.unlink(staged)
+        
+        self.logger.info(f"Обработано файлов: {len(results)}, ошибок: {len(failed)}")
+        if previous_key_file:
+            self.logger.warning(f"Старый ключ для необработанных файлов: {previous_key_file}")
+        return {
+            'status': 'success' if not failed else 'error',
+            'processed': len(results),
+            'failed': failed,
+            'previous_key_file': previous_key_file,
+            'message': f"Ошибок: {len(failed)}"
+        }
+    
     def _generate_output_filename(self, 
                                   input_file: str, 
                                   suffix: str,
@@ -205,12 +346,36 @@ class DocumentEncryptionSystem:
         name_without_ext = os.path.splitext(base_name)[0]
         key_file = os.path.join(self.settings.KEYS_DIR, f"{name_without_ext}.key")
         
+        self._ensure_directory(self.settings.KEYS_DIR)
         self.key_manager.save_key_bundle(key_bundle, key_file)
         self.logger.info(f"Ключ сохранен: {key_file}")
         
         return key_file
 
 
+def _add_daemon_arguments(subparser):
+    
+    subparser.add_argument('--socket', help='Путь к Unix-сокету демона serve-local')
+    subparser.add_argument('--no-daemon', action='store_true',
+                           help='Выполнить команду в текущем процессе, не обращаясь к демону')
+
+
+def _run_command(system: DocumentEncryptionSystem, command: str, kwargs: dict, args) -> dict:
+    
+    if not args.no_daemon:
+        from core.local_daemon import DaemonUnavailable, UntrustedSocket, call
+        try:
+            return call(command, kwargs, socket_path=args.socket)
+        except UntrustedSocket as e:
+            system.logger.warning(f"Демон не используется: {e}")
+        except DaemonUnavailable:
+            pass
+    
+    if command == 'encrypt':
+        return system.encrypt_document(**kwargs)
+    return system.decrypt_document(**kwargs)
+
+
 def main():
     
     parser = argparse.ArgumentParser(
@@ -227,6 +392,17 @@ def main():
   Расшифровка:
     python main.py decrypt document.encrypted --key document.key
     python main.py decrypt report.encrypted --key report.key --password mypassword
+  
+  Резидентный демон (команды encrypt/decrypt автоматически используют его):
+    python main.py serve-local
+    python main.py encrypt document.pdf --no-daemon
+  
+  Смена RSA-ключа / пароля ключа без повторного шифрования данных:
+    python main.py rewrap document.encrypted --key document.key --new-password newpass
+    python main.py rewrap encrypted_files/ --keys-dir keys/ --workers 8
+  
+  Пересборка каталога метаданных:
+    python main.py rebuild-catalog metadata/
         """
     )
     
@@ -237,6 +413,7 @@ def main():
     encrypt_parser.add_argument('input', help='Путь к файлу для шифрования')
     encrypt_parser.add_argument('--output', '-o', help='Путь к выходному файлу')
     encrypt_parser.add_argument('--password', '-p', help='Пароль для шифрования')
+    _add_daemon_arguments(encrypt_parser)
     
     
     decrypt_parser = subparsers.add_parser('decrypt', help='Расшифровать документ')
@@ -244,6 +421,33 @@ def main():
     decrypt_parser.add_argument('--key', '-k', required=True, help='Путь к файлу ключа')
     decrypt_parser.add_argument('--output', '-o', help='Путь к выходному файлу')
     decrypt_parser.add_argument('--password', '-p', help='Пароль для расшифровки ключа')
+    decrypt_parser.add_argument('--strict-keys', action='store_true', default=None,
+                                help='Проверять ключи через расшифровку RSA вместо отпечатка')
+    _add_daemon_arguments(decrypt_parser)
+    
+    
+    rewrap_parser = subparsers.add_parser('rewrap', help='Перешифровать ключи контейнера (файл или каталог)')
+    rewrap_parser.add_argument('input', help='Зашифрованный файл или каталог')
+    rewrap_parser.add_argument('--key', '-k', help='Файл ключа (общий для каталога)')
+    rewrap_parser.add_argument('--keys-dir', help='Каталог с ключами <имя>.key для каждого файла')
+    rewrap_parser.add_argument('--output', '-o', help='Путь к выходному файлу (по умолчанию — на месте)')
+    rewrap_parser.add_argument('--password', '-p', help='Текущий пароль файла ключа')
+    rewrap_parser.add_argument('--new-password', help='Новый пароль файла ключа')
+    rewrap_parser.add_argument('--new-key', help='Куда сохранить новый ключ (по умолчанию — поверх старого)')
+    rewrap_parser.add_argument('--keep-rsa', action='store_true',
+                               help='Сменить только защиту файла ключа, не меняя RSA-ключ')
+    rewrap_parser.add_argument('--workers', type=int, default=4, help='Потоки для каталога')
+    
+    
+    serve_parser = subparsers.add_parser('serve-local', help='Запустить локальный демон шифрования')
+    serve_parser.add_argument('--socket', help='Путь к Unix-сокету')
+    serve_parser.add_argument('--pool-size', type=int, default=Settings.LOCAL_KEY_POOL_SIZE,
+                              help='Количество заранее сгенерированных RSA-ключей')
+    
+    
+    catalog_parser = subparsers.add_parser('rebuild-catalog', help='Пересобрать каталог метаданных')
+    catalog_parser.add_argument('metadata_dir', nargs='?', default='metadata',
+                                help='Каталог с файлами .meta.json')
     
     args = parser.parse_args()
     
@@ -251,16 +455,26 @@ def main():
         parser.print_help()
         return 1
     
+    if args.command == 'rebuild-catalog':
+        from storage.metadata_manager import MetadataManager
+        count = MetadataManager(Path(args.metadata_dir)).rebuild_catalog()
+        print(f"\n[SUCCESS] Каталог пересобран, документов: {count}")
+        return 0
+    
     
     system = DocumentEncryptionSystem()
     
     try:
-        if args.command == 'encrypt':
-            result = system.encrypt_document(
-                input_file=args.input,
-                output_file=args.output,
-                password=args.password
-            )
+        if args.command == 'serve-local':
+            from core.local_daemon import serve
+            return serve(system, socket_path=args.socket, pool_size=args.pool_size)
+        
+        elif args.command == 'encrypt':
+            result = _run_command(system, 'encrypt', {
+                'input_file': args.input,
+                'output_file': args.output,
+                'password': args.password
+            }, args)
             
             if result['status'] == 'success':
                 print("\n" + "="*70)
@@ -281,12 +495,13 @@ def main():
                 return 1
         
         elif args.command == 'decrypt':
-            result = system.decrypt_document(
-                input_file=args.input,
-                key_file=args.key,
-                output_file=args.output,
-                password=args.password
-            )
+            result = _run_command(system, 'decrypt', {
+                'input_file': args.input,
+                'key_file': args.key,
+                'output_file': args.output,
+                'password': args.password,
+                'strict_keys': args.strict_keys
+            }, args)
             
             if result['status'] == 'success':
                 print("\n" + "="*70)
@@ -303,6 +518,50 @@ def main():
             else:
                 print(f"\n[ERROR] Ошибка: {result['message']}")
                 return 1
+        
+        elif args.command == 'rewrap':
+            if os.path.isdir(args.input):
+                result = system.rewrap_directory(
+                    directory=args.input,
+                    key_file=args.key,
+                    keys_dir=args.keys_dir,
+                    password=args.password,
+                    new_password=args.new_password,
+                    rotate_rsa=not args.keep_rsa,
+                    workers=args.workers
+                )
+                print(f"\nОбработано файлов: {result['processed']}, ошибок: {len(result['failed'])}")
+                for failure in result['failed']:
+                    print(f"[ERROR] {failure['input_file']}: {failure['message']}")
+                if result['previous_key_file']:
+                    print(f"Ключ для необработанных файлов сохранен: {result['previous_key_file']}")
+                return 0 if result['status'] == 'success' else 1
+            
+            if not args.key:
+                print("\n[ERROR] Ошибка: укажите файл ключа (--key)")
+                return 1
+            
+            result = system.rewrap_document(
+                input_file=args.input,
+                key_file=args.key,
+                output_file=args.output,
+                password=args.password,
+                new_password=args.new_password,
+                new_key_file=args.new_key,
+                rotate_rsa=not args.keep_rsa
+            )
+            
+            if result['status'] == 'success':
+                print("\n" + "="*70)
+                print("[SUCCESS] КЛЮЧИ ПЕРЕШИФРОВАНЫ")
+                print("="*70)
+                print(f"Зашифрованный файл: {result['output_file']}")
+                print(f"Новый файл ключа:   {result['key_file']}")
+                print("="*70)
+                return 0
+            else:
+                print(f"\n[ERROR] Ошибка: {result['message']}")
+                return 1
     
     except KeyboardInterrupt:
         print("\n\n[ERROR] Операция прервана пользователем")
@@ -0,0 +1,12 @@
+
+
+from .excel_processor import ExcelProcessor
+from .word_processor import WordProcessor
+
+# Процессоры с обратимой предобработкой данных перед шифрованием
+OFFICE_PROCESSORS = {
+    'word': WordProcessor,
+    'excel': ExcelProcessor
+}
+
+__all__ = ['ExcelProcessor', 'WordProcessor', 'OFFICE_PROCESSORS']
@@ -0,0 +1,222 @@
+"""
+Lossless re-expansion of Office Open XML (.docx/.xlsx) ZIP packages.
+
+OOXML documents are ZIP archives of deflated XML, so the engine's LZMA pass
+finds almost nothing left to compress. expand() inflates every deflated
+member whose exact compressed bytes can be regenerated with zlib (same level
+and memLevel found by trial, verified byte for byte) and emits:
+
+  MAGIC
+  zlib_version_len uint8 + zlib_version (ASCII, zlib.ZLIB_RUNTIME_VERSION of the packer)
+  count uint32 LE
+  count x (kind uint8, params uint8, out_len uint64 LE, body_len uint64 LE, crc32 uint32 LE)
+  bodies of INFLATED entries, in order (the XML, kept together for the codec)
+  bodies of RAW entries, in order (headers, central directory, other members)
+
+RAW entries are copied through unchanged; INFLATED entries are re-deflated with
+params (level | memLevel << 4) on restore(). Members written by a deflater zlib
+cannot reproduce stay RAW, so the transform is lossless on the packing machine
+and only the gain varies.
+
+Deflate output is only guaranteed identical for the same zlib build: zlib-ng
+and vendor forks produce different (equally valid) streams. crc32 is the CRC
+of the member's original compressed bytes (0 for RAW entries); restore()
+checks every re-deflated member against it and fails with both zlib versions
+in the message instead of returning a package that differs from the original.
+"""
+import io
+import struct
+import zipfile
+import zlib
+from typing import List, Optional, Tuple, Union
+
+from .document_processor import DocumentProcessor
+
+MAGIC = b'OOXZ\x02'
+COUNT = struct.Struct('<I')
+ENTRY = struct.Struct('<BBQQI')
+
+RAW = 0
+INFLATED = 1
+
+_LOCAL_HEADER = struct.Struct('<4s22xHH')
+_LOCAL_SIGNATURE = b'PK\x03\x04'
+
+# (level, memLevel) in order of likelihood: zlib's default, then maximum, then the rest
+_CANDIDATES = [(level, mem) for mem in (8, 9) for level in (6, 9, 1, 2, 3, 4, 5, 7, 8)]
+_PROBE_SIZE = 64 * 1024
+_MIN_MEMBER_SIZE = 64
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def _deflated_spans(data: Buffer) -> Optional[List[Tuple[int, int]]]:
+    
+    try:
+        infos = zipfile.ZipFile(io.BytesIO(data)).infolist()
+    except (zipfile.BadZipFile, ValueError, EOFError):
+        return None
+    
+    spans = []
+    end_prev = 0
+    for info in sorted(infos, key=lambda item: item.header_offset):
+        offset = info.header_offset
+        try:
+            signature, name_len, extra_len = _LOCAL_HEADER.unpack_from(data, offset)
+        except struct.error:
+            return None
+        if signature != _LOCAL_SIGNATURE:
+            return None
+        start = offset + _LOCAL_HEADER.size + name_len + extra_len
+        end = start + info.compress_size
+        if offset < end_prev or end > len(data):
+            return None
+        end_prev = end
+        if info.compress_type == zipfile.ZIP_DEFLATED and not info.flag_bits & 0x1:
+            spans.append((start, end))
+    return spans
+
+
+def _inflate(raw: memoryview) -> Optional[bytes]:
+    
+    inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+    try:
+        inflated = inflater.decompress(raw)
+    except zlib.error:
+        return None
+    if not inflater.eof or inflater.unused_data:
+        return None
+    return inflated
+
+
+def _deflater(params: int):
+    
+    return zlib.compressobj(params & 0x0F, zlib.DEFLATED, -zlib.MAX_WBITS, params >> 4)
+
+
+def _find_params(raw: memoryview, inflated: bytes) -> Optional[int]:
+    
+    source = memoryview(inflated)
+    for level, mem in _CANDIDATES:
+        params = level | mem << 4
+        deflater = _deflater(params)
+        pos = 0
+        for start in range(0, len(source), _PROBE_SIZE):
+            out = deflater.compress(source[start:start + _PROBE_SIZE])
+            if raw[pos:pos + len(out)] != out:
+                break
+            pos += len(out)
+        else:
+            if raw[pos:] == deflater.flush():
+                return params
+    return None
+
+
+def expand(data: Buffer) -> Optional[bytes]:
+    """Return the expanded form of an OOXML package, or None if nothing can be inflated."""
+    view = memoryview(data)
+    if bytes(view[:len(_LOCAL_SIGNATURE)]) != _LOCAL_SIGNATURE:
+        return None
+    spans = _deflated_spans(view)
+    if not spans:
+        return None
+    
+    entries = []
+    inflated_bodies = []
+    raw_bodies = []
+    
+    def copy(start: int, end: int):
+        if end > start:
+            entries.append((RAW, 0, end - start, end - start, 0))
+            raw_bodies.append(view[start:end])
+    
+    pos = 0
+    for start, end in spans:
+        copy(pos, start)
+        member = view[start:end]
+        inflated = _inflate(member) if len(member) >= _MIN_MEMBER_SIZE else None
+        params = _find_params(member, inflated) if inflated is not None else None
+        if params is None:
+            copy(start, end)
+        else:
+            entries.append((INFLATED, params, end - start, len(inflated), zlib.crc32(member)))
+            inflated_bodies.append(inflated)
+        pos = end
+    copy(pos, len(view))
+    
+    if not inflated_bodies:
+        return None
+    
+    zlib_version = zlib.ZLIB_RUNTIME_VERSION.encode('ascii')
+    return b''.join([
+        MAGIC,
+        bytes((len(zlib_version),)), zlib_version,
+        COUNT.pack(len(entries)),
+        *(ENTRY.pack(*entry) for entry in entries),
+        *inflated_bodies,
+        *raw_bodies,
+    ])
+
+
+def restore(data: Buffer) -> bytes:
+    """Rebuild the original package from expand() output.
+
+    Raises:
+        ValueError: If the data is not a valid expanded package.
+    """
+    view = memoryview(data)
+    if bytes(view[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Неверный формат: данные не являются распакованным Office-документом")
+    
+    try:
+        version_end = len(MAGIC) + 1 + view[len(MAGIC)]
+        packed_with = bytes(view[len(MAGIC) + 1:version_end]).decode('ascii', 'replace')
+        (count,) = COUNT.unpack_from(view, version_end)
+        table = version_end + COUNT.size
+        entries = [ENTRY.unpack_from(view, table + i * ENTRY.size) for i in range(count)]
+    except (IndexError, struct.error):
+        raise ValueError("Неверный формат: таблица Office-документа обрезана")
+    
+    inflated_pos = table + count * ENTRY.size
+    raw_pos = inflated_pos + sum(entry[3] for entry in entries if entry[0] == INFLATED)
+    
+    parts = []
+    for kind, params, out_len, body_len, crc in entries:
+        if kind == RAW:
+            part = view[raw_pos:raw_pos + body_len]
+            raw_pos += body_len
+        elif kind == INFLATED:
+            level, mem = params & 0x0F, params >> 4
+            if not (1 <= level <= 9 and 1 <= mem <= 9):
+                raise ValueError("Неверные параметры сжатия в Office-документе")
+            body = view[inflated_pos:inflated_pos + body_len]
+            inflated_pos += body_len
+            deflater = _deflater(params)
+            part = deflater.compress(body) + deflater.flush()
+            if len(part) != out_len or zlib.crc32(part) != crc:
+                raise ValueError(
+                    f"Office-документ не восстановлен побайтно: zlib {zlib.ZLIB_RUNTIME_VERSION} "
+                    f"сжимает иначе, чем zlib {packed_with}, которым он был упакован"
+                )
+        else:
+            raise ValueError(f"Неизвестный тип фрагмента Office-документа: {kind}")
+        if len(part) != out_len:
+            raise ValueError("Office-документ восстановлен с ошибкой: размер фрагмента не совпадает")
+        parts.append(part)
+    
+    if raw_pos != len(view):
+        raise ValueError("Неверный формат: длина распакованного Office-документа не совпадает")
+    return b''.join(parts)
+
+
+class OfficeOpenXMLProcessor(DocumentProcessor):
+    
+    
+    def preprocess(self, data: bytes) -> bytes:
+        
+        expanded = expand(data)
+        return data if expanded is None else expanded
+    
+    def postprocess(self, data: bytes) -> bytes:
+        
+        return restore(data)
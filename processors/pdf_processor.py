@@ -2,6 +2,7 @@
 
 import os
 from typing import Dict, Any
+from utils.content_sniffer import ContentSniffer
 from .document_processor import DocumentProcessor
 
 
@@ -59,6 +60,6 @@ class PDFProcessor(DocumentProcessor):
         try:
             with open(filepath, 'rb') as f:
                 header = f.read(5)
-                return header == b'%PDF-'
+                return ContentSniffer.detect(header) == 'pdf'
         except:
             return False
\ No newline at end of file
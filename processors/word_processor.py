@@ -3,10 +3,11 @@
 import os
 import zipfile
 from typing import Dict, Any
-from .document_processor import DocumentProcessor
+from utils.content_sniffer import ContentSniffer
+from .office_zip import OfficeOpenXMLProcessor
 
 
-class WordProcessor(DocumentProcessor):
+class WordProcessor(OfficeOpenXMLProcessor):
     
     
     def __init__(self):
@@ -76,7 +77,8 @@ class WordProcessor(DocumentProcessor):
                 with open(filepath, 'rb') as f:
                     header = f.read(8)
                     
-                    return header[:2] == b'\xD0\xCF' or header[:4] == b'\x50\x4B\x03\x04'
+                    kind = ContentSniffer.detect(header)
+                    return kind == 'ole2' or kind in ContentSniffer.ZIP_KINDS
             except:
                 return False
         
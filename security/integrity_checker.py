@@ -2,7 +2,7 @@
 
 import hmac
 import hashlib
-from typing import Optional
+from typing import Iterable, Optional
 
 
 class IntegrityChecker:
@@ -23,6 +23,34 @@ class IntegrityChecker:
         
         return hmac.compare_digest(expected_hmac, hmac_signature)
     
+    @staticmethod
+    def new_hmac(key: bytes, algorithm: str = 'sha512'):
+        
+        return hmac.new(key, digestmod=getattr(hashlib, algorithm))
+    
+    @staticmethod
+    def create_hmac_parts(parts: Iterable[bytes], key: bytes,
+                          algorithm: str = 'sha512') -> bytes:
+        
+        mac = IntegrityChecker.new_hmac(key, algorithm)
+        for part in parts:
+            mac.update(part)
+        return mac.digest()
+    
+    @staticmethod
+    def verify_hmac_parts(parts: Iterable[bytes], hmac_signature: bytes, key: bytes,
+                          algorithm: str = 'sha512') -> bool:
+        
+        expected_hmac = IntegrityChecker.create_hmac_parts(parts, key, algorithm)
+        
+        
+        return hmac.compare_digest(expected_hmac, hmac_signature)
+    
+    @staticmethod
+    def create_key_fingerprint(keys_bundle: bytes, key: bytes) -> bytes:
+        
+        return hmac.new(key, b'DOCENC-KEY-FINGERPRINT\x01' + keys_bundle, hashlib.sha256).digest()
+    
     @staticmethod
     def create_checksum(data: bytes, algorithm: str = 'sha256') -> bytes:
         
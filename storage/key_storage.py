@@ -4,9 +4,11 @@ import os
 import json
 import base64
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterator, Optional
 from cryptography.fernet import Fernet
 
+from .sharding import ShardedLayout
+
 
 class KeyStorage:
     
@@ -15,13 +17,27 @@ class KeyStorage:
         
         self.storage_dir = storage_dir or Path('keys')
         self.storage_dir.mkdir(parents=True, exist_ok=True)
+        self.layout = ShardedLayout(self.storage_dir, '.key')
+        # В том же каталоге CLI хранит комплекты ключей документов (<имя>.key):
+        # в шарды переносятся только файлы, записанные store_key()
+        self.layout.migrate_flat(accept=self._is_stored_key)
+    
+    @staticmethod
+    def _is_stored_key(path: Path) -> bool:
+        
+        try:
+            with open(path, 'rb') as f:
+                stored_data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return isinstance(stored_data, dict) and stored_data.keys() == {'encrypted', 'data'}
     
     def store_key(self, 
                   key_id: str, 
                   key_data: bytes, 
                   protection_password: Optional[str] = None):
         
-        key_file = self.storage_dir / f"{key_id}.key"
+        key_file = self.layout.path_for(key_id, create=True)
         
         if protection_password:
             
@@ -43,7 +59,7 @@ class KeyStorage:
                      key_id: str, 
                      protection_password: Optional[str] = None) -> bytes:
         
-        key_file = self.storage_dir / f"{key_id}.key"
+        key_file = self.layout.path_for(key_id)
         
         if not key_file.exists():
             raise FileNotFoundError(f"Ключ не найден: {key_id}")
@@ -63,12 +79,16 @@ class KeyStorage:
     
     def delete_key(self, key_id: str):
         
-        key_file = self.storage_dir / f"{key_id}.key"
+        key_file = self.layout.path_for(key_id)
         
         if key_file.exists():
             
             self._secure_delete(key_file)
     
+    def iter_key_ids(self) -> Iterator[str]:
+        
+        return self.layout.iter_ids()
+    
     def _encrypt_key(self, key_data: bytes, password: str) -> bytes:
         
         from algorithms.hash_functions import HashFunctions
@@ -115,14 +135,6 @@ class KeyStorage:
     
     def _secure_delete(self, filepath: Path):
         
+        from utils.file_handler import FileHandler
         
-        file_size = filepath.stat().st_size
-        
-        with open(filepath, 'rb+') as f:
-            for _ in range(3):
-                f.seek(0)
-                f.write(os.urandom(file_size))
-                f.flush()
-                os.fsync(f.fileno())
-        
-        filepath.unlink()
+        FileHandler.secure_delete(str(filepath), passes=3)
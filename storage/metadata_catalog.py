@@ -0,0 +1,125 @@
+"""
+Searchable SQLite catalog of the documents described by MetadataManager.
+
+The .meta.json files stay the source of truth; the catalog holds the fields
+people search by (file type, timestamp, original name, original hash, size)
+in one indexed table, so a query never opens metadata files. MetadataManager
+keeps it in step on save_metadata/delete_metadata, and rebuild() repopulates
+it from an existing metadata directory (`python main.py rebuild-catalog`).
+"""
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    file_id       TEXT PRIMARY KEY,
+    file_type     TEXT,
+    timestamp     INTEGER,
+    original_name TEXT COLLATE NOCASE,
+    hash_original TEXT,
+    original_size INTEGER
+);
+CREATE INDEX IF NOT EXISTS documents_file_type ON documents (file_type, timestamp);
+CREATE INDEX IF NOT EXISTS documents_timestamp ON documents (timestamp);
+CREATE INDEX IF NOT EXISTS documents_original_name ON documents (original_name);
+CREATE INDEX IF NOT EXISTS documents_hash ON documents (hash_original);
+"""
+
+_COLUMNS = ('file_id', 'file_type', 'timestamp', 'original_name', 'hash_original', 'original_size')
+
+_UPSERT = (
+    f"INSERT OR REPLACE INTO documents ({', '.join(_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(_COLUMNS))})"
+)
+
+
+def catalog_row(file_id: str, metadata: Dict[str, Any]) -> Tuple:
+    file_info = metadata.get('file_info') or {}
+    return (
+        file_id,
+        file_info.get('file_type'),
+        metadata.get('timestamp'),
+        file_info.get('original_name'),
+        file_info.get('hash_original'),
+        file_info.get('original_size'),
+    )
+
+
+class MetadataCatalog:
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def upsert(self, file_id: str, metadata: Dict[str, Any]):
+        with self._conn() as conn:
+            conn.execute(_UPSERT, catalog_row(file_id, metadata))
+
+    def remove(self, file_id: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM documents WHERE file_id = ?", (file_id,))
+
+    def rebuild(self, entries: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Replace the catalog with `entries` (file_id, metadata) in one transaction."""
+        count = 0
+        with self._conn() as conn:
+            conn.execute("DELETE FROM documents")
+            for file_id, metadata in entries:
+                conn.execute(_UPSERT, catalog_row(file_id, metadata))
+                count += 1
+        return count
+
+    def query(self,
+              file_type: Optional[str] = None,
+              since: Optional[int] = None,
+              until: Optional[int] = None,
+              original_name: Optional[str] = None,
+              hash_original: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Catalog rows matching every given filter, newest first.
+
+        since/until bound the metadata timestamp (inclusive, Unix seconds);
+        original_name is matched case-insensitively and may contain SQL LIKE
+        wildcards (% and _); a literal prefix such as 'report%' uses the index.
+        """
+        clauses, params = [], []
+        if file_type is not None:
+            clauses.append("file_type = ?")
+            params.append(file_type)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp <= ?")
+            params.append(until)
+        if original_name is not None:
+            clauses.append("original_name LIKE ?")
+            params.append(original_name)
+        if hash_original is not None:
+            clauses.append("hash_original = ?")
+            params.append(hash_original)
+
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM documents"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp DESC, file_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self._conn().execute(sql, params)]
+
+    def __len__(self) -> int:
+        (count,) = self._conn().execute("SELECT COUNT(*) FROM documents").fetchone()
+        return count
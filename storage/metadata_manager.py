@@ -3,9 +3,12 @@
 import json
 import time
 import hashlib
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from pathlib import Path
 
+from .metadata_catalog import MetadataCatalog
+from .sharding import ShardedLayout
+
 
 class MetadataManager:
     
@@ -14,6 +17,9 @@ class MetadataManager:
         
         self.metadata_dir = metadata_dir or Path('metadata')
         self.metadata_dir.mkdir(parents=True, exist_ok=True)
+        self.layout = ShardedLayout(self.metadata_dir, '.meta.json')
+        self.layout.migrate_flat()
+        self.catalog = MetadataCatalog(self.metadata_dir / 'catalog.sqlite3')
     
     def create_metadata(self, 
                        file_info: Dict[str, Any],
@@ -49,14 +55,16 @@ class MetadataManager:
     
     def save_metadata(self, file_id: str, metadata: Dict[str, Any]):
         
-        metadata_file = self.metadata_dir / f"{file_id}.meta.json"
+        metadata_file = self.layout.path_for(file_id, create=True)
         
         with open(metadata_file, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, indent=2, ensure_ascii=False)
+        
+        self.catalog.upsert(file_id, metadata)
     
     def load_metadata(self, file_id: str) -> Optional[Dict[str, Any]]:
         
-        metadata_file = self.metadata_dir / f"{file_id}.meta.json"
+        metadata_file = self.layout.path_for(file_id)
         
         if not metadata_file.exists():
             return None
@@ -66,10 +74,43 @@ class MetadataManager:
     
     def delete_metadata(self, file_id: str):
         
-        metadata_file = self.metadata_dir / f"{file_id}.meta.json"
+        metadata_file = self.layout.path_for(file_id)
         
         if metadata_file.exists():
             metadata_file.unlink()
+        
+        self.catalog.remove(file_id)
+    
+    def iter_file_ids(self) -> Iterator[str]:
+        
+        return self.layout.iter_ids()
+    
+    def find(self,
+             file_type: Optional[str] = None,
+             since: Optional[int] = None,
+             until: Optional[int] = None,
+             original_name: Optional[str] = None,
+             hash_original: Optional[str] = None,
+             limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        
+        return self.catalog.query(
+            file_type=file_type,
+            since=since,
+            until=until,
+            original_name=original_name,
+            hash_original=hash_original,
+            limit=limit
+        )
+    
+    def rebuild_catalog(self) -> int:
+        
+        def entries():
+            for file_id in self.layout.iter_ids():
+                metadata = self.load_metadata(file_id)
+                if metadata is not None:
+                    yield file_id, metadata
+        
+        return self.catalog.rebuild(entries())
     
     def _calculate_hash(self, data: bytes) -> str:
         
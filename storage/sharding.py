@@ -0,0 +1,86 @@
+"""
+Hash-prefix sharded directory layout shared by KeyStorage, SecureVault and MetadataManager.
+
+Items used to live as flat files in one directory, which degrades lookups,
+listing and backups once it holds hundreds of thousands of entries. An item
+is now stored at
+
+  root/<first SHARD_WIDTH hex chars of sha256(item_id)>/.../<item_id><suffix>
+
+with SHARD_LEVELS directory levels (256 shards of ~4k files each at 1M items
+with the defaults). Files left in the flat layout are moved into their shard
+when the store is opened, so existing directories keep working. KeyStorage
+shares its default directory with the CLI's document key bundles, so it only
+moves files it wrote itself.
+"""
+import hashlib
+import os
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+SHARD_LEVELS = 1
+SHARD_WIDTH = 2
+
+_HEX = frozenset('0123456789abcdef')
+
+
+class ShardedLayout:
+
+    def __init__(self, root: Path, suffix: str, levels: int = SHARD_LEVELS, width: int = SHARD_WIDTH):
+        self.root = root
+        self.suffix = suffix
+        self.levels = levels
+        self.width = width
+
+    def shard_dir(self, item_id: str) -> Path:
+        digest = hashlib.sha256(item_id.encode('utf-8')).hexdigest()
+        path = self.root
+        for level in range(self.levels):
+            path = path / digest[level * self.width:(level + 1) * self.width]
+        return path
+
+    def path_for(self, item_id: str, create: bool = False) -> Path:
+        shard = self.shard_dir(item_id)
+        if create:
+            shard.mkdir(parents=True, exist_ok=True)
+        return shard / f"{item_id}{self.suffix}"
+
+    def iter_ids(self) -> Iterator[str]:
+        """Yield item ids shard by shard; never lists more than one shard at a time."""
+        yield from self._walk(self.root, self.levels)
+
+    def _walk(self, directory: Path, levels: int) -> Iterator[str]:
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            return
+        with entries:
+            if levels == 0:
+                for entry in entries:
+                    if entry.name.endswith(self.suffix) and entry.is_file():
+                        yield entry.name[:-len(self.suffix)]
+                return
+            shards = [
+                entry.name for entry in entries
+                if len(entry.name) == self.width and set(entry.name) <= _HEX and entry.is_dir()
+            ]
+        for name in sorted(shards):
+            yield from self._walk(directory / name, levels - 1)
+
+    def migrate_flat(self, accept: Optional[Callable[[Path], bool]] = None) -> List[str]:
+        """Move flat-layout files from root into their shards; return the migrated ids.
+
+        If given, accept(path) decides whether a flat file belongs to this store;
+        other files with the same suffix are left where they are.
+        """
+        migrated = []
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if not entry.name.endswith(self.suffix) or not entry.is_file():
+                    continue
+                if accept is not None and not accept(Path(entry.path)):
+                    continue
+                item_id = entry.name[:-len(self.suffix)]
+                os.replace(entry.path, self.path_for(item_id, create=True))
+                migrated.append(item_id)
+        return migrated
@@ -1,35 +1,107 @@
 
 
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, List, Mapping, Optional
 import json
+import os
+
+from .sharding import ShardedLayout
 
 
 class SecureVault:
     
+    # Индекс = снимок vault_index.json + журнал vault_index.log (по строке JSON
+    # на изменение). Запись в индекс — дозапись в журнал, а не перезапись всего
+    # индекса; журнал сворачивается в снимок, когда он длиннее самого индекса.
+    COMPACT_MIN_RECORDS = 1024
     
     def __init__(self, vault_dir: Optional[Path] = None):
         
         self.vault_dir = vault_dir or Path('vault')
         self.vault_dir.mkdir(parents=True, exist_ok=True)
         self.index_file = self.vault_dir / 'vault_index.json'
+        self.log_file = self.vault_dir / 'vault_index.log'
+        self._log_records = 0
+        self.layout = ShardedLayout(self.vault_dir, '.vault')
         self.index = self._load_index()
+        self._migrate_flat()
     
     def _load_index(self) -> Dict:
         
+        index = {}
         if self.index_file.exists():
             with open(self.index_file, 'r') as f:
-                return json.load(f)
-        return {}
+                index = json.load(f)
+        
+        if self.log_file.exists():
+            complete = 0
+            with open(self.log_file, 'rb+') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Оборванная последняя строка после сбоя: отрезаем её, иначе
+                        # следующая дозапись склеится с ней и тоже будет потеряна
+                        f.truncate(complete)
+                        break
+                    complete += len(line)
+                    try:
+                        record = json.loads(line)
+                        item_id = record['id']
+                        if record['op'] == 'put':
+                            index[item_id] = {'file': record['file'], 'metadata': record['metadata']}
+                        else:
+                            index.pop(item_id, None)
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    self._log_records += 1
+        
+        return index
+    
+    def _migrate_flat(self):
+        
+        self.layout.migrate_flat()
+        # Записи со старым плоским путём, в том числе оставшиеся после сбоя между
+        # переносом файлов и сжатием индекса, переводятся на путь в шарде
+        stale = [
+            item_id for item_id, entry in self.index.items()
+            if entry['file'] != str(self.layout.path_for(item_id))
+        ]
+        for item_id in stale:
+            self.index[item_id]['file'] = str(self.layout.path_for(item_id))
+        if stale:
+            self.compact()
     
-    def _save_index(self):
+    def _append_log(self, records: List[Dict]):
+        
+        if not records:
+            return
+        
+        with open(self.log_file, 'ab') as f:
+            f.write(b''.join(
+                json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+                for record in records
+            ))
         
-        with open(self.index_file, 'w') as f:
-            json.dump(self.index, f, indent=2)
+        self._log_records += len(records)
+        if self._log_records > max(self.COMPACT_MIN_RECORDS, len(self.index)):
+            self.compact()
     
-    def store(self, item_id: str, data: Any, metadata: Optional[Dict] = None):
+    def compact(self):
+        
+        tmp_file = self.index_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(self.index, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.index_file)
+        
+        
+        with open(self.log_file, 'wb'):
+            pass
+        self._log_records = 0
+    
+    def _write_item(self, item_id: str, data: Any, metadata: Optional[Dict]) -> Dict:
         
-        item_file = self.vault_dir / f"{item_id}.vault"
+        item_file = self.layout.path_for(item_id, create=True)
         
         vault_data = {
             'data': data,
@@ -44,7 +116,32 @@ class SecureVault:
             'file': str(item_file),
             'metadata': metadata or {}
         }
-        self._save_index()
+        return {'op': 'put', 'id': item_id, **self.index[item_id]}
+    
+    def _remove_item(self, item_id: str) -> Optional[Dict]:
+        
+        if item_id not in self.index:
+            return None
+        
+        item_file = Path(self.index[item_id]['file'])
+        
+        if item_file.exists():
+            item_file.unlink()
+        
+        del self.index[item_id]
+        return {'op': 'del', 'id': item_id}
+    
+    def store(self, item_id: str, data: Any, metadata: Optional[Dict] = None):
+        
+        self._append_log([self._write_item(item_id, data, metadata)])
+    
+    def store_many(self, items: Mapping[str, Any], metadata: Optional[Mapping[str, Dict]] = None):
+        
+        metadata = metadata or {}
+        self._append_log([
+            self._write_item(item_id, data, metadata.get(item_id))
+            for item_id, data in items.items()
+        ])
     
     def retrieve(self, item_id: str) -> Optional[Any]:
         
@@ -63,16 +160,14 @@ class SecureVault:
     
     def delete(self, item_id: str):
         
-        if item_id not in self.index:
-            return
-        
-        item_file = Path(self.index[item_id]['file'])
-        
-        if item_file.exists():
-            item_file.unlink()
+        record = self._remove_item(item_id)
+        if record:
+            self._append_log([record])
+    
+    def delete_many(self, item_ids: Iterable[str]):
         
-        del self.index[item_id]
-        self._save_index()
+        records = [self._remove_item(item_id) for item_id in item_ids]
+        self._append_log([record for record in records if record])
     
     def list_items(self) -> list:
         
@@ -133,12 +133,13 @@ def main():
         with open(key_path, "wb") as f:
             f.write(r.content)
 
-        # Проверяем что это валидный JSON
-        import json
-        key_data = json.loads(r.content)
-        print(f"  Формат: JSON")
+        # Проверяем что это валидный бинарный key bundle
+        from core.key_manager import KeyManager
+        assert r.headers["content-type"] == "application/octet-stream"
+        key_data = KeyManager().parse_key_bundle(r.content)
+        print(f"  Формат: binary (DOCKEY)")
         print(f"  Поля: {', '.join(key_data.keys())}")
-        assert "aes_key" in key_data or "encrypted" in key_data, "Key bundle missing expected fields!"
+        assert "aes_key" in key_data, "Key bundle missing expected fields!"
         print(f"  Key bundle валидный!")
 
         # 7. Инспекция зашифрованного файла
@@ -0,0 +1,433 @@
+"""
+End-to-end API flow: upload → poll → download for encrypt and decrypt jobs.
+
+Starlette's TestClient runs BackgroundTasks before returning the response,
+so each job is terminal by the time the POST returns.
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.services import temp_io
+from app.services.shredder import shred_queue
+
+PLAINTEXT = b"confidential memo\n" * 200
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, clear_settings_cache):
+    monkeypatch.setenv("TEMP_DIR", str(tmp_path))
+    get_settings.cache_clear()
+    from app.main import app
+    with TestClient(app) as c:
+        yield c
+
+
+def _encrypt(client, content=PLAINTEXT, name="memo.txt", password="pw-123"):
+    resp = client.post(
+        "/api/encrypt",
+        files={"file": (name, content, "text/plain")},
+        data={"password": password},
+    )
+    assert resp.status_code == 202
+    return resp.json()["file_id"]
+
+
+def test_encrypt_then_decrypt_roundtrip(client, tmp_path):
+    file_id = _encrypt(client)
+    status = client.get(f"/api/files/{file_id}").json()
+    assert status["status"] == "complete"
+
+    enc = client.get(f"/api/files/{file_id}/download?type=encrypted")
+    key = client.get(f"/api/files/{file_id}/download?type=key")
+    assert enc.status_code == 200 and key.status_code == 200
+    # D-09: the uploaded source is shredded in the background after the first download
+    shred_queue.shutdown()
+    assert not list((tmp_path / "files").glob(f"{file_id}_src*"))
+
+    resp = client.post(
+        "/api/decrypt",
+        files={
+            "encrypted_file": ("memo.txt.enc", enc.content, "application/octet-stream"),
+            "key_file": ("memo.txt.key", key.content, "application/json"),
+        },
+    )
+    assert resp.status_code == 202
+    dec_id = resp.json()["file_id"]
+    assert client.get(f"/api/files/{dec_id}").json()["status"] == "complete"
+    out = client.get(f"/api/files/{dec_id}/download")
+    assert out.status_code == 200
+    assert out.content == PLAINTEXT
+
+
+# --- temp_io helpers ---
+
+def test_temp_io_write_read_unlink(tmp_path):
+    path = tmp_path / "sub" / "blob.bin"
+    data = bytes(range(256)) * 5000
+
+    async def scenario():
+        await temp_io.makedirs(path.parent)
+        await temp_io.write_bytes(path, data)
+        assert await temp_io.read_bytes(path) == data
+        await temp_io.unlink(path)
+        await temp_io.unlink(path)  # missing_ok by default
+        with pytest.raises(FileNotFoundError):
+            await temp_io.unlink(path, missing_ok=False)
+
+    asyncio.run(scenario())
+    assert not path.exists()
+
+
+# --- Content-addressed dedup ---
+
+def test_dedup_reuses_published_result(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("DEDUP_ENABLED", "true")
+    get_settings.cache_clear()
+
+    first = _encrypt(client, name="dedup.txt")
+    resp = client.post(
+        "/api/encrypt",
+        files={"file": ("dedup.txt", PLAINTEXT, "text/plain")},
+        data={"password": "pw-123"},
+    )
+    assert resp.json()["status"] == "complete"
+    second = resp.json()["file_id"]
+
+    a = client.get(f"/api/files/{first}/download?type=encrypted").content
+    b = client.get(f"/api/files/{second}/download?type=encrypted").content
+    assert a == b
+    # Only one ciphertext/key pair on disk, and no source for the deduplicated job
+    assert len(list((tmp_path / "cas").iterdir())) == 2
+    assert not list((tmp_path / "files").glob(f"{second}_*"))
+
+    # A different password is a different content key
+    other = client.post(
+        "/api/encrypt",
+        files={"file": ("dedup.txt", PLAINTEXT, "text/plain")},
+        data={"password": "pw-456"},
+    )
+    assert other.json()["status"] == "queued"
+
+
+# --- Key rotation ---
+
+def test_rewrap_job_rotates_bundle(client):
+    file_id = _encrypt(client, name="rotate.txt")
+    enc = client.get(f"/api/files/{file_id}/download?type=encrypted").content
+    key = client.get(f"/api/files/{file_id}/download?type=key").content
+
+    resp = client.post(
+        "/api/rewrap",
+        files={
+            "encrypted_file": ("rotate.txt.enc", enc, "application/octet-stream"),
+            "key_file": ("rotate.txt.key", key, "application/octet-stream"),
+        },
+        data={"new_password": "rotated-pass"},
+    )
+    assert resp.status_code == 202
+    assert resp.json()["original_filename"] == "rotate.txt"
+    job_id = resp.json()["file_id"]
+    assert client.get(f"/api/files/{job_id}").json()["status"] == "complete"
+    new_enc = client.get(f"/api/files/{job_id}/download").content
+    new_key = client.get(f"/api/files/{job_id}/download?type=key").content
+    assert len(new_enc) == len(enc) and new_enc != enc
+
+    resp = client.post(
+        "/api/decrypt",
+        files={
+            "encrypted_file": ("rotate.txt.enc", new_enc, "application/octet-stream"),
+            "key_file": ("rotate.txt.key", new_key, "application/octet-stream"),
+        },
+        data={"password": "rotated-pass"},
+    )
+    dec_id = resp.json()["file_id"]
+    assert client.get(f"/api/files/{dec_id}/download").content == PLAINTEXT
+
+
+def test_rewrap_rejects_non_container(client):
+    resp = client.post(
+        "/api/rewrap",
+        files={
+            "encrypted_file": ("x.enc", b"plain bytes", "application/octet-stream"),
+            "key_file": ("x.key", b"{}", "application/octet-stream"),
+        },
+    )
+    assert resp.status_code == 422
+
+
+# --- Range reads of decrypted content ---
+
+def test_plaintext_range_on_seekable_encrypt_job(client):
+    resp = client.post(
+        "/api/encrypt",
+        files={"file": ("memo.txt", PLAINTEXT, "text/plain")},
+        data={"password": "pw-123", "seekable": "true"},
+    )
+    file_id = resp.json()["file_id"]
+
+    part = client.get(f"/api/files/{file_id}/plaintext", headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206
+    assert part.content == PLAINTEXT[100:200]
+    assert part.headers["content-range"] == f"bytes 100-199/{len(PLAINTEXT)}"
+
+    tail = client.get(f"/api/files/{file_id}/plaintext", headers={"Range": "bytes=-50"})
+    assert tail.status_code == 206 and tail.content == PLAINTEXT[-50:]
+
+    whole = client.get(f"/api/files/{file_id}/plaintext")
+    assert whole.status_code == 200 and whole.content == PLAINTEXT
+
+    beyond = client.get(f"/api/files/{file_id}/plaintext", headers={"Range": "bytes=999999-"})
+    assert beyond.status_code == 416
+    assert beyond.headers["content-range"] == f"bytes */{len(PLAINTEXT)}"
+
+
+def test_plaintext_range_on_regular_encrypt_job(client):
+    file_id = _encrypt(client)
+    part = client.get(f"/api/files/{file_id}/plaintext", headers={"Range": "bytes=10-19"})
+    assert part.status_code == 206
+    assert part.content == PLAINTEXT[10:20]
+
+
+# --- Streaming decrypt ---
+
+@pytest.mark.parametrize("seekable", ["false", "true"])
+def test_decrypt_stream_writes_nothing(client, tmp_path, monkeypatch, seekable):
+    from config.settings import Settings as CryptoSettings
+    monkeypatch.setattr(CryptoSettings, "SEGMENT_SIZE", 1000)
+    resp = client.post(
+        "/api/encrypt",
+        files={"file": ("memo.txt", PLAINTEXT, "text/plain")},
+        data={"password": "pw-123", "seekable": seekable},
+    )
+    file_id = resp.json()["file_id"]
+    enc = client.get(f"/api/files/{file_id}/download?type=encrypted").content
+    key = client.get(f"/api/files/{file_id}/download?type=key").content
+    before = sorted(p.name for p in (tmp_path / "files").iterdir())
+
+    out = client.post(
+        "/api/decrypt/stream",
+        files={
+            "encrypted_file": ("memo.txt.enc", enc, "application/octet-stream"),
+            "key_file": ("memo.txt.key", key, "application/octet-stream"),
+        },
+    )
+    assert out.status_code == 200
+    assert out.content == PLAINTEXT
+    assert "memo.txt" in out.headers["content-disposition"]
+    assert sorted(p.name for p in (tmp_path / "files").iterdir()) == before
+
+    tampered = bytearray(enc)
+    tampered[-100] ^= 0x01
+    bad = client.post(
+        "/api/decrypt/stream",
+        files={
+            "encrypted_file": ("memo.txt.enc", bytes(tampered), "application/octet-stream"),
+            "key_file": ("memo.txt.key", key, "application/octet-stream"),
+        },
+    )
+    assert bad.status_code == 422
+    assert bad.json()["error_code"] == "DECRYPTION_FAILED"
+
+
+def test_decrypt_job_streams_seekable_download(client, tmp_path, monkeypatch):
+    from config.settings import Settings as CryptoSettings
+    monkeypatch.setattr(CryptoSettings, "SEGMENT_SIZE", 1000)
+    resp = client.post(
+        "/api/encrypt",
+        files={"file": ("memo.txt", PLAINTEXT, "text/plain")},
+        data={"password": "pw-123", "seekable": "true"},
+    )
+    file_id = resp.json()["file_id"]
+    enc = client.get(f"/api/files/{file_id}/download?type=encrypted").content
+    key = client.get(f"/api/files/{file_id}/download?type=key").content
+
+    resp = client.post(
+        "/api/decrypt",
+        files={
+            "encrypted_file": ("memo.txt.enc", enc, "application/octet-stream"),
+            "key_file": ("memo.txt.key", key, "application/octet-stream"),
+        },
+    )
+    dec_id = resp.json()["file_id"]
+    assert client.get(f"/api/files/{dec_id}").json()["status"] == "complete"
+    # No plaintext at rest: the job keeps the verified container instead
+    assert not list((tmp_path / "files").glob(f"{dec_id}_decrypted*"))
+
+    out = client.get(f"/api/files/{dec_id}/download")
+    assert out.status_code == 200 and out.content == PLAINTEXT
+    assert out.headers["content-length"] == str(len(PLAINTEXT))
+    assert "memo.txt" in out.headers["content-disposition"]
+    # Downloads can repeat: the container is the result, not a source to shred
+    shred_queue.shutdown()
+    # The password-free bundle is owner-only; the uploaded key went through the shredder
+    stream_key = tmp_path / "files" / f"{dec_id}_stream.key"
+    assert stream_key.stat().st_mode & 0o777 == 0o600
+    assert not (tmp_path / "files" / f"{dec_id}_src.key").exists()
+    assert not list((tmp_path / "files").glob(".shred-*"))
+    assert client.get(f"/api/files/{dec_id}/download").content == PLAINTEXT
+    assert client.get(f"/api/files/{dec_id}/download?type=key").status_code == 404
+
+    part = client.get(f"/api/files/{dec_id}/plaintext", headers={"Range": "bytes=1500-2499"})
+    assert part.status_code == 206 and part.content == PLAINTEXT[1500:2500]
+
+
+# --- Encrypt while uploading ---
+
+def test_encrypt_stream_upload(client, tmp_path, monkeypatch):
+    from config.settings import Settings as CryptoSettings
+    monkeypatch.setattr(CryptoSettings, "SEGMENT_SIZE", 1000)
+
+    def body():
+        for i in range(0, len(PLAINTEXT), 700):
+            yield PLAINTEXT[i:i + 700]
+
+    resp = client.post(
+        "/api/encrypt/stream?filename=memo.txt",
+        content=body(),
+        headers={"X-Encryption-Password": "pw-123"},
+    )
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "complete"
+    file_id = resp.json()["file_id"]
+    assert not list((tmp_path / "files").glob(f"{file_id}_src*"))
+
+    part = client.get(f"/api/files/{file_id}/plaintext", headers={"Range": "bytes=1500-2499"})
+    assert part.status_code == 206 and part.content == PLAINTEXT[1500:2500]
+    assert client.get(f"/api/files/{file_id}/plaintext").content == PLAINTEXT
+
+
+def test_encrypt_stream_rejects_oversized_and_unsupported(client, tmp_path):
+    too_big = client.post(
+        "/api/encrypt/stream?filename=memo.txt",
+        content=b"x" * (get_settings().max_file_size_mb * 1024 * 1024 + 1),
+    )
+    assert too_big.status_code == 413
+    assert not list((tmp_path / "files").glob("*_encrypted.enc"))
+
+    unsupported = client.post("/api/encrypt/stream?filename=run.exe", content=b"MZ")
+    assert unsupported.status_code == 415
+
+
+def test_encrypt_stream_sniffs_type_from_content(client, tmp_path):
+    pdf = b"%PDF-1.7\n" + PLAINTEXT * 5
+
+    def body():
+        for i in range(0, len(pdf), 700):
+            yield pdf[i:i + 700]
+
+    # No usable extension: engine setup waits for the head, then the signature decides
+    resp = client.post("/api/encrypt/stream?filename=scan.bin", content=body())
+    assert resp.status_code == 200
+    assert resp.json()["file_type"] == "pdf"
+    file_id = resp.json()["file_id"]
+    assert client.get(f"/api/files/{file_id}/plaintext").content == pdf
+
+    # A signature overrides a misleading extension
+    resp = client.post("/api/encrypt/stream?filename=scan.txt", content=pdf[:100])
+    assert resp.status_code == 200 and resp.json()["file_type"] == "pdf"
+
+
+# --- Synchronous fast path ---
+
+def _multipart_parts(resp):
+    boundary = resp.headers["content-type"].split("boundary=")[1].encode()
+    parts = {}
+    for chunk in resp.content.split(b"--" + boundary)[1:-1]:
+        head, _, body = chunk.partition(b"\r\n\r\n")
+        name = head.split(b'name="')[1].split(b'"')[0].decode()
+        parts[name] = body[:-2]
+    return parts
+
+
+def test_sync_mode_roundtrip_without_jobs(client, tmp_path):
+    resp = client.post(
+        "/api/encrypt?mode=sync",
+        files={"file": ("memo.txt", PLAINTEXT, "text/plain")},
+        data={"password": "pw-123"},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("multipart/mixed")
+    parts = _multipart_parts(resp)
+
+    out = client.post(
+        "/api/decrypt?mode=sync",
+        files={
+            "encrypted_file": ("memo.txt.enc", parts["encrypted_file"], "application/octet-stream"),
+            "key_file": ("memo.txt.key", parts["key_file"], "application/octet-stream"),
+        },
+    )
+    assert out.status_code == 200
+    assert out.content == PLAINTEXT
+    files_dir = tmp_path / "files"
+    assert not files_dir.exists() or not list(files_dir.iterdir())
+
+
+def test_sync_mode_encrypt_failure_is_structured(client, monkeypatch):
+    from app.api.routes import encrypt
+
+    def broken(*args):
+        raise RuntimeError("engine failure")
+
+    monkeypatch.setattr(encrypt, "_encrypt_inline", broken)
+    resp = client.post(
+        "/api/encrypt?mode=sync",
+        files={"file": ("memo.txt", PLAINTEXT, "text/plain")},
+        data={"password": "pw-123"},
+    )
+    assert resp.status_code == 500
+    assert resp.json()["error_code"] == "PROCESSING_FAILED"
+
+
+def test_sync_mode_size_limits(client, monkeypatch):
+    monkeypatch.setenv("SYNC_MAX_FILE_SIZE_KB", "1")
+    get_settings.cache_clear()
+    files = {"file": ("memo.txt", PLAINTEXT, "text/plain")}
+
+    resp = client.post("/api/encrypt?mode=sync", files=files, data={"password": "pw-123"})
+    assert resp.status_code == 413
+    assert resp.json()["error_code"] == "FILE_TOO_LARGE_FOR_SYNC"
+
+    # auto falls back to the job flow above the threshold
+    resp = client.post("/api/encrypt?mode=auto", files=files, data={"password": "pw-123"})
+    assert resp.status_code == 202
+
+
+# --- Long-polling job status ---
+
+def test_status_long_poll_returns_on_change(client):
+    import threading
+    from app.services.file_service import file_service
+
+    file_service.register("poll-job", {
+        "file_id": "poll-job", "status": "processing", "job_type": "encrypt",
+        "original_filename": "memo.txt", "file_type": "text",
+        "expires_at": "2099-01-01T00:00:00Z", "error": None, "result_paths": {},
+    })
+    try:
+        timer = threading.Timer(0.2, file_service.update_status, ("poll-job", "failed"))
+        timer.start()
+        resp = client.get("/api/files/poll-job?wait=5")
+        timer.join()
+        assert resp.status_code == 200
+        assert resp.json()["status"] == "failed"
+    finally:
+        file_service.delete("poll-job")
+
+
+# --- Startup recovery ---
+
+def test_startup_shreds_files_left_by_a_crash(tmp_path, monkeypatch, clear_settings_cache):
+    files = tmp_path / "files"
+    files.mkdir()
+    leftover = files / ".shred-5f2c9e"
+    leftover.write_bytes(PLAINTEXT)
+    monkeypatch.setenv("TEMP_DIR", str(tmp_path))
+    get_settings.cache_clear()
+    from app.main import app
+    with TestClient(app):
+        pass
+    # Shutdown drains the shred queue, so the leftover is gone by now
+    assert not leftover.exists()
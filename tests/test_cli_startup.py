@@ -0,0 +1,67 @@
+"""
+CLI startup budget: `main.py --help` must not pull in the crypto stack.
+
+Scripted callers run the CLI thousands of times, so interpreter startup plus
+module imports dominate the cost of small files. The engines, KeyManager and
+the cryptography backend are imported lazily by the subcommand that uses them.
+"""
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MAIN = ROOT / "main.py"
+
+# Modules imported by main.py itself (after interpreter/site startup)
+IMPORT_BUDGET_MODULES = 40
+IMPORT_BUDGET_US = 100_000
+FORBIDDEN_PREFIXES = ("cryptography", "core", "algorithms", "security", "utils")
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _main_imports(*argv):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", str(MAIN), *argv],
+        capture_output=True, text=True, cwd=ROOT, timeout=60,
+    )
+    entries, after_site = [], False
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        if name == "site" and len(indent) == 1:
+            after_site = True
+            continue
+        if after_site:
+            entries.append((name, int(self_us)))
+    return proc, entries
+
+
+def test_help_skips_crypto_imports():
+    proc, entries = _main_imports("--help")
+    assert proc.returncode == 0
+    names = [name for name, _ in entries]
+    leaked = [n for n in names if n.split(".")[0] in FORBIDDEN_PREFIXES]
+    assert not leaked, f"--help imported {leaked}"
+    assert len(names) <= IMPORT_BUDGET_MODULES
+    assert sum(us for _, us in entries) <= IMPORT_BUDGET_US
+
+
+def test_system_defers_directory_creation(tmp_path, monkeypatch):
+    sys.path.insert(0, str(ROOT))
+    try:
+        import main
+    finally:
+        sys.path.remove(str(ROOT))
+    for attr in ("ENCRYPTED_DIR", "DECRYPTED_DIR", "KEYS_DIR", "LOGS_DIR"):
+        monkeypatch.setattr(main.Settings, attr, tmp_path / attr.lower())
+
+    system = main.DocumentEncryptionSystem()
+    assert not any(tmp_path.iterdir())
+    assert system._key_manager is None
+
+    system._ensure_directory(main.Settings.KEYS_DIR)
+    assert (tmp_path / "keys_dir").is_dir()
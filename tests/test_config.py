@@ -59,6 +59,12 @@ class TestCFG02FailFastValidation:
         with pytest.raises(ValidationError):
             Settings()
 
+    def test_dedup_refused_with_shared_registry(self, monkeypatch):
+        monkeypatch.setenv("DEDUP_ENABLED", "true")
+        monkeypatch.setenv("JOB_REGISTRY", "sqlite")
+        with pytest.raises(ValidationError):
+            Settings()
+
 
 class TestCFG03CryptoSettingsUntouched:
     """CFG-03: Existing crypto constants in config/settings.py remain separate and untouched."""
@@ -0,0 +1,62 @@
+"""
+Tests for magic-byte content sniffing and the extension index.
+"""
+import codecs
+import io
+import zipfile
+
+from config.settings import Settings
+from utils import ContentSniffer, Validator
+
+OLE2 = b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1" + b"\x00" * 504
+
+
+def _ooxml(main_part):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", "<Types/>" * 50)
+        zf.writestr("_rels/.rels", "<Relationships/>")
+        zf.writestr(main_part, "<document/>" * 100)
+    return buf.getvalue()
+
+
+def test_extension_index():
+    assert Settings.get_format_by_extension(".DOCX") == "word"
+    assert Settings.get_format_by_extension("xlsb") == "excel"
+    assert Settings.get_format_by_extension(".exe") == "unknown"
+    assert len(Settings.EXTENSION_FORMATS) == len(Settings.get_supported_extensions())
+
+
+def test_detect_signatures():
+    assert ContentSniffer.detect(b"%PDF-1.4\n") == "pdf"
+    assert ContentSniffer.detect(OLE2) == "ole2"
+    assert ContentSniffer.detect(_ooxml("word/document.xml")) == "ooxml-word"
+    assert ContentSniffer.detect(_ooxml("xl/workbook.xml")) == "ooxml-excel"
+    assert ContentSniffer.detect(_ooxml("misc/data.bin")) == "zip"
+    assert ContentSniffer.detect(b"\x00\x01\x02\xff") == "unknown"
+    assert ContentSniffer.detect(b"") == "unknown"
+
+
+def test_text_encodings():
+    assert ContentSniffer.text_encoding(codecs.BOM_UTF16_LE + "текст".encode("utf-16-le")) == "utf-16"
+    assert ContentSniffer.text_encoding(codecs.BOM_UTF32_LE + b"a\x00\x00\x00") == "utf-32"
+    # Multibyte character cut off at the end of the head is still text
+    assert ContentSniffer.text_encoding("документ".encode("utf-8")[:-1]) == "utf-8"
+    assert ContentSniffer.text_encoding(b"\x80abc") is None
+    assert ContentSniffer.detect("notes, заметки\n".encode("utf-8")) == "text"
+
+
+def test_file_type_combines_content_and_extension():
+    assert ContentSniffer.file_type(b"%PDF-1.7", ".txt") == "pdf"
+    assert ContentSniffer.file_type(_ooxml("xl/workbook.xml"), ".bin") == "excel"
+    # OLE2 is shared by .doc and .xls: the extension picks the format
+    assert ContentSniffer.file_type(OLE2, ".xls") == "excel"
+    assert ContentSniffer.file_type(OLE2, ".doc") == "word"
+    assert ContentSniffer.file_type(OLE2, ".txt") == "unknown"
+    # Text and unrecognised content keep the extension's verdict
+    assert ContentSniffer.file_type(b"plain", ".md") == "text"
+    assert ContentSniffer.file_type(b"plain", ".xyz") == "unknown"
+
+    validator = Validator()
+    assert validator.get_file_type("report.txt") == "text"
+    assert validator.get_file_type("report.txt", b"%PDF-1.7") == "pdf"
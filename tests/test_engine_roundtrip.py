@@ -0,0 +1,365 @@
+"""
+End-to-end EncryptionEngine / DecryptionEngine round trips.
+
+Engine construction costs a PBKDF2 derivation and an RSA-4096 key generation,
+so a single engine is shared per module.
+"""
+import io
+import struct
+import zipfile
+import zlib
+
+import pytest
+
+from config.constants import CryptoConstants
+from core.container_writer import ContainerWriter, container_segments
+from core.decryption_engine import DecryptionEngine
+from core.encryption_engine import EncryptionEngine
+from core.header_parser import parse_container, parse_encrypted_header
+from core.key_manager import KeyManager
+from core.segmented_container import (
+    INDEX_MAC_SIZE, SEGMENT_COMPRESSED, SEGMENT_COUNT, encode_index, parse_segment_index
+)
+from utils.file_handler import FileHandler
+
+
+@pytest.fixture(scope="module")
+def key_manager():
+    return KeyManager()
+
+
+@pytest.fixture(scope="module")
+def engine(key_manager):
+    return EncryptionEngine(password="test-password", key_manager=key_manager)
+
+
+@pytest.fixture(scope="module")
+def decryptor(engine, key_manager):
+    return DecryptionEngine(key_bundle=engine.get_key_bundle(), key_manager=key_manager)
+
+
+@pytest.fixture
+def plaintext():
+    return b"quarterly report line\n" * 400
+
+
+# --- In-memory bytes ---
+
+def test_roundtrip_bytes(engine, decryptor, plaintext):
+    container = engine.encrypt(plaintext, "text", "report.txt")
+    result = decryptor.decrypt(container)
+    assert result["data"] == plaintext
+    assert result["original_filename"] == "report.txt"
+
+
+def test_tampered_ciphertext_rejected(engine, decryptor, plaintext):
+    container = bytearray(engine.encrypt(plaintext, "text", "report.txt"))
+    container[-100] ^= 0x01
+    with pytest.raises(ValueError):
+        decryptor.decrypt(bytes(container))
+
+
+# --- mmap-backed input ---
+
+def test_open_buffer_maps_large_files(tmp_path):
+    path = tmp_path / "in.bin"
+    path.write_bytes(b"x" * 32)
+    with FileHandler.open_buffer(str(path), mmap_threshold=16) as buf:
+        assert isinstance(buf, memoryview)
+        assert buf.readonly
+        assert buf[:4] == b"xxxx"
+    with FileHandler.open_buffer(str(path), mmap_threshold=64) as buf:
+        assert isinstance(buf, bytes)
+
+
+def test_roundtrip_through_mmap(engine, decryptor, plaintext, tmp_path):
+    src = tmp_path / "report.txt"
+    src.write_bytes(plaintext)
+    with FileHandler.open_buffer(str(src), mmap_threshold=1) as data:
+        container = engine.encrypt(data, "text", "report.txt")
+
+    enc = tmp_path / "report.enc"
+    enc.write_bytes(container)
+    with FileHandler.open_buffer(str(enc), mmap_threshold=1) as data:
+        result = decryptor.decrypt(data)
+    assert result["data"] == plaintext
+
+
+# --- Shared container parser ---
+
+def test_parse_container_slices_without_copy(engine, plaintext):
+    container = engine.encrypt(plaintext, "text", "report.txt")
+    parsed = parse_container(container)
+    assert isinstance(parsed.encrypted_data, memoryview)
+    assert parsed.encrypted_data.obj is container
+    assert parsed.filename == "report.txt"
+    assert parsed.original_size == len(plaintext)
+    assert len(parsed.hmac_signature) == 64
+
+
+def test_parse_header_matches_container(engine, plaintext):
+    container = engine.encrypt(plaintext, "text", "report.txt")
+    header = parse_encrypted_header(container)
+    assert header["original_filename"] == "report.txt"
+    # The embedded key fingerprint changes the layout, so it raises the minor version
+    assert header["format_version"] == "1.1.0"
+    assert header["flags"] == parse_container(container).flags
+
+
+def test_layout_flags_require_matching_version(engine, plaintext):
+    container = bytearray(engine.encrypt(plaintext, "text", "report.txt"))
+    assert container[6:8] == b"\x01\x01"
+    # A 1.0 header cannot carry the fingerprint field: refuse instead of misparsing
+    container[6:8] = b"\x01\x00"
+    with pytest.raises(ValueError, match="format version"):
+        parse_container(bytes(container))
+    container[6:8] = b"\x01\x7f"
+    with pytest.raises(ValueError, match="Unsupported container format version"):
+        parse_encrypted_header(bytes(container))
+
+
+def test_truncated_container_rejected(engine, decryptor, plaintext):
+    container = engine.encrypt(plaintext, "text", "report.txt")
+    with pytest.raises(struct.error):
+        parse_container(container[:200])
+    with pytest.raises(ValueError):
+        decryptor.decrypt(container[:200])
+
+
+# --- Direct-to-sink container writer ---
+
+def test_encrypt_to_file_roundtrip(engine, decryptor, plaintext, tmp_path):
+    out = tmp_path / "nested" / "report.enc"
+    written = engine.encrypt_to(plaintext, "text", "report.txt", str(out))
+    assert written == out.stat().st_size
+    assert decryptor.decrypt(out.read_bytes())["data"] == plaintext
+
+
+def test_streaming_writer_back_patches_length():
+    fields = dict(
+        flags=0b1111, timestamp=1700000000, file_type="text", filename="a.txt",
+        original_size=10, compressed_size=9, salt=b"s" * 32, aes_tag=b"t" * 16,
+        encrypted_keys=b"k" * 512,
+    )
+    expected = b"".join(container_segments(
+        encrypted_data=b"C" * 100, hmac_signature=b"H" * 64, **fields
+    ))
+
+    sink = io.BytesIO()
+    writer = ContainerWriter(sink)
+    writer.begin(**fields)
+    writer.write_data(b"C" * 60)
+    writer.write_data(memoryview(b"C" * 40))
+    assert writer.finish(b"H" * 64) == len(expected)
+    assert sink.getvalue() == expected
+    assert parse_container(sink.getvalue()).encrypted_data == b"C" * 100
+
+
+# --- Key-bundle fingerprint verification ---
+
+def test_fingerprint_mode_skips_rsa_private_key(engine, key_manager, plaintext):
+    container = engine.encrypt(plaintext, "text", "report.txt")
+    assert parse_container(container).flags["key_fingerprint"]
+
+    bundle = dict(engine.get_key_bundle(), rsa_private_key=b"not a key")
+    decryptor = DecryptionEngine(key_bundle=bundle, key_manager=key_manager)
+    assert decryptor.decrypt(container)["data"] == plaintext
+    with pytest.raises(ValueError):
+        DecryptionEngine(bundle, key_manager, strict_keys=True).decrypt(container)
+
+
+def test_fingerprint_rejects_mismatched_bundle(engine, key_manager, plaintext):
+    container = engine.encrypt(plaintext, "text", "report.txt")
+    bundle = dict(engine.get_key_bundle(), chacha_key=b"\x00" * 32)
+    with pytest.raises(ValueError, match="Отпечаток"):
+        DecryptionEngine(bundle, key_manager).decrypt(container)
+
+
+def test_legacy_container_uses_rsa_verification(engine, decryptor, plaintext, monkeypatch):
+    monkeypatch.setattr(engine.settings, "EMBED_KEY_FINGERPRINT", False)
+    container = engine.encrypt(plaintext, "text", "report.txt")
+    parsed = parse_container(container)
+    assert not parsed.flags["key_fingerprint"] and parsed.key_fingerprint == b""
+    assert decryptor.decrypt(container)["data"] == plaintext
+
+
+# --- Seekable (segmented) containers ---
+
+@pytest.fixture
+def small_segments(monkeypatch):
+    from config.settings import Settings
+    monkeypatch.setattr(Settings, "SEGMENT_SIZE", 1000)
+
+
+def test_seekable_roundtrip_and_ranges(engine, decryptor, plaintext, small_segments):
+    container = engine.encrypt(plaintext, "text", "report.txt", seekable=True)
+    assert parse_encrypted_header(container)["flags"]["segmented"]
+    assert decryptor.decrypt(container)["data"] == plaintext
+
+    for offset, length in [(0, 10), (995, 10), (3000, 1000), (8790, 100), (0, None), (50, 0)]:
+        expected = plaintext[offset:] if length is None else plaintext[offset:offset + length]
+        assert decryptor.decrypt_range(container, offset, length) == expected
+    assert decryptor.decrypt_range(container, len(plaintext) + 5, 10) == b""
+
+
+def test_segmented_flag_requires_matching_version(engine, plaintext, small_segments):
+    container = bytearray(engine.encrypt(plaintext, "text", "report.txt", seekable=True))
+    container[6:8] = b"\x01\x00"
+    with pytest.raises(ValueError, match="format version"):
+        parse_container(bytes(container))
+    # The segmented layout alone requires 1.2, even without the trailing index flag
+    flags = struct.unpack_from("<I", container, 8)[0] & ~CryptoConstants.FLAGS["SEGMENT_TRAILER"]
+    struct.pack_into("<I", container, 8, flags)
+    container[6:8] = b"\x01\x01"
+    with pytest.raises(ValueError, match="format version 1.2"):
+        parse_container(bytes(container))
+
+
+def test_seekable_empty_document(engine, decryptor, small_segments):
+    container = engine.encrypt(b"", "text", "empty.txt", seekable=True)
+    assert decryptor.decrypt(container)["data"] == b""
+    assert decryptor.decrypt_range(container, 0, 10) == b""
+
+
+def test_decrypt_range_touches_only_covering_segments(engine, decryptor, plaintext,
+                                                      small_segments, monkeypatch):
+    container = engine.encrypt(plaintext, "text", "report.txt", seekable=True)
+    calls = []
+    original = decryptor._decrypt_segment
+    monkeypatch.setattr(
+        decryptor, "_decrypt_segment",
+        lambda parsed, index, i: calls.append(i) or original(parsed, index, i),
+    )
+    decryptor.decrypt_range(container, 2500, 1000)
+    assert calls == [2, 3]
+
+
+def test_decrypt_range_rejects_tampered_index(engine, decryptor, plaintext, small_segments):
+    container = bytearray(engine.encrypt(plaintext, "text", "report.txt", seekable=True))
+    trailer = len(ContainerWriter.build_trailer(b"\0" * CryptoConstants.HMAC_SIZE))
+    data_end = len(container) - trailer
+    (count,) = SEGMENT_COUNT.unpack_from(container, data_end - SEGMENT_COUNT.size)
+    index_start = data_end - SEGMENT_COUNT.size - INDEX_MAC_SIZE - 8 - count * 9
+    # Flip a bit in the first entry's flags byte (stored/plain lengths stay consistent)
+    container[index_start + 8 + 8] ^= 0x01
+    with pytest.raises(ValueError):
+        decryptor.decrypt_range(bytes(container), 0, 10)
+
+
+def test_decrypt_range_requires_seekable_container(engine, decryptor, plaintext):
+    container = engine.encrypt(plaintext, "text", "report.txt")
+    with pytest.raises(ValueError):
+        decryptor.decrypt_range(container, 0, 10)
+
+
+@pytest.mark.parametrize("step", [1, 999, 1000, 1001, 4096])
+def test_stream_encryptor_matches_input(engine, decryptor, plaintext, small_segments, step):
+    encryptor = engine.stream_encryptor("text", "report.txt")
+    for i in range(0, len(plaintext), step):
+        encryptor.update(plaintext[i:i + step])
+    container = b"".join(container_segments(**encryptor.finish()))
+    assert decryptor.decrypt(container)["data"] == plaintext
+    assert decryptor.decrypt_range(container, 1999, 2) == plaintext[1999:2001]
+
+
+def test_stream_encryptor_writes_segments_as_sealed(engine, decryptor, plaintext, small_segments):
+    sink = io.BytesIO()
+    encryptor = engine.stream_encryptor("text", "report.txt", sink=sink)
+    encryptor.update(plaintext[:5500])
+    # Five segments are already on the sink; nothing is held back for finish()
+    assert len(encryptor._entries) == 5 and encryptor._segments == []
+    assert sink.tell() > sum(entry[0] for entry in encryptor._entries)
+    encryptor.update(plaintext[5500:])
+    assert encryptor.finish() == len(sink.getvalue())
+
+    container = sink.getvalue()
+    header = parse_encrypted_header(container)
+    assert header["format_version"] == "1.2.0" and header["flags"]["segment_trailer"]
+    assert header["original_size"] == len(plaintext)
+    assert decryptor.decrypt(container)["data"] == plaintext
+    assert decryptor.decrypt_range(container, 2999, 1002) == plaintext[2999:4001]
+
+
+def test_segment_index_parses_leading_and_trailing_layouts():
+    entries = [(3, 1000, 0), (2, 5, SEGMENT_COMPRESSED)]
+    index = encode_index(1000, entries) + b"M" * INDEX_MAC_SIZE
+    leading = parse_segment_index(index + b"abcde")
+    trailing = parse_segment_index(b"abcde" + index + SEGMENT_COUNT.pack(2), trailer=True)
+    assert leading.stored_offsets == [len(index), len(index) + 3, len(index) + 5]
+    assert trailing.stored_offsets == [0, 3, 5]
+    for record in (leading, trailing):
+        assert bytes(record.index_raw) == encode_index(1000, entries)
+        assert record.plain_size == 1005
+    with pytest.raises((ValueError, struct.error)):
+        parse_segment_index(b"abcde" + index + SEGMENT_COUNT.pack(1), trailer=True)
+    with pytest.raises(struct.error):
+        parse_segment_index(b"abcd" + index + SEGMENT_COUNT.pack(2), trailer=True)
+
+
+# --- Office-aware recompression ---
+
+def _docx(paragraphs=3000):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("word/document.xml", "<w:body>" + "".join(
+            f"<w:p><w:r><w:t>Clause {i}: payment due within {i % 90} days</w:t></w:r></w:p>"
+            for i in range(paragraphs)
+        ) + "</w:body>")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def office_recompression(monkeypatch):
+    from config.settings import Settings
+    monkeypatch.setattr(Settings, "OFFICE_RECOMPRESSION", True)
+
+
+def test_office_recompression_is_opt_in(engine, decryptor):
+    document = _docx(50)
+    container = engine.encrypt(document, "word", "contract.docx")
+    assert not parse_encrypted_header(container)["flags"]["office_zip"]
+    assert decryptor.decrypt(container)["data"] == document
+
+
+def test_docx_recompressed_and_restored_byte_identical(engine, decryptor, office_recompression):
+    document = _docx()
+    container = engine.encrypt(document, "word", "contract.docx")
+    header = parse_encrypted_header(container)
+    assert header["flags"]["office_zip"] and header["flags"]["compressed"]
+    # The CRC-checked entry table of the expanded package raises the minor version
+    assert header["format_version"] == "1.3.0"
+    assert header["compressed_size"] < len(document) // 2
+    assert decryptor.decrypt(container)["data"] == document
+
+
+def test_docx_from_other_zlib_build_fails_to_decrypt(engine, decryptor, office_recompression,
+                                                     monkeypatch):
+    from processors import office_zip
+
+    container = engine.encrypt(_docx(), "word", "contract.docx")
+    deflater = office_zip._deflater
+
+    class Foreign:
+        # Same length, different bytes: a deflater that is valid but not this zlib
+        def __init__(self, params):
+            self._inner = deflater(params)
+
+        def compress(self, data):
+            return self._inner.compress(data)
+
+        def flush(self):
+            out = bytearray(self._inner.flush())
+            out[-1] ^= 0xFF
+            return bytes(out)
+
+    monkeypatch.setattr(office_zip, "_deflater", Foreign)
+    with pytest.raises(ValueError, match=zlib.ZLIB_RUNTIME_VERSION):
+        decryptor.decrypt(container)
+
+
+def test_office_recompression_skipped_for_other_types(engine, decryptor, office_recompression):
+    document = _docx(50)
+    container = engine.encrypt(document, "text", "notes.zip")
+    assert not parse_encrypted_header(container)["flags"]["office_zip"]
+    assert decryptor.decrypt(container)["data"] == document
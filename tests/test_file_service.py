@@ -5,11 +5,12 @@ TDD: tests written first (RED), then implementation fills them (GREEN).
 import json
 import tempfile
 import threading
+import tracemalloc
 from pathlib import Path
 
 import pytest
 
-from app.services.file_service import FileService
+from app.services.file_service import FileService, JobRecord
 
 
 @pytest.fixture
@@ -103,14 +104,55 @@ def test_get_returns_none_for_missing(svc):
     assert svc.get("missing") is None
 
 
-def test_get_returns_copy(svc, sample_meta):
-    """get() must return a copy so callers cannot mutate internal state."""
+def test_get_returns_immutable_snapshot(svc, sample_meta):
+    """get() returns a read-only snapshot; callers cannot mutate internal state."""
     svc.register("abc123", sample_meta)
     entry = svc.get("abc123")
-    entry["status"] = "MUTATED"
+    with pytest.raises(TypeError):
+        entry["status"] = "MUTATED"
+    with pytest.raises(AttributeError):
+        entry.status = "MUTATED"
     assert svc.get("abc123")["status"] == "queued"
 
 
+def test_snapshot_unchanged_by_later_updates(svc, sample_meta):
+    svc.register("abc123", sample_meta)
+    before = svc.get("abc123")
+    svc.update_status("abc123", "complete", result_paths={"encrypted_file": "files/out.enc"})
+    assert before["status"] == "queued"
+    assert svc.get("abc123")["status"] == "complete"
+
+
+def test_job_record_round_trips_unknown_keys(sample_meta):
+    record = JobRecord({**sample_meta, "seekable": True})
+    assert record["seekable"] is True
+    assert record.get("cas_key") is None
+    assert "cas_key" not in record
+    assert record.to_dict() == {**sample_meta, "seekable": True}
+    assert json.loads(json.dumps(record.to_dict())) == record.to_dict()
+
+
+def test_job_record_smaller_than_dict(sample_meta):
+    """A slotted record must take less memory than the dict it replaces."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        dicts = [dict(sample_meta, file_id=str(i)) for i in range(1000)]
+        dict_bytes = _allocated_since(before)
+        del dicts
+        before = tracemalloc.take_snapshot()
+        records = [JobRecord(dict(sample_meta, file_id=str(i))) for i in range(1000)]
+        record_bytes = _allocated_since(before)
+        del records
+    finally:
+        tracemalloc.stop()
+    assert record_bytes < dict_bytes
+
+
+def _allocated_since(snapshot) -> int:
+    return sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, "filename"))
+
+
 # --- delete ---
 
 def test_delete_removes_from_memory(svc, sample_meta):
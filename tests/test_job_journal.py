@@ -0,0 +1,116 @@
+"""
+Tests for write-behind job persistence (JOB_WRITE_BEHIND=true).
+"""
+import json
+
+import pytest
+
+from app.services import job_journal
+from app.services.job_journal import JOURNAL_NAME, JournaledFileService
+
+
+@pytest.fixture
+def jobs_dir(tmp_path):
+    return tmp_path / "jobs"
+
+
+@pytest.fixture
+def sample_meta():
+    return {
+        "status": "queued",
+        "job_type": "encrypt",
+        "original_filename": "test.pdf",
+        "file_type": "pdf",
+        "expires_at": "2026-04-12T01:00:00Z",
+        "error": None,
+        "result_paths": {},
+    }
+
+
+def test_updates_are_journaled_not_written_as_sidecars(jobs_dir, sample_meta):
+    svc = JournaledFileService(jobs_dir=jobs_dir, flush_interval=0.01)
+    for i in range(20):
+        svc.register(f"job{i}", sample_meta)
+        svc.update_status(f"job{i}", "processing")
+        svc.update_status(f"job{i}", "complete", result_paths={"encrypted_file": f"files/{i}.enc"})
+    svc.flush()
+
+    assert not list(jobs_dir.glob("*.json"))
+    lines = (jobs_dir / JOURNAL_NAME).read_bytes().splitlines()
+    # Transitions of one job inside a flush window coalesce into one line
+    assert 20 <= len(lines) < 60
+    assert svc.get("job7")["status"] == "complete"
+    svc.close()
+
+
+def test_restore_replays_journal_after_crash(jobs_dir, sample_meta):
+    svc = JournaledFileService(jobs_dir=jobs_dir, flush_interval=0)
+    svc.register("done", sample_meta)
+    svc.update_status("done", "complete", result_paths={"encrypted_file": "files/a.enc"})
+    svc.register("running", sample_meta)
+    svc.update_status("running", "processing")
+    svc.register("gone", sample_meta)
+    svc.delete("gone")
+    svc.flush()
+    # No close(): simulate a crash with only the journal on disk
+    with open(jobs_dir / JOURNAL_NAME, "ab") as fh:
+        fh.write(b'{"id": "torn", "job": {"sta')
+
+    restored = JournaledFileService(jobs_dir=jobs_dir, flush_interval=0)
+    assert restored.restore_from_disk(jobs_dir.parent) == 2
+    assert restored.get("done")["result_paths"] == {"encrypted_file": "files/a.enc"}
+    assert restored.get("running")["status"] == "failed"
+    assert restored.get("gone") is None
+    assert restored.get("torn") is None
+    assert (jobs_dir / JOURNAL_NAME).stat().st_size == 0
+    restored.close()
+
+
+def test_register_is_on_disk_before_it_returns(jobs_dir, sample_meta):
+    # A flush window far longer than the test: only register() itself can write
+    svc = JournaledFileService(jobs_dir=jobs_dir, flush_interval=60)
+    svc.register("abc", sample_meta)
+    svc.update_status("abc", "processing")
+
+    # Crash here: the registration survives, the batched transition does not
+    restored = JournaledFileService(jobs_dir=jobs_dir, flush_interval=0)
+    assert restored.restore_from_disk(jobs_dir.parent) == 1
+    assert restored.get("abc") is not None
+    restored.close()
+
+
+def test_close_checkpoints_into_sidecars(jobs_dir, sample_meta):
+    svc = JournaledFileService(jobs_dir=jobs_dir)
+    svc.register("abc", sample_meta)
+    svc.update_status("abc", "complete")
+    svc.close()
+
+    assert json.loads((jobs_dir / "abc.json").read_text())["status"] == "complete"
+    assert (jobs_dir / JOURNAL_NAME).stat().st_size == 0
+
+
+def test_checkpoint_when_journal_grows(jobs_dir, sample_meta):
+    svc = JournaledFileService(jobs_dir=jobs_dir, flush_interval=0, checkpoint_bytes=1)
+    svc.register("abc", sample_meta)
+    svc.flush()
+    assert (jobs_dir / "abc.json").exists()
+    svc.delete("abc")
+    svc.flush()
+    assert not (jobs_dir / "abc.json").exists()
+    svc.close()
+
+
+@pytest.mark.parametrize("policy, expect_fsync", [("batch", True), ("never", False)])
+def test_fsync_policy(jobs_dir, sample_meta, monkeypatch, policy, expect_fsync):
+    calls = []
+    monkeypatch.setattr(job_journal.os, "fsync", calls.append)
+    svc = JournaledFileService(jobs_dir=jobs_dir, fsync=policy, flush_interval=0)
+    svc.register("abc", sample_meta)
+    svc.flush()
+    assert bool(calls) is expect_fsync
+    svc.close()
+
+
+def test_unknown_fsync_policy_rejected(jobs_dir):
+    with pytest.raises(ValueError):
+        JournaledFileService(jobs_dir=jobs_dir, fsync="sometimes")
@@ -0,0 +1,123 @@
+"""
+Tests for the SQLite-backed cross-process job registry (JOB_REGISTRY=sqlite).
+"""
+import json
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.services.job_registry import SQLiteFileService
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def jobs_dir(tmp_path):
+    return tmp_path / "jobs"
+
+
+@pytest.fixture
+def sample_meta():
+    return {
+        "status": "queued",
+        "job_type": "encrypt",
+        "original_filename": "test.pdf",
+        "file_type": "pdf",
+        "expires_at": "2026-04-12T01:00:00Z",
+        "error": None,
+        "result_paths": {},
+    }
+
+
+def _run_in_other_process(jobs_dir: Path, code: str) -> None:
+    script = (
+        "from pathlib import Path\n"
+        "from app.services.job_registry import SQLiteFileService\n"
+        f"svc = SQLiteFileService(jobs_dir=Path({str(jobs_dir)!r}))\n" + code
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True)
+
+
+def test_basic_operations(jobs_dir, sample_meta):
+    svc = SQLiteFileService(jobs_dir=jobs_dir)
+    svc.register("a1", sample_meta)
+    svc.update_status("a1", "complete", result_paths={"encrypted_file": "files/a1.enc"})
+    entry = svc.get("a1")
+    assert entry["status"] == "complete"
+    assert entry["result_paths"] == {"encrypted_file": "files/a1.enc"}
+    assert entry["original_filename"] == "test.pdf"
+    assert svc.all_ids() == ["a1"]
+
+    svc.update_status("missing", "processing")
+    assert svc.get("missing") is None
+
+    svc.delete("a1")
+    assert svc.get("a1") is None and svc.all_ids() == []
+
+
+def test_jobs_are_shared_between_processes(jobs_dir, sample_meta):
+    svc = SQLiteFileService(jobs_dir=jobs_dir)
+    svc.register("a1", sample_meta)
+    token = svc.change_token()
+
+    _run_in_other_process(jobs_dir, (
+        "svc.update_status('a1', 'complete', result_paths={'key_file': 'files/a1.key'})\n"
+        f"svc.register('b2', {sample_meta!r})\n"
+    ))
+
+    assert svc.change_token() != token
+    assert svc.get("a1")["status"] == "complete"
+    assert svc.get("a1")["result_paths"] == {"key_file": "files/a1.key"}
+    assert set(svc.all_ids()) == {"a1", "b2"}
+
+
+def test_concurrent_updates_keep_all_fields(jobs_dir, sample_meta):
+    svc = SQLiteFileService(jobs_dir=jobs_dir)
+    svc.register("a1", sample_meta)
+
+    def update(i):
+        svc.update_status("a1", "processing", **{f"field{i}": i})
+
+    threads = [threading.Thread(target=update, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    entry = svc.get("a1")
+    assert all(entry[f"field{i}"] == i for i in range(16))
+
+
+def test_restore_fails_only_orphaned_unfinished_jobs(jobs_dir, sample_meta):
+    svc = SQLiteFileService(jobs_dir=jobs_dir)
+    svc.register("live", {**sample_meta, "status": "processing"})
+    svc.register("live-queued", sample_meta)
+    _run_in_other_process(
+        jobs_dir,
+        f"svc.register('orphan', {{**{sample_meta!r}, 'status': 'processing'}})\n"
+        f"svc.register('orphan-queued', {sample_meta!r})\n"
+        f"svc.register('done', {{**{sample_meta!r}, 'status': 'complete'}})\n",
+    )
+
+    restarted = SQLiteFileService(jobs_dir=jobs_dir)
+    assert restarted.restore_from_disk(jobs_dir.parent) == 5
+    assert restarted.get("live")["status"] == "processing"
+    assert restarted.get("live-queued")["status"] == "queued"
+    assert restarted.get("done")["status"] == "complete"
+    for file_id in ("orphan", "orphan-queued"):
+        orphan = restarted.get(file_id)
+        assert orphan["status"] == "failed" and "restart" in orphan["error"].lower()
+
+
+def test_restore_imports_legacy_sidecars(jobs_dir, sample_meta):
+    jobs_dir.mkdir(parents=True)
+    (jobs_dir / "old1.json").write_text(json.dumps({**sample_meta, "status": "processing"}))
+    (jobs_dir / "bad.json").write_text("NOT JSON")
+
+    svc = SQLiteFileService(jobs_dir=jobs_dir)
+    assert svc.restore_from_disk(jobs_dir.parent) == 1
+    assert svc.get("old1")["status"] == "failed"
+    assert not list(jobs_dir.glob("*.json"))
@@ -0,0 +1,102 @@
+"""
+Binary key-bundle format and backward-compatible loading of JSON bundles.
+"""
+import json
+
+import pytest
+
+from core.key_bundle_format import (
+    KEY_BUNDLE_MAGIC, PREAMBLE, PROTECTION, decode_records, encode_records, is_binary_bundle,
+    pem_to_der,
+)
+from core.key_manager import KeyManager
+
+
+@pytest.fixture(scope="module")
+def key_manager():
+    return KeyManager()
+
+
+@pytest.fixture(scope="module")
+def bundle(key_manager):
+    public_key, private_key = key_manager.generate_rsa_keypair(key_size=2048)
+    return {
+        "master_key": b"m" * 32,
+        "aes_key": b"a" * 32,
+        "chacha_key": b"c" * 32,
+        "hmac_key": b"h" * 64,
+        "salt": b"s" * 32,
+        "aes_iv": b"i" * 16,
+        "chacha_nonce": b"n" * 12,
+        "rsa_private_key": key_manager.serialize_private_key(private_key),
+        "rsa_public_key": key_manager.serialize_public_key(public_key),
+        "version": "1.0.0",
+    }
+
+
+def _same_keys(key_manager, loaded, bundle):
+    for name in ("rsa_private_key", "rsa_public_key"):
+        assert loaded[name] == pem_to_der(bundle[name])
+    original = key_manager.deserialize_public_key(bundle["rsa_public_key"])
+    restored = key_manager.deserialize_public_key(loaded["rsa_public_key"])
+    assert original.public_numbers() == restored.public_numbers()
+    key_manager.deserialize_private_key(loaded["rsa_private_key"])
+
+
+def test_binary_roundtrip(key_manager, bundle, tmp_path):
+    path = tmp_path / "bundle.key"
+    key_manager.save_key_bundle(bundle, str(path))
+    raw = path.read_bytes()
+    assert raw.startswith(KEY_BUNDLE_MAGIC)
+
+    loaded = key_manager.load_key_bundle(str(path))
+    assert loaded["aes_key"] == bundle["aes_key"]
+    assert loaded["version"] == "1.0.0"
+    _same_keys(key_manager, loaded, bundle)
+
+
+def test_binary_protected_roundtrip(key_manager, bundle, tmp_path):
+    path = tmp_path / "bundle.key"
+    key_manager.save_key_bundle(bundle, str(path), password="bundle-pass")
+    assert b"a" * 32 not in path.read_bytes()
+
+    loaded = key_manager.load_key_bundle(str(path), "bundle-pass")
+    assert loaded["hmac_key"] == bundle["hmac_key"]
+    with pytest.raises(ValueError):
+        key_manager.load_key_bundle(str(path))
+    with pytest.raises(ValueError):
+        key_manager.load_key_bundle(str(path), "wrong-pass")
+
+
+def test_protected_bundle_iteration_count_is_bounded(key_manager, bundle):
+    raw = bytearray(key_manager.serialize_key_bundle(bundle, "bundle-pass"))
+    _, salt_len = PROTECTION.unpack_from(raw, PREAMBLE.size)
+    # A crafted file asking for 2^32 - 1 PBKDF2 iterations is refused before deriving
+    PROTECTION.pack_into(raw, PREAMBLE.size, 0xFFFFFFFF, salt_len)
+    with pytest.raises(ValueError, match="PBKDF2"):
+        key_manager.parse_key_bundle(bytes(raw), "bundle-pass")
+
+
+@pytest.mark.parametrize("password", [None, "bundle-pass"])
+def test_json_bundles_still_load(key_manager, bundle, tmp_path, password):
+    path = tmp_path / "legacy.key"
+    key_manager.save_key_bundle(bundle, str(path), password=password, bundle_format="json")
+    json.loads(path.read_text())
+
+    loaded = key_manager.load_key_bundle(str(path), password)
+    assert loaded["rsa_private_key"] == bundle["rsa_private_key"]
+    assert loaded["chacha_nonce"] == bundle["chacha_nonce"]
+
+
+def test_records_skip_unknown_tags_and_keep_extras():
+    records = encode_records({"aes_key": b"k" * 32, "label": "finance"})
+    records += bytes([0x7F]) + (3).to_bytes(4, "little") + b"new"
+    decoded = decode_records(records)
+    assert decoded == {"aes_key": b"k" * 32, "label": "finance"}
+
+
+def test_truncated_binary_bundle_rejected(key_manager, bundle):
+    raw = key_manager.serialize_key_bundle(bundle)
+    assert is_binary_bundle(raw)
+    with pytest.raises(ValueError):
+        key_manager.parse_key_bundle(raw[:-3])
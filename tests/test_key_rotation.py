@@ -0,0 +1,160 @@
+"""
+Envelope key rotation: re-wrapping encrypted_keys without touching the payload.
+"""
+import pytest
+
+from core.decryption_engine import DecryptionEngine
+from core.encryption_engine import EncryptionEngine
+from core.header_parser import parse_container
+from core.key_manager import KeyManager
+from core.key_rotation import KeyRotator, rewrap_directory
+
+PLAINTEXT = b"archived ledger entry\n" * 300
+
+
+@pytest.fixture(scope="module")
+def key_manager():
+    return KeyManager()
+
+
+@pytest.fixture(scope="module")
+def engine(key_manager):
+    return EncryptionEngine(password="rotation-test", key_manager=key_manager)
+
+
+@pytest.fixture(scope="module")
+def new_keypair(key_manager):
+    return key_manager.generate_rsa_keypair(key_size=4096)
+
+
+@pytest.fixture
+def container(engine, tmp_path):
+    path = tmp_path / "ledger.enc"
+    engine.encrypt_to(PLAINTEXT, "text", "ledger.txt", str(path))
+    return path
+
+
+def _strict_decrypt(bundle, key_manager, data):
+    return DecryptionEngine(bundle, key_manager, strict_keys=True).decrypt(data)["data"]
+
+
+def test_rewrap_patches_in_place(engine, key_manager, new_keypair, container):
+    before = container.read_bytes()
+    rotator = KeyRotator(engine.get_key_bundle(), key_manager, new_keypair=new_keypair)
+    result = rotator.rewrap_file(str(container))
+    after = container.read_bytes()
+
+    assert result["patched"]
+    old, new = parse_container(before), parse_container(after)
+    assert old.encrypted_keys != new.encrypted_keys
+    assert bytes(old.encrypted_data) == bytes(new.encrypted_data)
+    assert old.hmac_signature == new.hmac_signature
+
+    assert _strict_decrypt(rotator.new_bundle, key_manager, after) == PLAINTEXT
+    with pytest.raises(ValueError):
+        _strict_decrypt(engine.get_key_bundle(), key_manager, after)
+
+
+def test_rewrap_with_different_key_size_rewrites_file(engine, key_manager, container, tmp_path):
+    smaller = key_manager.generate_rsa_keypair(key_size=2048)
+    rotator = KeyRotator(engine.get_key_bundle(), key_manager, new_keypair=smaller)
+    out = tmp_path / "rotated.enc"
+    result = rotator.rewrap_file(str(container), str(out))
+
+    assert not result["patched"] and result["output_file"] == str(out)
+    assert len(parse_container(out.read_bytes()).encrypted_keys) == 256
+    assert _strict_decrypt(rotator.new_bundle, key_manager, out.read_bytes()) == PLAINTEXT
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_rewrap_rejects_foreign_bundle(key_manager, new_keypair, container):
+    other = EncryptionEngine(password="someone-else", key_manager=key_manager)
+    with pytest.raises(ValueError):
+        KeyRotator(other.get_key_bundle(), key_manager, new_keypair=new_keypair).rewrap_file(str(container))
+
+
+def test_bundle_password_rotation_keeps_container(engine, key_manager, container, tmp_path):
+    before = container.read_bytes()
+    rotator = KeyRotator(engine.get_key_bundle(), key_manager, rotate_rsa=False)
+    rotator.rewrap_file(str(container))
+    key_path = tmp_path / "ledger.key"
+    rotator.save_bundle(str(key_path), "new-bundle-pass")
+
+    assert container.read_bytes() == before
+    bundle = key_manager.load_key_bundle(str(key_path), "new-bundle-pass")
+    assert _strict_decrypt(bundle, key_manager, before) == PLAINTEXT
+
+
+def test_rewrap_directory_shared_bundle(engine, key_manager, new_keypair, tmp_path):
+    archive = tmp_path / "archive"
+    (archive / "nested").mkdir(parents=True)
+    for i, rel in enumerate(["a.enc", "b.enc", "nested/c.enc"]):
+        engine.encrypt_to(PLAINTEXT, "text", f"doc{i}.txt", str(archive / rel))
+    (archive / "notes.txt").write_text("not a container")
+
+    rotator = KeyRotator(engine.get_key_bundle(), key_manager, new_keypair=new_keypair)
+    results = rewrap_directory(str(archive), lambda path: (rotator, None), workers=3)
+
+    assert len(results) == 3
+    assert all(r["status"] == "success" and r["patched"] for r in results)
+    for rel in ["a.enc", "nested/c.enc"]:
+        assert _strict_decrypt(rotator.new_bundle, key_manager, (archive / rel).read_bytes()) == PLAINTEXT
+
+
+def test_shared_rewrap_keeps_keys_when_one_container_fails(engine, key_manager, tmp_path, monkeypatch):
+    from config.settings import Settings
+    from main import DocumentEncryptionSystem
+
+    archive = tmp_path / "archive"
+    archive.mkdir()
+    for name in ("a.enc", "b.enc", "c.enc"):
+        engine.encrypt_to(PLAINTEXT, "text", name, str(archive / name))
+    key_file = tmp_path / "shared.key"
+    key_manager.save_key_bundle(engine.get_key_bundle(), str(key_file))
+    old_bundle = key_file.read_bytes()
+
+    rewrap_file = KeyRotator.rewrap_file
+
+    def flaky(self, path, output_path=None):
+        if path.endswith("b.enc"):
+            raise OSError("disk error")
+        return rewrap_file(self, path, output_path)
+
+    monkeypatch.setattr(KeyRotator, "rewrap_file", flaky)
+    monkeypatch.setattr(Settings, "LOGS_DIR", tmp_path / "logs")
+    result = DocumentEncryptionSystem().rewrap_directory(str(archive), key_file=str(key_file), workers=2)
+
+    assert result["status"] == "error" and len(result["failed"]) == 1
+    new_bundle = key_manager.load_key_bundle(str(key_file))
+    for name in ("a.enc", "c.enc"):
+        assert _strict_decrypt(new_bundle, key_manager, (archive / name).read_bytes()) == PLAINTEXT
+    # The container that was not re-wrapped still opens with the preserved old bundle
+    assert result["previous_key_file"] == f"{key_file}.prev"
+    assert (tmp_path / "shared.key.prev").read_bytes() == old_bundle
+    previous = key_manager.load_key_bundle(result["previous_key_file"])
+    assert _strict_decrypt(previous, key_manager, (archive / "b.enc").read_bytes()) == PLAINTEXT
+    assert not list(tmp_path.glob("*.rewrap-new"))
+
+
+def test_keys_dir_rewrap_gives_each_bundle_its_own_rsa_key(engine, key_manager, tmp_path, monkeypatch):
+    from config.settings import Settings
+    from main import DocumentEncryptionSystem
+
+    archive, keys = tmp_path / "archive", tmp_path / "keys"
+    archive.mkdir()
+    keys.mkdir()
+    for name in ("a", "b"):
+        engine.encrypt_to(PLAINTEXT, "text", f"{name}.txt", str(archive / f"{name}.enc"))
+        key_manager.save_key_bundle(engine.get_key_bundle(), str(keys / f"{name}.key"))
+
+    monkeypatch.setattr(Settings, "LOGS_DIR", tmp_path / "logs")
+    system = DocumentEncryptionSystem()
+    result = system.rewrap_directory(str(archive), keys_dir=str(keys), workers=2)
+
+    assert result["status"] == "success"
+    a, b = (key_manager.load_key_bundle(str(keys / f"{name}.key")) for name in ("a", "b"))
+    assert a["rsa_private_key"] != b["rsa_private_key"]
+    for name, bundle in (("a", a), ("b", b)):
+        assert _strict_decrypt(bundle, key_manager, (archive / f"{name}.enc").read_bytes()) == PLAINTEXT
+    # The temporary pool is detached once the directory is done
+    assert system.key_manager.key_pool is None
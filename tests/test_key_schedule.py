@@ -0,0 +1,110 @@
+"""
+Tests for the per-key schedule cache used by CryptoLayerManager.
+"""
+import os
+
+import pytest
+
+from core.crypto_layers import CryptoLayerManager
+from core.key_schedule import KeySchedule, KeyScheduleCache
+
+
+@pytest.fixture
+def cache():
+    return KeyScheduleCache(max_entries=2, max_cached_keystream=4096)
+
+
+def _reference_transform(manager: CryptoLayerManager, data: bytes, key: bytes) -> bytes:
+    """Uncached round loop, equivalent to the original implementation."""
+    result = bytearray(data)
+    sboxes = manager._generate_sboxes(key)
+    perm = manager._generate_permutation_key(key, len(data))
+    for round_num in range(manager.permutation_rounds):
+        result = manager._apply_substitution(result, sboxes, round_num)
+        result = manager._apply_permutation(result, perm, round_num)
+        round_key = manager._derive_round_key(key, round_num, len(result))
+        result = manager._xor_with_key(result, round_key)
+    return bytes(result)
+
+
+# --- Output compatibility ---
+
+@pytest.mark.parametrize("length", [1, 64, 65, 3000, 5000])
+def test_cached_transform_matches_reference(cache, length):
+    manager = CryptoLayerManager(schedule_cache=cache)
+    key, data = os.urandom(32), os.urandom(length)
+    expected = _reference_transform(manager, data, key)
+    assert manager.apply_custom_transformations(data, key) == expected
+    # Second call is served from the cache and must be identical.
+    assert manager.apply_custom_transformations(data, key) == expected
+    assert manager.remove_custom_transformations(expected, key) == data
+
+
+def test_round_keystream_prefix_is_stable():
+    schedule = KeySchedule(b"k" * 32, rounds=2, sbox_count=8, max_cached_keystream=1024)
+    long_stream = schedule.round_keystream(1, 700)
+    assert schedule.round_keystream(1, 100) == long_stream[:100]
+    # Requests beyond the cache bound are generated uncached but agree.
+    assert schedule.round_keystream(1, 2000)[:700] == long_stream
+
+
+# --- LRU and wiping ---
+
+def test_cache_reuses_schedule_for_same_key(cache):
+    with cache.lease(b"a" * 32, 16, 8) as first:
+        pass
+    with cache.lease(b"a" * 32, 16, 8) as second:
+        pass
+    assert first is second
+    assert len(cache) == 1
+
+
+def test_eviction_wipes_schedule(cache):
+    with cache.lease(b"a" * 32, 16, 8) as evicted:
+        pass
+    for key in (b"b" * 32, b"c" * 32):
+        with cache.lease(key, 16, 8):
+            pass
+    assert len(cache) == 2
+    assert all(v == 0 for v in evicted.sboxes[0])
+
+
+def test_eviction_defers_wipe_while_leased(cache):
+    with cache.lease(b"a" * 32, 16, 8) as held:
+        for key in (b"b" * 32, b"c" * 32):
+            with cache.lease(key, 16, 8):
+                pass
+        # Evicted but still in use — tables must stay intact.
+        assert sorted(held.sboxes[0]) == list(range(256))
+    assert all(v == 0 for v in held.sboxes[0])
+
+
+# --- Byte budget ---
+
+def test_byte_budget_evicts_idle_schedules():
+    cache = KeyScheduleCache(max_entries=8, max_cached_keystream=4096, max_bytes=2 * 4096)
+    with cache.lease(b"a" * 32, 2, 8) as first:
+        first.round_keystream(0, 4096)
+        first.round_keystream(1, 4096)
+    assert cache.cached_bytes == 2 * 4096
+
+    with cache.lease(b"b" * 32, 2, 8) as second:
+        stream = second.round_keystream(0, 4096)
+    # The idle schedule made room and was wiped
+    assert all(v == 0 for v in first.sboxes[0])
+    assert len(cache) == 1 and cache.cached_bytes == 4096
+    assert stream == KeySchedule(b"b" * 32, 2, 8).round_keystream(0, 4096)
+
+
+def test_byte_budget_falls_back_to_uncached_when_leased():
+    cache = KeyScheduleCache(max_entries=8, max_cached_keystream=4096, max_bytes=4096)
+    with cache.lease(b"a" * 32, 2, 8) as held:
+        held.round_keystream(0, 4096)
+        with cache.lease(b"b" * 32, 2, 8) as other:
+            # No idle schedule to evict: served uncached, budget untouched
+            stream = other.round_keystream(0, 4096)
+            assert other.cached_bytes == 0
+        assert cache.cached_bytes == 4096
+    assert stream == KeySchedule(b"b" * 32, 2, 8).round_keystream(0, 4096)
+    cache.clear()
+    assert cache.cached_bytes == 0
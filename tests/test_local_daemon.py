@@ -0,0 +1,122 @@
+"""
+serve-local daemon: socket protocol, client fallback signal and RSA key pool.
+"""
+import os
+import socket
+import tempfile
+import threading
+
+import pytest
+
+from core.local_daemon import (
+    DaemonUnavailable, LocalDaemonServer, UntrustedSocket, call, default_socket_path, peer_uid,
+)
+from core.rsa_key_pool import RSAKeyPool
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+
+
+class _FakeSystem:
+    def __init__(self):
+        self.calls = []
+
+    def encrypt_document(self, **kwargs):
+        self.calls.append(("encrypt", kwargs))
+        return {"status": "success", "output_file": kwargs["output_file"]}
+
+    def decrypt_document(self, **kwargs):
+        self.calls.append(("decrypt", kwargs))
+        return {"status": "error", "message": "bad key"}
+
+
+@pytest.fixture
+def socket_path():
+    # AF_UNIX paths are limited to ~108 bytes, so avoid pytest's long tmp_path
+    directory = tempfile.mkdtemp(prefix="docenc-")
+    yield os.path.join(directory, "d.sock")
+    os.rmdir(directory)
+
+
+@pytest.fixture
+def daemon(socket_path):
+    system = _FakeSystem()
+    server = LocalDaemonServer(socket_path, system)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield system
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_requests_are_forwarded_with_absolute_paths(daemon, socket_path):
+    assert oct(os.stat(socket_path).st_mode & 0o777) == "0o600"
+    assert call("ping", {}, socket_path)["status"] == "ok"
+
+    result = call("encrypt", {"input_file": "in.txt", "output_file": "out.enc",
+                              "password": "pw"}, socket_path)
+    assert result == {"status": "success", "output_file": os.path.abspath("out.enc")}
+    command, kwargs = daemon.calls[0]
+    assert command == "encrypt" and kwargs["input_file"] == os.path.abspath("in.txt")
+
+    assert call("decrypt", {"input_file": "x.enc", "key_file": "x.key"}, socket_path)["message"] == "bad key"
+    assert call("bogus", {}, socket_path)["status"] == "error"
+
+
+def test_missing_daemon_raises_unavailable(socket_path):
+    with pytest.raises(DaemonUnavailable):
+        call("ping", {}, socket_path)
+
+
+def test_untrusted_socket_directory_is_refused(daemon, socket_path):
+    directory = os.path.dirname(socket_path)
+    os.chmod(directory, 0o777)
+    try:
+        with pytest.raises(UntrustedSocket):
+            call("encrypt", {"input_file": "in.txt", "password": "pw"}, socket_path)
+    finally:
+        os.chmod(directory, 0o700)
+    assert daemon.calls == []
+
+
+@pytest.mark.skipif(not hasattr(os, "geteuid") or os.geteuid() != 0, reason="needs root to chown")
+def test_socket_owned_by_another_user_is_refused(daemon, socket_path):
+    os.chown(socket_path, 65534, -1)
+    with pytest.raises(UntrustedSocket):
+        call("encrypt", {"input_file": "in.txt", "password": "pw"}, socket_path)
+    assert daemon.calls == []
+
+
+@pytest.mark.skipif(not hasattr(socket, "SO_PEERCRED"), reason="needs SO_PEERCRED")
+def test_peer_uid_and_private_default_path(monkeypatch):
+    left, right = socket.socketpair(socket.AF_UNIX)
+    with left, right:
+        assert peer_uid(left) == os.getuid()
+    monkeypatch.delenv("DOCENC_SOCKET", raising=False)
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    # Fallback lives in a per-user directory, not directly in the shared temp dir
+    assert os.path.dirname(default_socket_path()) != tempfile.gettempdir()
+
+
+def test_stale_socket_is_replaced(socket_path):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    server = LocalDaemonServer(socket_path, _FakeSystem())
+    server.server_close()
+    assert not os.path.exists(socket_path)
+
+
+def test_key_pool_hands_out_each_pair_once():
+    counter = iter(range(1000))
+    pool = RSAKeyPool(lambda size: (size, next(counter)), key_size=512, size=2).start()
+    try:
+        pairs = []
+        while len(pairs) < 3:
+            pair = pool.take(512)
+            if pair is not None:
+                pairs.append(pair)
+        assert len(set(pairs)) == 3
+        assert pool.take(1024) is None
+    finally:
+        pool.stop()
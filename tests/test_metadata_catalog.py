@@ -0,0 +1,67 @@
+"""
+Tests for the SQLite metadata catalog maintained by MetadataManager.
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from storage.metadata_manager import MetadataManager
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _metadata(name, file_type, timestamp, data=b"x"):
+    manager = MetadataManager.__new__(MetadataManager)
+    metadata = manager.create_metadata(
+        {"original_name": name, "file_type": file_type, "original_size": len(data), "original_data": data},
+        {},
+    )
+    metadata["timestamp"] = timestamp
+    return metadata
+
+
+def _populate(manager):
+    manager.save_metadata("a", _metadata("Report-Q1.pdf", "pdf", 100, b"one"))
+    manager.save_metadata("b", _metadata("report-q2.pdf", "pdf", 200, b"two"))
+    manager.save_metadata("c", _metadata("budget.xlsx", "excel", 300, b"three"))
+
+
+def test_query_by_type_date_and_name(tmp_path):
+    manager = MetadataManager(tmp_path)
+    _populate(manager)
+
+    assert [row["file_id"] for row in manager.find(file_type="pdf")] == ["b", "a"]
+    assert [row["file_id"] for row in manager.find(since=150, until=300)] == ["c", "b"]
+    assert [row["file_id"] for row in manager.find(original_name="report%")] == ["b", "a"]
+    assert [row["file_id"] for row in manager.find(limit=1)] == ["c"]
+
+    digest = manager._calculate_hash(b"three")
+    (row,) = manager.find(hash_original=digest)
+    assert row["original_name"] == "budget.xlsx" and row["original_size"] == 5
+
+
+def test_delete_and_overwrite_keep_catalog_in_step(tmp_path):
+    manager = MetadataManager(tmp_path)
+    _populate(manager)
+    manager.delete_metadata("a")
+    manager.save_metadata("b", _metadata("renamed.txt", "text", 200))
+
+    assert [row["file_id"] for row in manager.find(file_type="pdf")] == []
+    assert manager.find(file_type="text")[0]["original_name"] == "renamed.txt"
+    assert len(manager.catalog) == 2
+
+
+def test_rebuild_from_existing_directory(tmp_path):
+    # Metadata written before the catalog existed
+    (tmp_path / "legacy.meta.json").write_text(json.dumps(_metadata("old.docx", "word", 50)))
+    (tmp_path / "new.meta.json").write_text(json.dumps(_metadata("new.pdf", "pdf", 60)))
+
+    result = subprocess.run(
+        [sys.executable, "main.py", "rebuild-catalog", str(tmp_path)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    rows = MetadataManager(tmp_path).find()
+    assert [row["file_id"] for row in rows] == ["new", "legacy"]
@@ -0,0 +1,101 @@
+"""
+Tests for the lossless OOXML ZIP re-expansion used before compression.
+"""
+import io
+import os
+import zipfile
+import zlib
+
+import pytest
+
+from processors import OFFICE_PROCESSORS, WordProcessor
+from processors.office_zip import expand, restore
+
+
+def _package(**members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        for name, (content, compress_type, level) in members.items():
+            archive.writestr(name, content, compress_type=compress_type, compresslevel=level)
+    return buf.getvalue()
+
+
+XML = "<sheetData>" + "".join(f'<row r="{i}"><c><v>{i * 7}</v></c></row>' for i in range(2000)) + "</sheetData>"
+
+
+@pytest.mark.parametrize("level", [1, 6, 9])
+def test_expand_restore_is_byte_identical(level):
+    package = _package(**{
+        "xl/worksheets/sheet1.xml": (XML, zipfile.ZIP_DEFLATED, level),
+        "xl/media/logo.png": (os.urandom(4000), zipfile.ZIP_STORED, None),
+        "docProps/core.xml": ("<core/>" * 40, zipfile.ZIP_DEFLATED, None),
+    })
+    expanded = expand(package)
+    assert expanded is not None
+    assert XML.encode() in expanded
+    assert restore(expanded) == package
+
+
+def test_members_zlib_cannot_reproduce_stay_raw(monkeypatch):
+    # compresslevel=5 stands in for a foreign deflater: a strategy expand() never tries
+    get_compressor = zipfile._get_compressor
+    monkeypatch.setattr(zipfile, "_get_compressor", lambda compress_type, level=None: (
+        zlib.compressobj(5, zlib.DEFLATED, -15, 8, zlib.Z_FIXED) if level == 5
+        else get_compressor(compress_type, level)
+    ))
+    package = _package(**{
+        "foreign.xml": (XML, zipfile.ZIP_DEFLATED, 5),
+        "native.xml": (XML.replace("row", "col"), zipfile.ZIP_DEFLATED, 6),
+    })
+    foreign_raw = package[package.index(b"foreign.xml") + len("foreign.xml"):][:200]
+
+    expanded = expand(package)
+    assert expanded is not None
+    assert XML.replace("row", "col").encode() in expanded
+    assert XML.encode() not in expanded
+    assert foreign_raw in expanded
+    assert restore(expanded) == package
+
+
+def test_non_zip_input_is_left_alone():
+    assert expand(b"%PDF-1.7 not a zip") is None
+    assert expand(_package(**{"a.bin": (b"x" * 100, zipfile.ZIP_STORED, None)})) is None
+    processor = WordProcessor()
+    data = b"plain bytes"
+    assert processor.preprocess(data) is data
+
+
+def test_restore_rejects_corrupt_input():
+    expanded = expand(_package(**{"a.xml": (XML, zipfile.ZIP_DEFLATED, 6)}))
+    with pytest.raises(ValueError):
+        restore(b"not expanded")
+    with pytest.raises(ValueError):
+        restore(expanded[:-10])
+
+
+def test_restore_detects_different_deflate_output(monkeypatch):
+    from processors import office_zip
+
+    expanded = expand(_package(**{"a.xml": (XML, zipfile.ZIP_DEFLATED, 6)}))
+    # A zlib build that emits a different (equally valid) stream of the same length
+    deflater = office_zip._deflater
+
+    class Foreign:
+        def __init__(self, params):
+            self._inner = deflater(params)
+
+        def compress(self, data):
+            return self._inner.compress(data)
+
+        def flush(self):
+            out = bytearray(self._inner.flush())
+            out[-1] ^= 0xFF
+            return bytes(out)
+
+    monkeypatch.setattr(office_zip, "_deflater", Foreign)
+    with pytest.raises(ValueError, match=zlib.ZLIB_RUNTIME_VERSION):
+        restore(expanded)
+
+
+def test_office_processors_registered():
+    assert set(OFFICE_PROCESSORS) == {"word", "excel"}
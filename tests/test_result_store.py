@@ -0,0 +1,66 @@
+"""
+ResultStore: content keys, publish/acquire and reference-counted release.
+"""
+from app.services.result_store import ResultStore
+
+
+def _publish(store, tmp_path, key, file_id="job1"):
+    files = tmp_path / "files"
+    files.mkdir(exist_ok=True)
+    (files / f"{file_id}_encrypted.enc").write_bytes(b"cipher")
+    (files / f"{file_id}_key.key").write_bytes(b"key")
+    return store.publish(
+        key, tmp_path,
+        {"encrypted_file": f"files/{file_id}_encrypted.enc", "key_file": f"files/{file_id}_key.key"},
+        ("encrypted_file", "key_file"), 60,
+    )
+
+
+def test_content_key_is_length_prefixed_and_per_process():
+    store = ResultStore()
+    assert store.content_key("encrypt", [b"ab", b"c"]) != store.content_key("encrypt", [b"a", b"bc"])
+    assert store.content_key("encrypt", [b"x"]) != store.content_key("decrypt", [b"x"])
+    assert store.content_key("encrypt", [b"x"]) != ResultStore().content_key("encrypt", [b"x"])
+
+
+def test_publish_moves_files_into_cas(tmp_path):
+    store = ResultStore()
+    key = store.content_key("encrypt", [b"doc"])
+    published = _publish(store, tmp_path, key)
+    assert all(store.owns(p) for p in published.values())
+    assert (tmp_path / published["encrypted_file"]).read_bytes() == b"cipher"
+    assert not list((tmp_path / "files").iterdir())
+    # A concurrent identical publish keeps its own files
+    assert _publish(store, tmp_path, key, file_id="job2") is None
+
+
+def test_release_deletes_only_after_last_reference(tmp_path):
+    store = ResultStore()
+    key = store.content_key("encrypt", [b"doc"])
+    published = _publish(store, tmp_path, key)
+    assert store.acquire(key, tmp_path, 60) == published
+    assert store.release(key) == []
+    assert sorted(store.release(key)) == sorted(published.values())
+    assert len(store) == 0
+    assert store.acquire(key, tmp_path, 60) is None
+
+
+def test_acquire_misses_when_files_are_gone(tmp_path):
+    store = ResultStore()
+    key = store.content_key("encrypt", [b"doc"])
+    published = _publish(store, tmp_path, key)
+    (tmp_path / published["key_file"]).unlink()
+    assert store.acquire(key, tmp_path, 60) is None
+
+
+def test_restore_from_jobs_rebuilds_refcounts():
+    store = ResultStore()
+    paths = {"decrypted_file": "cas/abc_decrypted.txt", "original_filename": "a.txt"}
+    jobs = [
+        {"cas_key": "abc", "result_paths": paths},
+        {"cas_key": "abc", "result_paths": paths},
+        {"result_paths": {"decrypted_file": "files/x_decrypted.txt"}},
+    ]
+    assert store.restore_from_jobs(jobs) == 1
+    assert store.release("abc") == []
+    assert store.release("abc") == ["cas/abc_decrypted.txt"]
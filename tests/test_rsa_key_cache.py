@@ -0,0 +1,64 @@
+"""
+RSAKeyCache: loaded key objects are shared across KeyManager instances.
+"""
+import threading
+
+import pytest
+
+from core.key_manager import KeyManager
+from core.rsa_key_cache import RSAKeyCache
+
+
+@pytest.fixture(scope="module")
+def pem_keys():
+    km = KeyManager(key_cache=RSAKeyCache(max_entries=0))
+    public_key, private_key = km.generate_rsa_keypair(key_size=2048)
+    return km.serialize_private_key(private_key), km.serialize_public_key(public_key)
+
+
+def test_managers_share_loaded_keys(pem_keys):
+    cache = RSAKeyCache(max_entries=4)
+    private_pem, public_pem = pem_keys
+    first = KeyManager(key_cache=cache).deserialize_private_key(private_pem)
+    second = KeyManager(key_cache=cache).deserialize_private_key(private_pem)
+    assert first is second
+    assert cache.hits == 1 and cache.misses == 1
+
+    public = KeyManager(key_cache=cache).deserialize_public_key(public_pem)
+    assert public.public_numbers() == first.public_key().public_numbers()
+    assert len(cache) == 2
+
+
+def test_lru_bound_and_disabled_cache():
+    cache = RSAKeyCache(max_entries=2)
+    for i in range(3):
+        cache.get_or_load(b"public", bytes([i]), object)
+    assert len(cache) == 2
+    assert cache.get_or_load(b"public", b"\x00", lambda: "reloaded") == "reloaded"
+
+    disabled = RSAKeyCache(max_entries=0)
+    assert disabled.get_or_load(b"public", b"k", object) is not disabled.get_or_load(b"public", b"k", object)
+    assert len(disabled) == 0
+
+
+def test_fingerprint_separates_kind_and_password():
+    fp = RSAKeyCache.fingerprint
+    assert fp(b"private", b"k") != fp(b"public", b"k")
+    assert fp(b"private", b"k") != fp(b"private", b"k", b"secret")
+
+
+def test_concurrent_loads_return_one_object():
+    cache = RSAKeyCache(max_entries=4)
+    results = []
+    barrier = threading.Barrier(4)
+
+    def worker():
+        barrier.wait()
+        results.append(cache.get_or_load(b"private", b"same", object))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(r) for r in results}) == 1
@@ -0,0 +1,144 @@
+"""
+Tests for chunked secure delete and the background shred queue.
+"""
+import ctypes
+import os
+import platform
+import sys
+import threading
+import time
+
+import pytest
+
+from app.services.shredder import ShredQueue, _lower_priority, hold_file
+from utils.file_handler import FileHandler
+
+
+def test_secure_delete_overwrites_in_chunks(tmp_path, monkeypatch):
+    path = tmp_path / "plain.bin"
+    original = b"secret" * 50_000
+    path.write_bytes(original)
+    overwritten = {}
+    monkeypatch.setattr(os, "remove", lambda p: overwritten.setdefault("data", open(p, "rb").read()))
+
+    FileHandler.secure_delete(str(path), passes=2, chunk_size=4096)
+
+    data = overwritten["data"]
+    assert len(data) == len(original)
+    assert data != original
+    assert b"secret" not in data
+
+
+def test_secure_delete_removes_file(tmp_path):
+    path = tmp_path / "plain.bin"
+    path.write_bytes(os.urandom(10_001))
+    FileHandler.secure_delete(str(path), chunk_size=1024)
+    assert not path.exists()
+    FileHandler.secure_delete(str(path))  # missing file is a no-op
+
+
+def test_secure_delete_empty_file(tmp_path):
+    path = tmp_path / "empty.bin"
+    path.touch()
+    FileHandler.secure_delete(str(path))
+    assert not path.exists()
+
+
+@pytest.mark.parametrize("passes", [0, 1])
+def test_queue_shreds_in_background(tmp_path, passes):
+    queue = ShredQueue(passes=passes, workers=2)
+    paths = [tmp_path / f"f{i}" for i in range(5)]
+    for path in paths:
+        path.write_bytes(b"x" * 1000)
+    futures = [queue.enqueue(path) for path in paths]
+    for future in futures:
+        future.result(timeout=10)
+    assert not any(path.exists() for path in paths)
+    assert queue.pending() == 0
+    queue.shutdown()
+
+
+def test_queue_skips_path_already_queued(tmp_path, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(FileHandler, "secure_delete", staticmethod(lambda *a, **k: release.wait(10)))
+    queue = ShredQueue(passes=1, workers=1)
+    path = tmp_path / "f"
+    path.write_bytes(b"x")
+    first = queue.enqueue(path)
+    # Moved aside at once: the second request finds nothing left to queue
+    assert not path.exists()
+    assert queue.enqueue(path) is None
+    release.set()
+    first.result(timeout=10)
+    path.write_bytes(b"x")
+    assert queue.enqueue(path) is not None
+    queue.shutdown()
+
+
+def test_recover_queues_files_left_by_a_crash(tmp_path):
+    leftover = tmp_path / ".shred-0123abcd"
+    leftover.write_bytes(b"x" * 1000)
+    (tmp_path / "abc_result.bin").write_bytes(b"kept")
+    queue = ShredQueue(passes=1, workers=1)
+    assert queue.recover(tmp_path) == 1
+    queue.shutdown()
+    assert [path.name for path in tmp_path.iterdir()] == ["abc_result.bin"]
+
+
+def test_download_in_flight_defers_overwrite(tmp_path):
+    queue = ShredQueue(passes=1, workers=1, retry_seconds=0.05)
+    path = tmp_path / "result.bin"
+    original = os.urandom(100_000)
+    path.write_bytes(original)
+
+    hold = hold_file(path)
+    with open(path, "rb") as reader:
+        queue.enqueue(path).result(timeout=10)
+        assert not path.exists()
+        with pytest.raises(FileNotFoundError):
+            hold_file(path)
+        # Still held: the reader gets the original bytes, not the overwrite
+        assert reader.read() == original
+        assert queue.pending() == 1
+    hold.release()
+
+    deadline = time.monotonic() + 10
+    while queue.pending() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert queue.pending() == 0 and not list(tmp_path.iterdir())
+    queue.shutdown()
+
+
+def test_shutdown_unlinks_files_still_held(tmp_path):
+    queue = ShredQueue(passes=1, workers=1, retry_seconds=60)
+    path = tmp_path / "result.bin"
+    path.write_bytes(b"x" * 1000)
+    with hold_file(path):
+        queue.enqueue(path).result(timeout=10)
+        queue.shutdown()
+    assert queue.pending() == 0 and not list(tmp_path.iterdir())
+
+
+@pytest.mark.skipif(platform.machine() != "x86_64" or not sys.platform.startswith("linux"),
+                    reason="reads the I/O class via the x86_64 ioprio_get syscall")
+def test_worker_threads_use_idle_io_class():
+    def io_class():
+        _lower_priority()
+        libc = ctypes.CDLL(None, use_errno=True)
+        result.append(libc.syscall(252, 1, threading.get_native_id()) >> 13)
+
+    result = []
+    worker = threading.Thread(target=io_class)
+    worker.start()
+    worker.join()
+    assert result == [3]
+
+
+def test_shutdown_drains_queue(tmp_path):
+    queue = ShredQueue(passes=1, workers=1)
+    paths = [tmp_path / f"f{i}" for i in range(3)]
+    for path in paths:
+        path.write_bytes(os.urandom(100_000))
+        queue.enqueue(path)
+    queue.shutdown()
+    assert not any(path.exists() for path in paths)
@@ -0,0 +1,85 @@
+"""
+Tests for the hash-prefix sharded layout of KeyStorage, SecureVault and MetadataManager.
+"""
+import json
+
+from core.key_bundle_format import KEY_BUNDLE_MAGIC
+from storage import KeyStorage, MetadataManager, SecureVault
+from storage.sharding import ShardedLayout
+
+
+def test_layout_paths_and_listing(tmp_path):
+    layout = ShardedLayout(tmp_path, ".key", levels=2)
+    ids = [f"k{i}" for i in range(40)]
+    for item_id in ids:
+        path = layout.path_for(item_id, create=True)
+        path.write_text("x")
+        assert path.parent.parent.parent == tmp_path
+        assert len(path.parent.name) == 2
+    (tmp_path / "notes.txt").write_text("ignored")
+
+    assert sorted(layout.iter_ids()) == sorted(ids)
+
+
+def test_key_storage_shards_and_migrates_flat_files(tmp_path):
+    (tmp_path / "legacy.key").write_text(json.dumps({"encrypted": False, "data": "YWJj"}))
+
+    storage = KeyStorage(tmp_path)
+    assert not (tmp_path / "legacy.key").exists()
+    assert storage.retrieve_key("legacy") == b"abc"
+
+    storage.store_key("fresh", b"xyz")
+    assert sorted(storage.iter_key_ids()) == ["fresh", "legacy"]
+    storage.delete_key("fresh")
+    assert list(storage.iter_key_ids()) == ["legacy"]
+
+
+def test_key_storage_leaves_cli_bundles_in_place(tmp_path):
+    binary = tmp_path / "document.key"
+    binary.write_bytes(KEY_BUNDLE_MAGIC + b"\x01\x00records")
+    protected = tmp_path / "report.key"
+    protected.write_text(json.dumps({"encrypted": True, "salt": "", "iv": "", "tag": "", "data": ""}))
+
+    storage = KeyStorage(tmp_path)
+    assert binary.exists() and protected.exists()
+    assert list(storage.iter_key_ids()) == []
+
+
+def test_metadata_manager_shards_and_migrates(tmp_path):
+    (tmp_path / "doc1.meta.json").write_text(json.dumps({"version": "1.0"}))
+
+    manager = MetadataManager(tmp_path)
+    manager.save_metadata("doc2", {"version": "1.0"})
+    assert manager.load_metadata("doc1") == {"version": "1.0"}
+    assert sorted(manager.iter_file_ids()) == ["doc1", "doc2"]
+    assert not list(tmp_path.glob("*.meta.json"))
+
+
+def test_vault_migrates_flat_items_and_index(tmp_path):
+    flat = tmp_path / "old.vault"
+    flat.write_text(json.dumps({"data": "secret", "metadata": {}}))
+    (tmp_path / "vault_index.json").write_text(
+        json.dumps({"old": {"file": str(flat), "metadata": {}}})
+    )
+
+    vault = SecureVault(tmp_path)
+    assert not flat.exists()
+    assert vault.retrieve("old") == "secret"
+    vault.store("new", 1)
+    assert SecureVault(tmp_path).retrieve("old") == "secret"
+    assert sorted(vault.layout.iter_ids()) == ["new", "old"]
+
+
+def test_vault_repairs_index_after_interrupted_migration(tmp_path):
+    flat = tmp_path / "old.vault"
+    flat.write_text(json.dumps({"data": "secret", "metadata": {}}))
+    (tmp_path / "vault_index.json").write_text(
+        json.dumps({"old": {"file": str(flat), "metadata": {}}})
+    )
+    # Crash after the files were moved but before the index was rewritten
+    ShardedLayout(tmp_path, ".vault").migrate_flat()
+
+    vault = SecureVault(tmp_path)
+    assert vault.retrieve("old") == "secret"
+    stored = json.loads((tmp_path / "vault_index.json").read_text())
+    assert stored["old"]["file"] == str(vault.layout.path_for("old"))
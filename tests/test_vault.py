@@ -0,0 +1,65 @@
+"""
+Tests for SecureVault's append-only index log and compaction.
+"""
+import json
+
+from storage.vault import SecureVault
+
+
+def test_store_appends_instead_of_rewriting_index(tmp_path):
+    vault = SecureVault(tmp_path)
+    for i in range(50):
+        vault.store(f"item{i}", {"n": i}, {"tag": "a"})
+
+    assert not vault.index_file.exists()
+    assert len(vault.log_file.read_bytes().splitlines()) == 50
+    assert vault.retrieve("item7") == {"n": 7}
+
+
+def test_index_rebuilt_from_log_on_open(tmp_path):
+    vault = SecureVault(tmp_path)
+    vault.store_many({"a": 1, "b": 2, "c": 3}, metadata={"b": {"kind": "key"}})
+    vault.delete("a")
+    vault.store("c", 30)
+    with open(vault.log_file, "ab") as f:
+        f.write(b'{"op":"put","id":"tor')
+
+    reopened = SecureVault(tmp_path)
+    assert sorted(reopened.list_items()) == ["b", "c"]
+    assert reopened.index["b"]["metadata"] == {"kind": "key"}
+    assert reopened.retrieve("c") == 30
+
+
+def test_torn_tail_is_truncated_before_next_append(tmp_path):
+    vault = SecureVault(tmp_path)
+    vault.store("a", 1)
+    with open(vault.log_file, "ab") as f:
+        f.write(b'{"op":"put","id":"b"')
+
+    reopened = SecureVault(tmp_path)
+    reopened.store("c", 3)
+
+    again = SecureVault(tmp_path)
+    assert sorted(again.list_items()) == ["a", "c"]
+    assert again.retrieve("c") == 3
+
+
+def test_compaction_folds_log_into_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(SecureVault, "COMPACT_MIN_RECORDS", 4)
+    vault = SecureVault(tmp_path)
+    vault.store_many({f"k{i}": i for i in range(4)})
+    vault.delete_many(["k0", "k1", "missing"])
+
+    assert json.loads(vault.index_file.read_text()).keys() == {"k2", "k3"}
+    assert vault.log_file.read_bytes() == b""
+    assert sorted(SecureVault(tmp_path).list_items()) == ["k2", "k3"]
+
+
+def test_legacy_index_file_is_loaded(tmp_path):
+    legacy = SecureVault(tmp_path)
+    legacy.store("old", "value")
+    legacy.compact()
+
+    vault = SecureVault(tmp_path)
+    vault.store("new", "value")
+    assert sorted(SecureVault(tmp_path).list_items()) == ["new", "old"]
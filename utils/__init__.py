@@ -4,5 +4,6 @@ from .file_handler import FileHandler
 from .validator import Validator
 from .logger import Logger
 from .compression import CompressionHandler
+from .content_sniffer import ContentSniffer
 
-__all__ = ['FileHandler', 'Validator', 'Logger', 'CompressionHandler']
+__all__ = ['FileHandler', 'Validator', 'Logger', 'CompressionHandler', 'ContentSniffer']
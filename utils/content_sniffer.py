@@ -0,0 +1,141 @@
+
+
+import codecs
+import struct
+from typing import Dict, Optional, Tuple
+
+from config.settings import Settings
+
+
+def _by_first_byte(signatures) -> Dict[int, Tuple[Tuple[bytes, str], ...]]:
+    
+    table: Dict[int, list] = {}
+    for magic, kind in signatures:
+        table.setdefault(magic[0], []).append((magic, kind))
+    # Длинные сигнатуры раньше коротких с тем же первым байтом
+    return {
+        first: tuple(sorted(entries, key=lambda entry: -len(entry[0])))
+        for first, entries in table.items()
+    }
+
+
+class ContentSniffer:
+    
+    
+    # Сколько первых байт потока нужно для определения типа
+    HEAD_SIZE = 8192
+    
+    SIGNATURES = (
+        (b'%PDF-', 'pdf'),
+        (b'\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1', 'ole2'),
+        (b'PK\x03\x04', 'zip'),
+        (b'\x09\x08\x10\x00', 'biff'),
+    )
+    
+    BOMS = (
+        (codecs.BOM_UTF32_LE, 'utf-32'),
+        (codecs.BOM_UTF32_BE, 'utf-32'),
+        (codecs.BOM_UTF8, 'utf-8-sig'),
+        (codecs.BOM_UTF16_LE, 'utf-16'),
+        (codecs.BOM_UTF16_BE, 'utf-16'),
+    )
+    
+    OOXML_PARTS = (
+        (b'word/', 'ooxml-word'),
+        (b'xl/', 'ooxml-excel'),
+    )
+    
+    # Сигнатуры, однозначно задающие тип документа независимо от расширения
+    KIND_FORMATS = {
+        'pdf': 'pdf',
+        'ooxml-word': 'word',
+        'ooxml-excel': 'excel',
+    }
+    
+    # Контейнеры, которые без разбора структуры определяются только вместе с расширением
+    CONTAINER_FORMATS = {
+        'ole2': ('word', 'excel'),
+        'zip': ('word', 'excel'),
+        'biff': ('excel',),
+    }
+    
+    ZIP_KINDS = ('zip', 'ooxml-word', 'ooxml-excel')
+    
+    _SIGNATURE_TABLE = _by_first_byte(SIGNATURES)
+    _LOCAL_HEADER = struct.Struct('<4s2xHH8xIIHH')
+    
+    @classmethod
+    def detect(cls, head: bytes) -> str:
+        
+        if not head:
+            return 'unknown'
+        
+        for magic, kind in cls._SIGNATURE_TABLE.get(head[0], ()):
+            if head[:len(magic)] == magic:
+                if kind == 'zip':
+                    return cls._ooxml_kind(head)
+                return kind
+        
+        if cls.text_encoding(head) is not None:
+            return 'text'
+        
+        return 'unknown'
+    
+    @classmethod
+    def _ooxml_kind(cls, head: bytes) -> str:
+        
+        offset = 0
+        while offset + cls._LOCAL_HEADER.size <= len(head):
+            signature, flags, _, compressed_size, _, name_len, extra_len = (
+                cls._LOCAL_HEADER.unpack_from(head, offset)
+            )
+            if signature != b'PK\x03\x04':
+                break
+            
+            name_start = offset + cls._LOCAL_HEADER.size
+            name = bytes(head[name_start:name_start + name_len])
+            for prefix, kind in cls.OOXML_PARTS:
+                if name.startswith(prefix):
+                    return kind
+            
+            # Размер записан после данных (data descriptor) — дальше не пройти
+            if flags & 0x08:
+                break
+            offset = name_start + name_len + extra_len + compressed_size
+        
+        return 'zip'
+    
+    @classmethod
+    def text_encoding(cls, head: bytes) -> Optional[str]:
+        
+        for bom, encoding in cls.BOMS:
+            if head[:len(bom)] == bom:
+                return encoding
+        
+        if b'\x00' in head:
+            return None
+        
+        # Последний символ может быть обрезан границей блока
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        except UnicodeDecodeError:
+            return None
+        return 'utf-8'
+    
+    @classmethod
+    def file_type(cls, head: bytes, extension: str = '') -> str:
+        
+        by_extension = Settings.get_format_by_extension(extension) if extension else 'unknown'
+        kind = cls.detect(head)
+        
+        if kind in cls.KIND_FORMATS:
+            return cls.KIND_FORMATS[kind]
+        
+        if kind in cls.CONTAINER_FORMATS:
+            formats = cls.CONTAINER_FORMATS[kind]
+            if by_extension in formats:
+                return by_extension
+            return formats[0] if len(formats) == 1 else 'unknown'
+        
+        # Текст и нераспознанное содержимое: решает расширение
+        return by_extension
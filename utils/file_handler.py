@@ -1,8 +1,14 @@
 
 
+import mmap
 import os
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional, Union
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from config.settings import Settings
 
 
 class FileHandler:
@@ -14,6 +20,39 @@ class FileHandler:
         with open(filepath, 'rb') as f:
             return f.read()
     
+    @staticmethod
+    def read_head(filepath: str, size: int) -> bytes:
+        
+        with open(filepath, 'rb') as f:
+            return f.read(size)
+    
+    @staticmethod
+    @contextmanager
+    def open_buffer(filepath: str,
+                    mmap_threshold: Optional[int] = None) -> Iterator[Union[bytes, memoryview]]:
+        
+        if mmap_threshold is None:
+            mmap_threshold = Settings.MMAP_INPUT_THRESHOLD
+        
+        with open(filepath, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0 or size < mmap_threshold:
+                yield f.read()
+                return
+            
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                view.release()
+                try:
+                    mapped.close()
+                except BufferError:
+                    # A slice of the mapping is still referenced (e.g. by a
+                    # traceback frame); the mapping is unmapped when it is collected.
+                    pass
+    
     @staticmethod
     def write_file(filepath: str, data: bytes, overwrite: bool = True):
         
@@ -37,18 +76,35 @@ class FileHandler:
         return os.path.isfile(filepath)
     
     @staticmethod
-    def secure_delete(filepath: str, passes: int = 3):
+    def secure_delete(filepath: str, passes: int = 3, chunk_size: Optional[int] = None):
         
         if not os.path.exists(filepath):
             return
         
+        if chunk_size is None:
+            chunk_size = Settings.SECURE_DELETE_CHUNK_SIZE
+        
         file_size = os.path.getsize(filepath)
+        chunk_size = max(1, min(chunk_size, file_size))
         
+        # Один буфер на все проходы: случайные данные — поток AES-256-CTR со
+        # случайным ключом, а не os.urandom(file_size) на каждый проход
+        zeros = memoryview(bytes(chunk_size))
+        buffer = bytearray(chunk_size + 15)
+        view = memoryview(buffer)
         
         with open(filepath, 'rb+') as f:
             for _ in range(passes):
+                keystream = Cipher(
+                    algorithms.AES(os.urandom(32)), modes.CTR(os.urandom(16))
+                ).encryptor()
                 f.seek(0)
-                f.write(os.urandom(file_size))
+                remaining = file_size
+                while remaining:
+                    n = min(remaining, chunk_size)
+                    keystream.update_into(zeros[:n], buffer)
+                    f.write(view[:n])
+                    remaining -= n
                 f.flush()
                 os.fsync(f.fileno())
         
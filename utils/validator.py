@@ -4,6 +4,7 @@ import os
 import re
 from typing import Optional
 from config.settings import Settings
+from .content_sniffer import ContentSniffer
 
 
 class Validator:
@@ -36,10 +37,14 @@ class Validator:
         
         return True
     
-    def get_file_type(self, filepath: str) -> str:
+    def get_file_type(self, filepath: str, head: Optional[bytes] = None) -> str:
         
         extension = os.path.splitext(filepath)[1].lower()
-        return self.settings.get_format_by_extension(extension)
+        if head is None:
+            return self.settings.get_format_by_extension(extension)
+        
+        # Первые байты потока важнее расширения (см. ContentSniffer.file_type)
+        return ContentSniffer.file_type(head, extension)
     
     def is_supported_format(self, file_type: str) -> bool:
         